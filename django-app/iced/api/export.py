@@ -0,0 +1,182 @@
+"""
+Streaming export of an application's samples, nuclide measurements and calculated
+ages as CSV, newline-delimited JSON or Parquet. Rows are read in primary key order
+one chunk at a time, so memory use does not grow with the size of the export.
+"""
+import csv
+import io
+import json
+
+from base.models import SAMPLE_DATA_TABLES, CalculatedAge, Sample
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # only Parquet exports need pyarrow, the other formats work without it
+    pyarrow = None
+
+CHUNK_SIZE = 2000
+
+# Exportable tables; everything but the samples themselves is joined to its sample
+EXPORT_TABLES = {"samples": Sample} | {
+    table_name: model
+    for table_name, model in SAMPLE_DATA_TABLES.items()
+    if model is not Sample
+} | {"calculated_ages": CalculatedAge}
+
+
+class ExportRenderer(BaseRenderer):
+    """Selects an export format through ?format= or Accept, exports stream their own body"""
+
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode("utf-8")
+
+
+class CSVRenderer(ExportRenderer):
+    media_type = "text/csv"
+    format = "csv"
+
+
+class NDJSONRenderer(ExportRenderer):
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+
+class ParquetRenderer(ExportRenderer):
+    media_type = "application/vnd.apache.parquet"
+    format = "parquet"
+
+
+# Columns joined from the site and sample of each exported row
+RELATED_COLUMNS = {
+    "samples": [("site", "site__short_name"), ("region", "site__region__name")],
+    "measurements": [("sample_name", "sample__name"), ("site", "sample__site__short_name")],
+}
+
+
+def _lookup_field(model, lookup: str):
+    *path, name = lookup.split("__")
+    for part in path:
+        model = model._meta.get_field(part).related_model
+    return model._meta.get_field(name)
+
+
+def export_columns(model) -> list[tuple[str, str, object]]:
+    """(column name, values() lookup, model field) of each exported column"""
+    related = RELATED_COLUMNS["samples" if model is Sample else "measurements"]
+    return [(f.attname, f.attname, f) for f in model._meta.concrete_fields] + [
+        (name, lookup, _lookup_field(model, lookup)) for name, lookup in related
+    ]
+
+
+def application_rows(model, application):
+    if model is Sample:
+        return model.objects.filter(site__applications=application)
+    return model.objects.filter(sample__site__applications=application)
+
+
+def export_chunks(rows, lookups: list[str]):
+    """
+    Lists of row tuples of the lookups of rows, CHUNK_SIZE at a time, using keyset
+    pagination on pk
+    """
+    lookups = ["pk"] + list(lookups)
+    last_pk = None
+    while True:
+        page = rows if last_pk is None else rows.filter(pk__gt=last_pk)
+        chunk = list(page.order_by("pk").values_list(*lookups)[:CHUNK_SIZE])
+        if not chunk:
+            return
+        last_pk = chunk[-1][0]
+        yield [row[1:] for row in chunk]
+        if len(chunk) < CHUNK_SIZE:
+            return
+
+
+def stream_csv(chunks, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _, _ in columns])
+    for chunk in chunks:
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header of an empty export
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_ndjson(chunks, columns):
+    names = [name for name, _, _ in columns]
+    for chunk in chunks:
+        yield "".join(
+            json.dumps(dict(zip(names, row)), cls=DjangoJSONEncoder) + "\n" for row in chunk
+        )
+
+
+class ByteSink(io.RawIOBase):
+    """Write-only file object collecting what is written to it until it is taken"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def take(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _arrow_type(field):
+    return {
+        "AutoField": pyarrow.int64(),
+        "BigAutoField": pyarrow.int64(),
+        "BigIntegerField": pyarrow.int64(),
+        "IntegerField": pyarrow.int64(),
+        "PositiveIntegerField": pyarrow.int64(),
+        "SmallIntegerField": pyarrow.int64(),
+        "ForeignKey": pyarrow.int64(),
+        "OneToOneField": pyarrow.int64(),
+        "FloatField": pyarrow.float64(),
+        "DecimalField": pyarrow.float64(),
+        "BooleanField": pyarrow.bool_(),
+        "DateField": pyarrow.date32(),
+        "DateTimeField": pyarrow.timestamp("us", tz="UTC"),
+    }.get(field.get_internal_type(), pyarrow.string())
+
+
+def stream_parquet(chunks, columns):
+    """One Parquet row group per chunk"""
+    schema = pyarrow.schema([(name, _arrow_type(field)) for name, _, field in columns])
+    decimals = [
+        i for i, (_, _, field) in enumerate(columns) if field.get_internal_type() == "DecimalField"
+    ]
+    sink = ByteSink()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema)
+    for chunk in chunks:
+        values = [list(column) for column in zip(*chunk)]
+        for i in decimals:
+            values[i] = [None if v is None else float(v) for v in values[i]]
+        writer.write_table(pyarrow.Table.from_arrays(values, schema=schema))
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+STREAMS = {"csv": stream_csv, "ndjson": stream_ndjson, "parquet": stream_parquet}
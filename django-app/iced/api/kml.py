@@ -0,0 +1,136 @@
+"""
+KML and KMZ exports of samples and core samples, written placemark by placemark
+from keyset-paginated chunks so memory use does not grow with the export.
+"""
+import zipfile
+from xml.sax.saxutils import escape, quoteattr
+
+from base.models import CoreSample, Sample
+from django.db.models import Q
+from rest_framework.renderers import BaseRenderer
+
+from .export import ByteSink, export_chunks
+
+
+class KMLRenderer(BaseRenderer):
+    """Selects KML or KMZ through ?format= or Accept, exports stream their own body"""
+
+    media_type = "application/vnd.google-earth.kml+xml"
+    format = "kml"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return b""
+
+
+class KMZRenderer(KMLRenderer):
+    media_type = "application/vnd.google-earth.kmz"
+    format = "kmz"
+
+
+# (ExtendedData name, values() lookup); every row also has name, lon and lat
+SAMPLE_DATA = [
+    ("site", "site__short_name"),
+    ("what", "what"),
+    ("lithology", "lithology"),
+    ("elv_m", "elv_m"),
+    ("thick_cm", "thick_cm"),
+    ("shielding", "shielding"),
+    ("density", "density"),
+    ("collected_by", "collected_by"),
+    ("date_collected", "date_collected"),
+]
+
+# Core samples sit at the position of their core
+CORE_SAMPLE_DATA = [
+    ("core", "core__name"),
+    ("site", "core__site__short_name"),
+    ("elv_m", "core__elv_m"),
+    ("top_depth_cm", "top_depth_cm"),
+    ("bot_depth_cm", "bot_depth_cm"),
+    ("lithology", "lithology"),
+]
+
+KINDS = {
+    "samples": (Sample, "", SAMPLE_DATA),
+    "coresamples": (CoreSample, "core__", CORE_SAMPLE_DATA),
+}
+
+
+def kml_rows(kind: str, application=None, ids=None, site=None, publication=None, bbox=None):
+    """Rows of one kind, restricted by each filter that is given"""
+    model, location, _ = KINDS[kind]
+    site_path = "site" if model is Sample else "core__site"
+    rows = model.objects.all()
+    if application is not None:
+        rows = rows.filter(**{f"{site_path}__applications": application})
+    if ids is not None:
+        rows = rows.filter(id__in=ids)
+    if site is not None:
+        rows = rows.filter(**{f"{site_path}__short_name__iexact": site})
+    if publication is not None:
+        rows = rows.filter(samplepublicationsmatch__publication_id=publication).distinct()
+    if bbox is not None:
+        west, south, east, north = bbox
+        lon = f"{location}lon_DD"
+        lat = f"{location}lat_DD"
+        # A bbox crossing the antimeridian has west > east
+        lon_filter = (
+            Q(**{f"{lon}__gte": west, f"{lon}__lte": east})
+            if west <= east
+            else Q(**{f"{lon}__gte": west}) | Q(**{f"{lon}__lte": east})
+        )
+        rows = rows.filter(lon_filter, **{f"{lat}__gte": south, f"{lat}__lte": north})
+    return rows
+
+
+def _placemark(name, lon, lat, data: list) -> str:
+    extended = "".join(
+        f"<Data name={quoteattr(key)}><value>{escape(str(value))}</value></Data>"
+        for key, value in data
+        if value is not None
+    )
+    return (
+        f"<Placemark><name>{escape(name)}</name>"
+        f"<ExtendedData>{extended}</ExtendedData>"
+        f"<Point><coordinates>{lon},{lat}</coordinates></Point></Placemark>\n"
+    )
+
+
+def stream_kml(kind: str, rows, document_name: str):
+    _, location, data = KINDS[kind]
+    lookups = ["name", f"{location}lon_DD", f"{location}lat_DD"]
+    lookups += [lookup for _, lookup in data]
+    names = [name for name, _ in data]
+
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<kml xmlns="http://www.opengis.net/kml/2.2"><Document>'
+        f"<name>{escape(document_name)}</name>\n"
+    )
+    for chunk in export_chunks(rows, lookups):
+        yield "".join(
+            _placemark(name, lon, lat, list(zip(names, values)))
+            for name, lon, lat, *values in chunk
+        )
+    yield "</Document></kml>\n"
+
+
+def stream_kmz(kml_parts):
+    """Zips the KML stream as doc.kml, handing out compressed bytes as they come"""
+    sink = ByteSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as kmz:
+        with kmz.open("doc.kml", "w") as doc:
+            for part in kml_parts:
+                doc.write(part.encode("utf-8"))
+                data = sink.take()
+                if data:
+                    yield data
+    yield sink.take()
+
+
+def kml_response_body(renderer_format: str, kind: str, rows, document_name: str):
+    parts = stream_kml(kind, rows, document_name)
+    if renderer_format == "kmz":
+        return stream_kmz(parts)
+    return (part.encode("utf-8") for part in parts)
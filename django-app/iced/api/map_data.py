@@ -0,0 +1,175 @@
+import gzip
+import hashlib
+import json
+import math
+
+from base.models import Sample
+from base.queries import run_query
+from django.core.cache import caches
+from django.db.models import Count, Max
+
+from .queries import (
+    leafletmap_query,
+    leafletmap_tile_clusters_query,
+    leafletmap_tile_samples_query,
+)
+
+# map.js switches from region clusters to individual samples at this zoom
+SAMPLE_MIN_ZOOM = 7
+MAX_ZOOM = 22
+
+CRS = {"type": "name", "properties": {"name": "urn:ogc:def:crs:OGC:1.3:CRS84"}}
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+
+def get_map_version(application_name: str) -> str:
+    """
+    Changes whenever a sample of the application is added, removed or updated.
+    Site edits bump their samples' updated_at through the migration 0020 trigger.
+    """
+    stats = Sample.objects.filter(site__applications__name=application_name).aggregate(
+        updated=Max("updated_at"),
+        samples=Count("id", distinct=True),
+        sites=Count("site_id", distinct=True),
+    )
+    updated = stats["updated"].isoformat() if stats["updated"] else ""
+    return f"{updated}:{stats['samples']}:{stats['sites']}"
+
+
+def build_leaflet_map(application_name: str) -> dict:
+    """Runs the leaflet query and pre-encodes the response body"""
+    payload = run_query(leafletmap_query(application_name))
+    # The endpoint has always returned the GeoJSON document as a JSON string,
+    # which map.js parses a second time
+    body = json.dumps(payload[0][0]).encode("utf-8")
+    etag = hashlib.sha256(body).hexdigest()[:32]
+    return {
+        "etag": etag,
+        "identity": body,
+        "gzip": gzip.compress(body, compresslevel=9),
+        "br": brotli.compress(body) if brotli else None,
+    }
+
+
+def get_leaflet_map(application_name: str) -> dict:
+    """Cached leaflet map body and its encodings for the current map version"""
+    cache = caches["maps"]
+    key = f"leaflet_map:{application_name}:{get_map_version(application_name)}"
+    entry = cache.get(key)
+    if entry is None:
+        entry = build_leaflet_map(application_name)
+        cache.set(key, entry)
+    return entry
+
+
+def tile_bbox(z: int, x: int, y: int) -> tuple:
+    """(west, south, east, north) of a web mercator z/x/y tile"""
+    n = 2**z
+    if not (0 <= z <= MAX_ZOOM and 0 <= x < n and 0 <= y < n):
+        raise ValueError(f"No tile {z}/{x}/{y}")
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360 - 180, lat(y + 1), (x + 1) / n * 360 - 180, lat(y)
+
+
+def bbox_polygons(west: float, south: float, east: float, north: float) -> list[str]:
+    """
+    WKT polygons covering a bbox in MySQL's lat/lon axis order for SRID 4326.
+    Boxes crossing the antimeridian or wider than 180 degrees are split, since
+    a geographic polygon edge always takes the shorter way round.
+    """
+    south, north = max(south, -90), min(north, 90)
+    if south >= north:
+        raise ValueError("bbox south must be below north")
+    if east - west >= 360:
+        west, east = -180, 180
+    elif west > east:
+        return bbox_polygons(west, south, 180, north) + bbox_polygons(
+            -180, south, east, north
+        )
+    if east - west > 180:
+        middle = (west + east) / 2
+        return bbox_polygons(west, south, middle, north) + bbox_polygons(
+            middle, south, east, north
+        )
+    return [
+        f"POLYGON(({south} {west}, {north} {west}, {north} {east}, "
+        f"{south} {east}, {south} {west}))"
+    ]
+
+
+def cluster_precision(zoom: int) -> int:
+    """Geohash length used to cluster samples at a zoom level"""
+    return min(1 + zoom // 2, 6)
+
+
+def _feature_collection(name: str, features: list) -> dict:
+    return {"type": "FeatureCollection", "name": name, "crs": CRS, "features": features}
+
+
+def _point(lon, lat) -> dict:
+    return {"type": "Point", "coordinates": [float(lon), float(lat)]}
+
+
+def build_map_viewport(application_name: str, bbox: tuple, zoom: int) -> dict:
+    """
+    Region clusters and, from SAMPLE_MIN_ZOOM on, the samples inside bbox in the
+    same shape as the full leaflet map payload
+    """
+    polygons = bbox_polygons(*bbox)
+    clusters = run_query(
+        leafletmap_tile_clusters_query(
+            application_name, polygons, cluster_precision(zoom)
+        )
+    )
+    regions = [
+        {
+            "type": "Feature",
+            "geometry": _point(lon, lat),
+            "properties": {"region": geohash, "nsamples": nsamples},
+        }
+        for geohash, lon, lat, nsamples in clusters
+    ]
+
+    samples = []
+    if zoom >= SAMPLE_MIN_ZOOM:
+        rows = run_query(
+            leafletmap_tile_samples_query(application_name, polygons), as_dicts=True
+        )
+        samples = [
+            {
+                "type": "Feature",
+                "geometry": _point(row["lon"], row["lat"]),
+                "properties": {
+                    "sample_name": row["sample_name"],
+                    "what": row["what"],
+                    "site": row["site_shortname"],
+                    "site_longname": row["site_longname"],
+                    "site_id": row["site_id"],
+                    "region": row["region"],
+                },
+            }
+            for row in rows
+        ]
+
+    return {
+        "regions": _feature_collection("ICED_regions", regions),
+        "samples": _feature_collection("ICED_samples", samples),
+    }
+
+
+def get_map_tile(application_name: str, z: int, x: int, y: int) -> dict:
+    """Cached viewport payload for one z/x/y tile at the current map version"""
+    cache = caches["maps"]
+    key = f"leaflet_tile:{application_name}:{get_map_version(application_name)}:{z}/{x}/{y}"
+    tile = cache.get(key)
+    if tile is None:
+        tile = build_map_viewport(application_name, tile_bbox(z, x, y), z)
+        cache.set(key, tile)
+    return tile
@@ -1,5 +1,5 @@
-def leafletmap_query(application_name):
-    return f"""
+def leafletmap_query(application_name: str) -> tuple[str, list]:
+    sql = """
 with data as (
 select samples.name as sample_name,
                      samples.lat_DD as lat,
@@ -15,7 +15,7 @@ select samples.name as sample_name,
                      left join base_region siteregions on siteregions.id = sites.region_id
                      left join base_application_sites cas on cas.site_id = sites.id
                      left join base_application application on application.id = cas.application_id
-where application.name = '{application_name}'
+where application.name = %s
 ), hash_records as (
 select ST_GeoHash(lon, lat, 2) as geohash,
     lon,
@@ -63,3 +63,59 @@ select ST_GeoHash(lon, lat, 2) as geohash,
     from sample_data
 )select JSON_OBJECT("regions", region_json.data, "samples", sample_json.data) from region_json, sample_json
 """
+
+    return sql, [application_name]
+
+
+def _viewport_filter(polygon_count: int) -> str:
+    # coord is stored lat/lon (see migration 0015), so the polygons are too
+    return " or ".join(
+        ["MBRContains(ST_GeomFromText(%s, 4326), samples.coord)"] * polygon_count
+    )
+
+
+def leafletmap_tile_clusters_query(
+    application_name: str, polygons: list[str], precision: int
+) -> tuple[str, list]:
+    sql = f"""
+select ST_GeoHash(samples.lon_DD, samples.lat_DD, %s) as geohash,
+       round(avg(samples.lon_DD), 5) as lon,
+       round(avg(samples.lat_DD), 5) as lat,
+       count(*) as nsamples
+from base_sample samples
+         join base_application_sites cas on cas.site_id = samples.site_id
+         join base_application application on application.id = cas.application_id
+where application.name = %s
+  and samples.lat_DD is not null
+  and samples.lon_DD is not null
+  and ({_viewport_filter(len(polygons))})
+group by geohash
+"""
+
+    return sql, [precision, application_name, *polygons]
+
+
+def leafletmap_tile_samples_query(
+    application_name: str, polygons: list[str]
+) -> tuple[str, list]:
+    sql = f"""
+select samples.name as sample_name,
+       round(samples.lon_DD, 5) as lon,
+       round(samples.lat_DD, 5) as lat,
+       samples.what as what,
+       sites.short_name as site_shortname,
+       sites.name as site_longname,
+       sites.id as site_id,
+       siteregions.name as region
+from base_sample samples
+         join base_site sites on sites.id = samples.site_id
+         left join base_region siteregions on siteregions.id = sites.region_id
+         join base_application_sites cas on cas.site_id = sites.id
+         join base_application application on application.id = cas.application_id
+where application.name = %s
+  and samples.lat_DD is not null
+  and samples.lon_DD is not null
+  and ({_viewport_filter(len(polygons))})
+"""
+
+    return sql, [application_name, *polygons]
@@ -0,0 +1,143 @@
+"""
+In-memory name index behind the search endpoint. Each worker keeps one index per
+application and rebuilds it when a signal bumps the search version, or at the
+latest after SEARCH_INDEX_TIMEOUT for edits made by other processes.
+"""
+import bisect
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import quote
+
+from base.models import Core, CoreSample, Sample, Site
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY = "search_index:version"
+
+# Page of each kind of name, relative to the application
+KIND_PATHS = {
+    "site": "site/{name}/",
+    "sample": "sample/{name}/",
+    "core": "core/{name}/",
+    "coresample": "coresample/{name}",
+}
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def get_version() -> str:
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = invalidate()
+    return version
+
+
+def invalidate() -> str:
+    version = str(time.time_ns())
+    cache.set(VERSION_KEY, version, None)
+    return version
+
+
+def _trigrams(text: str) -> set:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+class NameIndex:
+    """
+    Names sorted case-insensitively for prefix lookups by bisection, with a
+    trigram index for substring lookups
+    """
+
+    def __init__(self, entries: list[tuple[str, str]]):
+        self.entries = sorted(entries, key=lambda e: (e[0].lower(), e[1]))
+        self.keys = [name.lower() for name, _ in self.entries]
+        trigrams = defaultdict(list)
+        for position, key in enumerate(self.keys):
+            for trigram in _trigrams(key):
+                trigrams[trigram].append(position)
+        self.trigrams = dict(trigrams)
+
+    def prefix(self, query: str, limit: int) -> list[int]:
+        found = []
+        position = bisect.bisect_left(self.keys, query)
+        while (
+            len(found) < limit
+            and position < len(self.keys)
+            and self.keys[position].startswith(query)
+        ):
+            found.append(position)
+            position += 1
+        return found
+
+    def substring(self, query: str) -> list[int]:
+        """Positions of names containing query, which needs at least 3 characters"""
+        postings = sorted(
+            (self.trigrams.get(trigram, []) for trigram in _trigrams(query)), key=len
+        )
+        if not postings:
+            return []
+        candidates = set(postings[0]).intersection(*postings[1:])
+        return sorted(p for p in candidates if query in self.keys[p])
+
+    def search(self, query: str, limit: int, kind: str = None) -> list[tuple[str, str]]:
+        """Prefix matches first, then other substring matches, alphabetically"""
+        query = query.strip().lower()
+        if not query:
+            return []
+        found = self.prefix(query, len(self.keys) if kind else limit)
+        if len(query) >= 3:
+            prefixed = set(found)
+            found += [p for p in self.substring(query) if p not in prefixed]
+        results = (self.entries[p] for p in found)
+        if kind:
+            results = (entry for entry in results if entry[1] == kind)
+        return [entry for entry, _ in zip(results, range(limit))]
+
+
+def build_index(application) -> NameIndex:
+    sites = Site.objects.filter(applications=application)
+    names = [
+        (sites.values_list("short_name", flat=True), "site"),
+        (Sample.objects.filter(site__in=sites).values_list("name", flat=True), "sample"),
+        (Core.objects.filter(site__in=sites).values_list("name", flat=True), "core"),
+        (
+            CoreSample.objects.filter(core__site__in=sites).values_list("name", flat=True),
+            "coresample",
+        ),
+    ]
+    return NameIndex([(name, kind) for query, kind in names for name in query if name])
+
+
+def get_index(application) -> NameIndex:
+    """This worker's index of the application, rebuilt when out of date"""
+    version = get_version()
+
+    def current(entry):
+        return (
+            entry is not None
+            and entry[0] == version
+            and time.monotonic() - entry[1] < settings.SEARCH_INDEX_TIMEOUT
+        )
+
+    entry = _indexes.get(application.id)
+    if not current(entry):
+        with _lock:
+            entry = _indexes.get(application.id)
+            if not current(entry):
+                entry = (version, time.monotonic(), build_index(application))
+                _indexes[application.id] = entry
+    return entry[2]
+
+
+def search_names(application, query: str, limit: int, kind: str = None) -> list[dict]:
+    prefix = f"/{application.name.lower()}/"
+    return [
+        {
+            "name": name,
+            "type": entry_kind,
+            "url": prefix + KIND_PATHS[entry_kind].format(name=quote(name)),
+        }
+        for name, entry_kind in get_index(application).search(query, limit, kind)
+    ]
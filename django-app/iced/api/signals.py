@@ -0,0 +1,19 @@
+from base.models import Application, Core, CoreSample, Sample, Site
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from . import search
+
+
+@receiver(post_save, sender=Site)
+@receiver(post_delete, sender=Site)
+@receiver(post_save, sender=Sample)
+@receiver(post_delete, sender=Sample)
+@receiver(post_save, sender=Core)
+@receiver(post_delete, sender=Core)
+@receiver(post_save, sender=CoreSample)
+@receiver(post_delete, sender=CoreSample)
+@receiver(m2m_changed, sender=Application.sites.through)
+def invalidate_search_index(sender, **kwargs):
+    transaction.on_commit(search.invalidate)
@@ -1,3 +1,77 @@
-# from django.test import TestCase
+from django.test import SimpleTestCase
 
-# Create your tests here.
+from api.export import stream_csv, stream_ndjson
+from api.kml import _placemark
+from api.map_data import bbox_polygons, tile_bbox
+from api.search import NameIndex
+
+
+class MapViewportTestCase(SimpleTestCase):
+    def test_tile_bbox(self):
+        """Tile 1/0/0 is the north-western quarter of the web mercator world"""
+        west, south, east, north = tile_bbox(1, 0, 0)
+        self.assertEqual((west, south, east), (-180, 0, 0))
+        self.assertAlmostEqual(north, 85.0511, places=4)
+        with self.assertRaises(ValueError):
+            tile_bbox(1, 2, 0)
+
+    def test_bbox_polygons_split_at_antimeridian(self):
+        """Boxes crossing 180 degrees become one polygon per side, lat first"""
+        polygons = bbox_polygons(170, -80, -170, -70)
+        self.assertEqual(len(polygons), 2)
+        self.assertTrue(polygons[0].startswith("POLYGON((-80 170,"))
+        self.assertTrue(polygons[1].startswith("POLYGON((-80 -180,"))
+
+
+class NameIndexTestCase(SimpleTestCase):
+    def setUp(self):
+        self.index = NameIndex(
+            [
+                ("MT-ACHERNAR", "site"),
+                ("10-ACH-001", "sample"),
+                ("ACH-002", "sample"),
+                ("ach-core-1", "core"),
+                ("BEARDMORE", "site"),
+            ]
+        )
+
+    def test_prefix_before_substring(self):
+        """Case-insensitive prefix matches come first, then substring matches"""
+        names = [name for name, _ in self.index.search("Ach", 10)]
+        self.assertEqual(names, ["ACH-002", "ach-core-1", "10-ACH-001", "MT-ACHERNAR"])
+
+    def test_short_queries_only_match_prefixes(self):
+        """Queries under three characters skip the trigram lookup"""
+        self.assertEqual(self.index.search("ch", 10), [])
+
+    def test_type_and_limit(self):
+        """Results can be restricted to one type and are cut at limit"""
+        self.assertEqual(self.index.search("ach", 1, "sample"), [("ACH-002", "sample")])
+
+
+class ExportStreamTestCase(SimpleTestCase):
+    columns = [("name", "name", None), ("elv_m", "elv_m", None)]
+
+    def test_csv_stream(self):
+        """CSV chunks share one header row and an empty export still has it"""
+        chunks = [[("A-1", 100.0)], [("A-2", None)]]
+        self.assertEqual(
+            "".join(stream_csv(iter(chunks), self.columns)).splitlines(),
+            ["name,elv_m", "A-1,100.0", "A-2,"],
+        )
+        self.assertEqual("".join(stream_csv(iter([]), self.columns)), "name,elv_m\r\n")
+
+    def test_ndjson_stream(self):
+        """Every row is one JSON object on its own line"""
+        body = "".join(stream_ndjson(iter([[("A-1", 100.0)]]), self.columns))
+        self.assertEqual(body, '{"name": "A-1", "elv_m": 100.0}\n')
+
+
+class KMLTestCase(SimpleTestCase):
+    def test_placemark_extended_data(self):
+        """Attributes go to escaped ExtendedData and empty ones are left out"""
+        placemark = _placemark("A&B", 160.5, -77.25, [("site", "<x>"), ("elv_m", None)])
+        self.assertIn("<name>A&amp;B</name>", placemark)
+        self.assertIn('<Data name="site"><value>&lt;x&gt;</value></Data>', placemark)
+        self.assertNotIn("elv_m", placemark)
+        self.assertIn("<coordinates>160.5,-77.25</coordinates>", placemark)
@@ -8,6 +8,18 @@ urlpatterns = [
     path("calculations/name/<str:name>", views.GetCalculationByName.as_view()),
     path("calculations/run/<str:name>", views.RunCalculationByName.as_view()),
     path("leaflet_map/<str:application_name>", views.GetLeafletMapData.as_view()),
+    path(
+        "leaflet_map/<str:application_name>/tiles/<int:z>/<int:x>/<int:y>",
+        views.GetLeafletMapViewport.as_view(),
+    ),
+    path(
+        "leaflet_map/<str:application_name>/bbox",
+        views.GetLeafletMapViewport.as_view(),
+    ),
+    path("search/<str:application_name>", views.SearchNames.as_view()),
+    path("depth_profiles/<str:application_name>", views.DepthProfiles.as_view()),
+    path("export/<str:application_name>", views.ExportApplication.as_view()),
+    path("kml/<str:application_name>", views.GetApplicationKML.as_view()),
     path("kml/samples/<str:sample_ids>", views.GetSampleKMLs().as_view()),
     path("kml/coresamples/<str:sample_ids>", views.GetCoresampleKMLs().as_view()),
 ]
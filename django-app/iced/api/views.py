@@ -1,22 +1,26 @@
 import json
 import sys
 
-import requests
-import simplekml
-import xmltodict
 from api.serializers import CalculationsSerializer
-from base.models import Calculation, CoreSample, Sample
-from django.db import connection
-from django.http import HttpResponse
+from base.calculations import CalculationError, run_calculation
+from base.models import Application, Calculation, Core
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.http.response import Http404
 from django.utils.http import urlencode
 from rest_framework import generics, permissions
 from rest_framework.decorators import permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_xml.renderers import XMLRenderer
 
-from .queries import leafletmap_query
+from . import export, kml
+from .map_data import (
+    MAX_ZOOM,
+    SAMPLE_MIN_ZOOM,
+    build_map_viewport,
+    get_leaflet_map,
+    get_map_tile,
+)
+from .search import KIND_PATHS, search_names
 
 
 class CalculationsList(generics.ListAPIView):
@@ -57,93 +61,276 @@ class RunCalculationByName(APIView):
 
     def get(self, request, name, format=None):
         calculation = self.get_object(name)
-        serializer = CalculationsSerializer(calculation)
-        calculationServiceEndpoint = serializer.data["calculation_service_endpoint"]
 
         form_fields = json.loads(request.body)
 
-        response = requests.post(calculationServiceEndpoint, form_fields)
+        try:
+            result = run_calculation(calculation, form_fields)
+        except CalculationError as e:
+            return Response({"error": str(e)}, status=502)
 
-        xml = xmltodict.parse(response.text)
+        return Response(result.as_items())
 
-        xml_items = list(xml.items())
 
-        return Response(xml_items)
+def _accepted_encoding(request, entry: dict) -> str:
+    accept_encoding = request.META.get("HTTP_ACCEPT_ENCODING", "")
+    accepted = {part.split(";")[0].strip() for part in accept_encoding.split(",")}
+    if entry["br"] is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return "identity"
 
 
 @permission_classes((permissions.AllowAny,))
 class GetLeafletMapData(APIView):
     def get_object(self, application_name):
         try:
-            sql_statement = leafletmap_query(application_name)
-            with connection.cursor() as c:
-                c.execute(sql_statement)
-                return c.fetchall()
+            return get_leaflet_map(application_name)
         except Exception as e:
             print(e)
-            return {}
+            return None
 
     def get(self, request, application_name, format=None):
-        payload = self.get_object(application_name)
-        return Response(payload[0][0], headers={
-            'Access-Control-Allow-Origin': '*'
-        })
+        entry = self.get_object(application_name)
+        if entry is None:
+            return Response({}, status=500, headers={"Access-Control-Allow-Origin": "*"})
+
+        encoding = _accepted_encoding(request, entry)
+        etag = f'"{entry["etag"]}"' if encoding == "identity" else f'"{entry["etag"]}-{encoding}"'
+        headers = {
+            "ETag": etag,
+            "Vary": "Accept-Encoding",
+            "Cache-Control": "public, no-cache",
+            "Access-Control-Allow-Origin": "*",
+        }
+
+        if_none_match = request.META.get("HTTP_IF_NONE_MATCH", "")
+        if if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]:
+            return HttpResponse(status=304, headers=headers)
+
+        response = HttpResponse(entry[encoding], content_type="application/json", headers=headers)
+        if encoding != "identity":
+            response["Content-Encoding"] = encoding
+        return response
 
 
 @permission_classes((permissions.AllowAny,))
-class GetSampleKMLs(APIView):
-    renderer_classes = (XMLRenderer,)
+class GetLeafletMapViewport(APIView):
+    """
+    Samples and clusters inside one map viewport, given either as a z/x/y tile
+    or as ?bbox=west,south,east,north&zoom=z
+    """
 
-    def get_object(self, sample_ids):
+    def get(self, request, application_name, z=None, x=None, y=None, format=None):
+        headers = {"Access-Control-Allow-Origin": "*"}
         try:
-            ids = sample_ids.split(",")
-            ids = [int(id) for id in ids if id != ""]
-            kml = simplekml.Kml()
-            samples = Sample.objects.filter(id__in=ids)
-            for sample in samples:
-                kml.newpoint(name=sample.name, coords=[(sample.lon_DD, sample.lat_DD)])
-
-            return kml
-        except Exception as e:
-            print(e)
-            return {}
+            if z is not None:
+                payload = get_map_tile(application_name, z, x, y)
+            else:
+                bbox = tuple(float(v) for v in request.GET["bbox"].split(","))
+                zoom = int(request.GET.get("zoom", SAMPLE_MIN_ZOOM))
+                if len(bbox) != 4 or not 0 <= zoom <= MAX_ZOOM:
+                    raise ValueError("bbox needs west,south,east,north and a valid zoom")
+                payload = build_map_viewport(application_name, bbox, zoom)
+        except (KeyError, ValueError) as e:
+            return Response({"error": str(e)}, status=400, headers=headers)
 
-    def get(self, request, sample_ids, format=None):
-        payload = self.get_object(sample_ids)
-        content = payload.kml()
-        response = HttpResponse(
-            content, content_type="application/vnd.google-earth.kml+xml"
+        return Response(payload, headers=headers)
+
+
+@permission_classes((permissions.AllowAny,))
+class SearchNames(APIView):
+    """
+    Type-ahead search over the site, sample, core and core sample names of an
+    application: ?q=text[&type=sample][&limit=20]
+    """
+
+    MAX_LIMIT = 100
+
+    def get(self, request, application_name, format=None):
+        headers = {"Access-Control-Allow-Origin": "*"}
+        application = Application.get_application_by_name(application_name)
+        if application is None:
+            return Response({"error": "Unknown application"}, status=404, headers=headers)
+
+        kind = request.GET.get("type") or None
+        try:
+            limit = int(request.GET.get("limit", 20))
+            if kind is not None and kind not in KIND_PATHS:
+                raise ValueError(f"type must be one of {', '.join(KIND_PATHS)}")
+            if not 0 < limit <= self.MAX_LIMIT:
+                raise ValueError(f"limit must be between 1 and {self.MAX_LIMIT}")
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400, headers=headers)
+
+        results = search_names(application, request.GET.get("q", ""), limit, kind)
+        return Response({"results": results}, headers=headers)
+
+
+@permission_classes((permissions.AllowAny,))
+class DepthProfiles(APIView):
+    """
+    Nuclide concentration depth profiles of up to MAX_CORES cores of an application
+    in columnar arrays, read with one query: ?core=name[&core=name...]
+    """
+
+    MAX_CORES = 100
+
+    def get(self, request, application_name, format=None):
+        headers = {"Access-Control-Allow-Origin": "*"}
+        application = Application.get_application_by_name(application_name)
+        if application is None:
+            return Response({"error": "Unknown application"}, status=404, headers=headers)
+
+        names = request.GET.getlist("core")
+        if not 0 < len(names) <= self.MAX_CORES:
+            return Response(
+                {"error": f"Give between 1 and {self.MAX_CORES} core names as ?core="},
+                status=400,
+                headers=headers,
+            )
+
+        cores = dict(
+            Core.objects.filter(site__applications=application, name__in=names)
+            .values_list("id", "name")
+            .distinct()
         )
-        response["Content-Disposition"] = 'attachment; filename="samples.kml"'
+        profiles = Core.get_depth_profiles(list(cores))
+        return Response(
+            {
+                "cores": {
+                    cores[core_id]: profile.as_columns()
+                    for core_id, profile in profiles.items()
+                }
+            },
+            headers=headers,
+        )
+
+
+@permission_classes((permissions.AllowAny,))
+class ExportApplication(APIView):
+    """
+    Streams the samples (or ?table=<nuclide table>|calculated_ages) of an
+    application as CSV, NDJSON or Parquet, chosen by ?format= or Accept
+    """
+
+    renderer_classes = (
+        export.CSVRenderer,
+        export.NDJSONRenderer,
+        export.ParquetRenderer,
+    )
+
+    def get(self, request, application_name, format=None):
+        headers = {"Access-Control-Allow-Origin": "*"}
+        application = Application.get_application_by_name(application_name)
+        if application is None:
+            return JsonResponse({"error": "Unknown application"}, status=404, headers=headers)
+
+        table = request.GET.get("table", "samples")
+        if table not in export.EXPORT_TABLES:
+            return JsonResponse(
+                {"error": f"table must be one of {', '.join(export.EXPORT_TABLES)}"},
+                status=400,
+                headers=headers,
+            )
+
+        renderer = request.accepted_renderer
+        if renderer.format == "parquet" and export.pyarrow is None:
+            return JsonResponse(
+                {"error": "Parquet export is not available on this server"},
+                status=501,
+                headers=headers,
+            )
+
+        model = export.EXPORT_TABLES[table]
+        columns = export.export_columns(model)
+        chunks = export.export_chunks(
+            export.application_rows(model, application),
+            [lookup for _, lookup, _ in columns],
+        )
+        response = StreamingHttpResponse(
+            export.STREAMS[renderer.format](chunks, columns),
+            content_type=renderer.media_type,
+            headers=headers,
+        )
+        filename = f"{application.name.lower()}_{table}.{renderer.format}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
         return response
 
 
+def _kml_response(request, kind: str, rows, document_name: str) -> StreamingHttpResponse:
+    renderer = request.accepted_renderer
+    response = StreamingHttpResponse(
+        kml.kml_response_body(renderer.format, kind, rows, document_name),
+        content_type=renderer.media_type,
+    )
+    filename = f"{document_name}.{renderer.format}"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+def _parse_ids(ids: str) -> list[int]:
+    return [int(id) for id in ids.split(",") if id != ""]
+
+
 @permission_classes((permissions.AllowAny,))
-class GetCoresampleKMLs(APIView):
-    renderer_classes = (XMLRenderer,)
-
-    class GetSampleKMLs(APIView):
-        def get_object(self, sample_ids):
-            try:
-                ids = sample_ids.split(",")
-                ids = [int(id) for id in ids if id != ""]
-                kml = simplekml.Kml()
-                samples = CoreSample.objects.filter(id__in=ids)
-                for sample in samples:
-                    kml.newpoint(
-                        name=sample.name, coords=[sample.lon_DD, sample.lat_idd]
-                    )
-
-                return kml
-            except Exception as e:
-                print(e)
-                return {}
-
-        def get(self, request, sample_ids, format=None):
-            payload = self.get_object(sample_ids)
-            content = payload.kml()
-            response = HttpResponse(
-                content, content_type="application/vnd.google-earth.kml+xml"
+class GetApplicationKML(APIView):
+    """
+    Samples (or ?type=coresamples) of an application as KML or KMZ, optionally
+    restricted by ?site=short_name, ?publication=id and ?bbox=west,south,east,north
+    """
+
+    renderer_classes = (kml.KMLRenderer, kml.KMZRenderer)
+
+    def get(self, request, application_name, format=None):
+        application = Application.get_application_by_name(application_name)
+        if application is None:
+            return JsonResponse({"error": "Unknown application"}, status=404)
+
+        kind = request.GET.get("type", "samples")
+        try:
+            if kind not in kml.KINDS:
+                raise ValueError(f"type must be one of {', '.join(kml.KINDS)}")
+            publication = request.GET.get("publication")
+            bbox = request.GET.get("bbox")
+            if bbox is not None:
+                bbox = tuple(float(v) for v in bbox.split(","))
+                if len(bbox) != 4:
+                    raise ValueError("bbox needs west,south,east,north")
+            rows = kml.kml_rows(
+                kind,
+                application=application,
+                site=request.GET.get("site"),
+                publication=int(publication) if publication is not None else None,
+                bbox=bbox,
             )
-            response["Content-Disposition"] = 'attachment; filename="samples.kml"'
-            return response
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+        return _kml_response(request, kind, rows, f"{application.name.lower()}_{kind}")
+
+
+@permission_classes((permissions.AllowAny,))
+class GetSampleKMLs(APIView):
+    renderer_classes = (kml.KMLRenderer, kml.KMZRenderer)
+
+    def get(self, request, sample_ids, format=None):
+        try:
+            ids = _parse_ids(sample_ids)
+        except ValueError:
+            return JsonResponse({"error": "sample ids must be integers"}, status=400)
+        return _kml_response(request, "samples", kml.kml_rows("samples", ids=ids), "samples")
+
+
+@permission_classes((permissions.AllowAny,))
+class GetCoresampleKMLs(APIView):
+    renderer_classes = (kml.KMLRenderer, kml.KMZRenderer)
+
+    def get(self, request, sample_ids, format=None):
+        try:
+            ids = _parse_ids(sample_ids)
+        except ValueError:
+            return JsonResponse({"error": "core sample ids must be integers"}, status=400)
+        rows = kml.kml_rows("coresamples", ids=ids)
+        return _kml_response(request, "coresamples", rows, "coresamples")
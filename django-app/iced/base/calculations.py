@@ -1,7 +1,127 @@
+import json
 import os
+import threading
 import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from xml.parsers.expat import ExpatError
 
 import requests
+import xmltodict
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class CalculationError(Exception):
+    """The calculator could not be reached or returned something other than XML"""
+
+
+@dataclass
+class CalculationResult:
+    """Parsed calculator response: the XML root tag and its contents"""
+
+    root: str
+    data: dict = field(default_factory=dict)
+
+    @staticmethod
+    def from_xml(xml_data: str) -> "CalculationResult":
+        try:
+            parsed = xmltodict.parse(xml_data)
+        except ExpatError as e:
+            raise CalculationError(f"Calculator returned invalid XML - {e}")
+        root, data = next(iter(parsed.items()))
+        return CalculationResult(root=root, data=data or {})
+
+    @property
+    def exposure_age_results(self):
+        return self.data.get("exposureAgeResult", [])
+
+    @property
+    def plot_url_stubs(self) -> list:
+        plots = self.data.get("ploturlstub", [])
+        return [plots] if isinstance(plots, str) else plots
+
+    @property
+    def diagnostics(self):
+        return self.data.get("diagnostics", [])
+
+    def as_items(self) -> list:
+        # Shape returned by the calculations/run API since it used xmltodict directly
+        return [[self.root, self.data]]
+
+
+class SampleNameIndex:
+    """
+    Resolves calculator result names to the ids of the samples they were calculated
+    for. Cl-36 inputs name each aliquot as the sample name followed by the aliquot,
+    so the longest sample name a result name starts with is its sample.
+    """
+
+    def __init__(self, sample_names: dict):
+        # sample_names maps sample ids to sample names
+        self.ids = {name: sample_id for sample_id, name in sample_names.items()}
+        self.lengths = sorted({len(name) for name in self.ids}, reverse=True)
+
+    def resolve(self, result_name: str):
+        for length in self.lengths:
+            sample_id = self.ids.get(result_name[:length])
+            if sample_id is not None:
+                return sample_id
+        return None
+
+
+def get_session() -> requests.Session:
+    """Shared keep-alive session for calculator requests, with retries"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            # A read timeout means the calculator is already busy with the request,
+            # so only connection errors and 5xx responses are retried
+            retries = Retry(
+                total=settings.CALCULATOR_RETRIES,
+                read=0,
+                backoff_factor=0.5,
+                status_forcelist=(500, 502, 503, 504),
+                allowed_methods=frozenset(["POST"]),
+            )
+            adapter = HTTPAdapter(
+                pool_connections=2,
+                pool_maxsize=settings.CALCULATOR_POOL_SIZE,
+                max_retries=retries,
+            )
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+    return _session
+
+
+def run_calculation(calculation, form_fields: dict) -> CalculationResult:
+    """POST form_fields to the calculator behind a Calculation and parse the XML"""
+    try:
+        response = get_session().post(
+            calculation.calculation_service_endpoint,
+            data=form_fields,
+            timeout=(
+                settings.CALCULATOR_CONNECT_TIMEOUT,
+                settings.CALCULATOR_READ_TIMEOUT,
+            ),
+        )
+        response.raise_for_status()
+    except requests.RequestException as e:
+        raise CalculationError(f"Calculation {calculation.name} failed - {e}")
+    return CalculationResult.from_xml(response.text)
+
+
+def run_calculation_text(calculation, text_block: str, summary: str) -> CalculationResult:
+    """Runs a calculator text block with the Calculation's stored variables"""
+    form_fields = json.loads(calculation.variable_json)
+    form_fields["summary"] = summary
+    form_fields["text_block"] = text_block
+    return run_calculation(calculation, form_fields)
 
 
 def xml_to_form_v3(xml_data, all_sample_mapped):
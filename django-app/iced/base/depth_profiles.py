@@ -0,0 +1,86 @@
+"""
+Nuclide concentration depth profiles of cores in columnar arrays, read for any
+number of cores with one query
+"""
+from dataclasses import dataclass, fields
+
+import numpy as np
+
+from .queries import depth_profile_query, run_query
+
+# Nuclides of the depth profiles, in the order the core page lists them, with the
+# concentration keys of their rows in the depth/nuclide data tables
+DEPTH_PROFILE_NUCLIDES = {
+    "Al-26 (qtz)": ("n26_atoms_g", "deln26_atoms_g"),
+    "Be-10 (qtz)": ("n10_atoms_g", "deln10_atoms_g"),
+    "Ne-21 (qtz)": ("n21_atoms_g", "deln21_atoms_g"),
+}
+
+
+@dataclass
+class DepthProfile:
+    """One row per measurement and depth interval, sorted by nuclide and top depth"""
+
+    nuclide: np.ndarray
+    top_depth_cm: np.ndarray
+    bot_depth_cm: np.ndarray
+    top_depth_gcm2: np.ndarray
+    bot_depth_gcm2: np.ndarray
+    N: np.ndarray
+    dN: np.ndarray
+    count: np.ndarray
+
+    def __len__(self):
+        return len(self.nuclide)
+
+    @staticmethod
+    def from_rows(rows: list) -> "DepthProfile":
+        """Rows of depth_profile_query without their core id column"""
+        columns = list(zip(*rows)) or [()] * 8
+        nuclide, *values, count = columns
+        return DepthProfile(
+            np.array(nuclide, dtype=object),
+            # None becomes NaN
+            *(np.array(column, dtype=float) for column in values),
+            np.array(count, dtype=int),
+        )
+
+    def as_columns(self) -> dict:
+        """Plain lists for JSON, with NaN as null"""
+        return {
+            f.name: [
+                None if isinstance(v, float) and v != v else v
+                for v in getattr(self, f.name).tolist()
+            ]
+            for f in fields(self)
+        }
+
+    def as_records(self) -> dict:
+        """Rows of each nuclide as dicts, or None without any, for the data tables"""
+        columns = self.as_columns()
+        records = {}
+        for row in zip(*columns.values()):
+            row = dict(zip(columns, row))
+            n_key, dn_key = DEPTH_PROFILE_NUCLIDES[row["nuclide"]]
+            records.setdefault(row["nuclide"], []).append(
+                {
+                    "top_depth_cm": row["top_depth_cm"],
+                    "bot_depth_cm": row["bot_depth_cm"],
+                    "top_depth_gcm2": row["top_depth_gcm2"],
+                    "bot_depth_gcm2": row["bot_depth_gcm2"],
+                    n_key: row["N"],
+                    dn_key: row["dN"],
+                    "count": row["count"],
+                }
+            )
+        return {nuclide: records.get(nuclide) for nuclide in DEPTH_PROFILE_NUCLIDES}
+
+
+def get_depth_profiles(core_ids) -> dict:
+    """Depth profile of each core id, empty for cores without measurements"""
+    if not core_ids:
+        return {}
+    rows_by_core = {core_id: [] for core_id in core_ids}
+    for core_id, *row in run_query(depth_profile_query(core_ids)):
+        rows_by_core[core_id].append(row)
+    return {core_id: DepthProfile.from_rows(rows) for core_id, rows in rows_by_core.items()}
@@ -0,0 +1,116 @@
+"""
+Exposure-age tables and Gaussian kernel density estimates for the summary plots
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+MIN_GRID_POINTS = 400
+MAX_GRID_POINTS = 4000
+# Grid points per standard deviation of the narrowest kernel
+POINTS_PER_SIGMA = 4
+# Kernels evaluated at once, bounds the working memory to BLOCK_SIZE grid rows
+BLOCK_SIZE = 256
+
+
+@dataclass
+class AgeTable:
+    """One row per nonzero LSDn exposure age, in columnar arrays"""
+
+    t: np.ndarray
+    dti: np.ndarray
+    dte: np.ndarray
+    nuclide: np.ndarray
+    # Calculator result name: the sample name, with an aliquot suffix for Cl-36
+    name: np.ndarray
+    # Index of the result's sample in the sample ids given to collect_ages
+    sample: np.ndarray
+
+    def __len__(self):
+        return len(self.t)
+
+
+def _lsd_ages(age_results: dict, sample_index: dict):
+    # Results whose sample could not be resolved are left out of the plots
+    for name, result in (age_results or {}).items():
+        sample = sample_index.get(result.get("sample_id"))
+        if sample is None:
+            continue
+        for nuclide, ages in result["LSD"].items():
+            for age in ages:
+                if age[0] != "0":
+                    yield name, sample, nuclide, age
+
+
+def collect_ages(v3_age_results: dict, cl36_age_results: dict, sample_ids: list) -> AgeTable:
+    """
+    Fills preallocated arrays with the v3 ages followed by the Cl-36 ages, matched
+    to the samples of sample_ids through the sample id of each result
+    """
+    sample_index = {sample_id: i for i, sample_id in enumerate(sample_ids)}
+    size = sum(1 for _ in _lsd_ages(v3_age_results, sample_index)) + sum(
+        1 for _ in _lsd_ages(cl36_age_results, sample_index)
+    )
+    table = AgeTable(
+        t=np.empty(size),
+        dti=np.empty(size),
+        dte=np.empty(size),
+        nuclide=np.empty(size, dtype=object),
+        name=np.empty(size, dtype=object),
+        sample=np.empty(size, dtype=int),
+    )
+
+    row = 0
+    for calc_type, age_results in (("v3", v3_age_results), ("cl36", cl36_age_results)):
+        for name, sample, nuclide, age in _lsd_ages(age_results, sample_index):
+            table.t[row] = int(age[0])
+            table.dti[row] = int(age[1])
+            # The Cl-36 external error is unreliable and sometimes NaN
+            table.dte[row] = int(age[2] if calc_type == "v3" else age[1])
+            table.sample[row] = sample
+            table.nuclide[row] = nuclide
+            table.name[row] = name
+            row += 1
+    return table
+
+
+def age_grid(t: np.ndarray, sigma: np.ndarray) -> np.ndarray:
+    """
+    Grid from 3 sigma below the youngest age (stopping at zero) to 3 sigma above
+    the oldest, fine enough to resolve the narrowest kernel
+    """
+    low = max((t - 3 * sigma).min(), 0)
+    high = (t + 3 * sigma).max()
+    positive = sigma[sigma > 0]
+    narrowest = positive.min() if len(positive) else high - low
+    points = np.ceil((high - low) / narrowest * POINTS_PER_SIGMA) if narrowest > 0 else 0
+    return np.linspace(low, high, int(np.clip(points, MIN_GRID_POINTS, MAX_GRID_POINTS)))
+
+
+def grouped_kde(x: np.ndarray, t: np.ndarray, sigma: np.ndarray, groups: np.ndarray, n_groups: int) -> np.ndarray:
+    """Sums of the normal kernels of each group evaluated on x, shape (n_groups, len(x))"""
+    # Zero uncertainties would give infinitely narrow kernels; use the grid step
+    step = x[1] - x[0] if len(x) > 1 else 1.0
+    sigma = np.where(sigma > 0, sigma, step)
+    curves = np.zeros((n_groups, len(x)))
+    group_ids = np.arange(n_groups)
+    for start in range(0, len(t), BLOCK_SIZE):
+        block = slice(start, start + BLOCK_SIZE)
+        s = sigma[block, None]
+        kernels = np.exp(-0.5 * ((x[None, :] - t[block, None]) / s) ** 2) / (np.sqrt(2 * np.pi) * s)
+        membership = (groups[block, None] == group_ids[None, :]).astype(float)
+        curves += membership.T @ kernels
+    return curves
+
+
+def name_rows(names: np.ndarray, t: np.ndarray) -> tuple[np.ndarray, int]:
+    """
+    Plot row of each age, keeping all ages of one result name on one row, with
+    rows ordered by the oldest age of each name. Returns the rows and their count.
+    """
+    unique_names, inverse = np.unique(names.astype(str), return_inverse=True)
+    oldest = np.full(len(unique_names), -np.inf)
+    np.maximum.at(oldest, inverse, t)
+    rank = np.empty(len(unique_names), dtype=int)
+    rank[np.argsort(oldest, kind="stable")] = np.arange(1, len(unique_names) + 1)
+    return rank[inverse], len(unique_names)
@@ -0,0 +1,27 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from base.models import Publication
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Re-parses stored BibTeX records into the publications' bibtex_fields"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of publications written per update query",
+        )
+
+    def handle(self, *args, **kwargs):
+        started = time.monotonic()
+        changed = Publication.backfill_bibtex_fields(kwargs["batch_size"])
+        logger.info(
+            f"Updated parsed BibTeX of {changed} publications in {time.monotonic() - started:.1f}s"
+        )
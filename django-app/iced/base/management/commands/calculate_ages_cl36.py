@@ -1,7 +1,5 @@
 import logging
 import os
-import requests
-import json
 
 from pathlib import Path
 from typing import Optional
@@ -9,13 +7,18 @@ from datetime import datetime
 
 from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
-from django.db import connection, transaction
+from django.db import transaction
 from django.db.models import Q
 from django.conf import settings
 
-from .calculate_ages_utils import parse_and_insert
-from base.models import Calculation, Job, Sample, CalculatedAge, Cl36
-from base.queries import cl36_calculator_string_query
+from .calculate_ages_utils import (
+    CL36_NUCLIDES,
+    CalculatedAgeWriter,
+    build_calculated_ages,
+)
+from base.calculations import run_calculation_text
+from base.models import Calculation, Job, Sample, Cl36
+from base.queries import cl36_calculator_string_query, run_query
 
 
 logname = Path.joinpath(settings.LOG_DIR, "calculate_ages_cl36")
@@ -36,9 +39,6 @@ class Command(BaseCommand):
     help = "Runs the ages calculations"
     name = "Calculate Ages CL36"
     calculation_name = "Cl36_input_v3"
-    run_calculation_endpoint = (
-        str(os.environ.get("BASE_URL")) + "/api/calculations/run/" + calculation_name
-    )
     get_calculation_endpoint = (
         str(os.environ.get("BASE_URL")) + "/api/calculations/name/" + calculation_name
     )
@@ -68,39 +68,31 @@ class Command(BaseCommand):
             else:
                 highest_id = highest_id if highest_id > temp_high else temp_high
 
-            cursor = connection.cursor()
-            sql = cl36_calculator_string_query(sample_ids)
-            cursor.execute(sql)
-
-            columns = [col[0] for col in cursor.description]
-            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            rows = run_query(cl36_calculator_string_query(sample_ids), as_dicts=True)
 
             calculation = Calculation.get_calculation_by_name(self.calculation_name)
-            params = json.loads(calculation.variable_json)
-            params[
-                "summary"
-            ] = "yes"  # Quoted from legacy_dbs code --> This is a bug in the m-file -- it will only accept 'yes'.
 
+            # Samples whose calculation fails keep their previous ages
+            parsed = {}
+            for row in rows:
+                calc_string = row['output']
+                if calc_string:
+                    try:
+                        logger.info(f"Getting calculation for {row['name']}")
+                        # Quoted from legacy_dbs code --> This is a bug in the m-file -- it will only accept 'yes'.
+                        result = run_calculation_text(calculation, calc_string, summary="yes")
+                        parsed[row['id']] = build_calculated_ages(result.exposure_age_results, row['id'])
+                        logger.info(f"Parsed {len(parsed[row['id']])} records for {row['name']}")
+                    except Exception as e:
+                        logger.warn(f"Error occurred for record {row['name']} - {e}")
+
+            writer = CalculatedAgeWriter(CL36_NUCLIDES)
             with transaction.atomic():
-                try:
-                    CalculatedAge.objects.filter(sample_id__in=[row['id'] for row in rows]).delete()
-                except Exception as e:
-                    logger.warn(f"Error occured removing unique ids - {e}")
-                    pass
-                for row in rows:
-                    calc_string = row['output']
-                    if calc_string:
-                        try:
-                            logger.info(f"Getting calculation for {row['name']}")
-                            params["text_block"] = calc_string
-                            req = requests.request("GET", self.run_calculation_endpoint, data=json.dumps(params))
-                            print(req.text)
-                            logger.info(f"Parsing and inserting records for {row['name']}")
-                            count = parse_and_insert(req.text, row['id'])
-                            logger.info(f"Successfully created {count} records for {row['name']}")
-                        except Exception as e:
-                            logger.warn(f"Error occurred for record {row['name']} - {e}")
-                            pass
+                writer.delete(list(parsed))
+                for calculated_ages in parsed.values():
+                    writer.add(calculated_ages)
+                writer.flush()
+                logger.info(f"Successfully created {writer.written} records")
                 job.last_run = timestamp
                 job.last_id = highest_id
             job.save()
@@ -1,8 +1,10 @@
-import json
 import logging
 
+from base.calculations import CalculationResult, run_calculation_text
 from base.models import CalculatedAge, Sample
 
+logger = logging.getLogger(__name__)
+
 def make_single_nuclide_fields_map(name, nnorm_name=None):
     map = {
         "t_St": f"{name}_St",
@@ -66,32 +68,109 @@ nuclide_maps = {
 }
 
 
-def parse_and_insert(calculatedResults, sample_id):
-    ages = json.loads(calculatedResults)[0][1]["exposureAgeResult"]
-    count = 0
+def chunked(rows: list, size: int):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def split_by_sample(calculated: CalculationResult) -> dict:
+    """Maps sample name to its exposureAgeResult entry in a multi-sample result"""
+    results = calculated.exposure_age_results
+    if isinstance(results, dict):
+        results = [results]
+    return {str(r.get("sample_name", "")).strip(): r for r in results}
+
+
+def calculate_chunk(calculation, rows: list, summary: str = "yes") -> dict:
+    """
+    Submits the calculator strings of rows as one text block and returns
+    {sample id: ages dict or Exception}. If the block as a whole is rejected,
+    each sample is retried on its own so one bad input only fails itself.
+    """
+    if not rows:
+        return {}
+    try:
+        calculated = run_calculation_text(
+            calculation, "\n".join(row["output"] for row in rows), summary=summary
+        )
+        by_name = split_by_sample(calculated)
+    except Exception as e:
+        if len(rows) == 1:
+            return {rows[0]["id"]: e}
+        logger.warning(f"Chunk of {len(rows)} samples failed, retrying one by one - {e}")
+        results = {}
+        for row in rows:
+            results.update(calculate_chunk(calculation, [row], summary))
+        return results
+
+    return {
+        row["id"]: by_name.get(
+            row["name"], LookupError(f"No result returned for {row['name']}")
+        )
+        for row in rows
+    }
+
+
+# Nuclides written by each calculate_ages job, so one job never removes the other's ages
+V3_NUCLIDES = [m["nuclide"] for m in nuclide_maps.values() if m["nuclide"] != "t36"]
+CL36_NUCLIDES = ["t36"]
+
+
+def _clean_value(value):
+    return None if value == 'NaN' else value
+
+
+def build_calculated_ages(ages: dict, sample_id) -> list:
+    """Turns one sample's exposureAgeResult into unsaved CalculatedAge instances"""
+    calculated_ages = []
     for nuclide in nuclide_maps:
         if nuclide in ages:
             fields = nuclide_maps[nuclide]['fields']
             nuclide_value = nuclide_maps[nuclide]['nuclide']
             records_to_load = []
             for field in fields:
-                ages_field = fields[field]
-                value = ages[ages_field]
-                value = value if value != 'NaN' else None
+                value = ages[fields[field]]
                 # If we have a list, we have multiple records that need to be generated
-                if isinstance(value, list):
-                   if len(records_to_load) == 0:
-                       [records_to_load.append({'nuclide': nuclide_value, 'sample_id': sample_id})
-                        for x in range(len(value))]
-                   for i, v in enumerate(value):
-                       records_to_load[i][field] = v
-                else:
-                    if len(records_to_load) == 0:
-                        records_to_load.append({'nuclide': nuclide_value, 'sample_id': sample_id})
-                    records_to_load[0][field] = value
-            print(records_to_load[0])
-            for r in records_to_load:
-                calc_age = CalculatedAge(**r)
-                calc_age.save()
-                count+=1
-    return count
\ No newline at end of file
+                values = value if isinstance(value, list) else [value]
+                if len(records_to_load) == 0:
+                    records_to_load = [
+                        {'nuclide': nuclide_value, 'sample_id': sample_id}
+                        for _ in values
+                    ]
+                for i, v in enumerate(values):
+                    records_to_load[i][field] = _clean_value(v)
+            calculated_ages.extend(CalculatedAge(**r) for r in records_to_load)
+    return calculated_ages
+
+
+class CalculatedAgeWriter:
+    """
+    Buffers CalculatedAge rows across samples and writes them with bulk_create,
+    batch_size rows per INSERT. Deletes are limited to the given nuclides and
+    issued batch_size sample ids at a time.
+    """
+
+    def __init__(self, nuclides: list, batch_size: int = 500):
+        self.nuclides = nuclides
+        self.batch_size = batch_size
+        self.pending = []
+        self.written = 0
+
+    def delete(self, sample_ids: list) -> None:
+        for ids in chunked(list(sample_ids), self.batch_size):
+            CalculatedAge.objects.filter(
+                sample_id__in=ids, nuclide__in=self.nuclides
+            ).delete()
+
+    def add(self, calculated_ages: list) -> int:
+        """Queues instances from build_calculated_ages, parsed before any delete"""
+        self.pending.extend(calculated_ages)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+        return len(calculated_ages)
+
+    def flush(self) -> None:
+        if self.pending:
+            CalculatedAge.objects.bulk_create(self.pending, batch_size=self.batch_size)
+            self.written += len(self.pending)
+            self.pending = []
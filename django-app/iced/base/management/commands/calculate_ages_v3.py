@@ -1,7 +1,7 @@
 import logging
 import os
-import requests
-import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from pathlib import Path
 from typing import Optional
@@ -9,13 +9,19 @@ from datetime import datetime
 
 from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
-from django.db import connection, transaction
+from django.db import DatabaseError, transaction
 from django.db.models import Q
 from django.conf import settings
 
-from .calculate_ages_utils import parse_and_insert
-from base.models import Calculation, Job, Sample, CalculatedAge
-from base.queries import exposure_calculator_string_query
+from .calculate_ages_utils import (
+    V3_NUCLIDES,
+    CalculatedAgeWriter,
+    build_calculated_ages,
+    calculate_chunk,
+    chunked,
+)
+from base.models import Calculation, Job, Sample
+from base.queries import exposure_calculator_string_query, run_query
 
 
 logname = Path.joinpath(settings.LOG_DIR, "calculate_ages_v3")
@@ -36,9 +42,6 @@ class Command(BaseCommand):
     help = "Runs the ages calculations"
     name = "Calculate Ages"
     calculation_name = "age_input_v3"
-    run_calculation_endpoint = (
-        str(os.environ.get("BASE_URL")) + "/api/calculations/run/" + calculation_name
-    )
     get_calculation_endpoint = (
         str(os.environ.get("BASE_URL")) + "/api/calculations/name/" + calculation_name
     )
@@ -50,6 +53,57 @@ class Command(BaseCommand):
 
         return list(queryset.values_list("id", flat=True).order_by('id')), timezone.now()
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=50,
+            help="Number of samples submitted to the calculator per request",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Number of calculator requests run at the same time",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of calculated ages written per INSERT",
+        )
+
+    def save_chunk(self, rows: list, results: dict, batch_size: int):
+        """Replaces the stored ages of one chunk in its own transaction"""
+        # Results are parsed before anything is deleted, so samples whose
+        # calculation or results failed keep their previous ages
+        parsed = {}
+        failed = 0
+        for row in rows:
+            ages = results.get(row["id"])
+            if ages is None:
+                continue
+            try:
+                if isinstance(ages, Exception):
+                    raise ages
+                parsed[row["id"]] = build_calculated_ages(ages, row["id"])
+            except Exception as e:
+                logger.error(f"Error occurred for record {row['name']} - {e}")
+                failed += 1
+
+        writer = CalculatedAgeWriter(V3_NUCLIDES, batch_size)
+        try:
+            with transaction.atomic():
+                writer.delete(list(parsed))
+                for calculated_ages in parsed.values():
+                    writer.add(calculated_ages)
+                writer.flush()
+        except DatabaseError as e:
+            # The whole chunk rolled back, so none of its samples lost their ages
+            logger.error(f"Could not save a chunk of {len(parsed)} samples - {e}")
+            return 0, failed + len(parsed), 0
+        return len(parsed), failed, writer.written
+
     def handle(self, *args, **kwargs):
         logger.info(f"- Job [{self.name}] start -")
         try:
@@ -68,43 +122,51 @@ class Command(BaseCommand):
             else:
                 highest_id = highest_id if highest_id > temp_high else temp_high
 
-            cursor = connection.cursor()
-            sql = exposure_calculator_string_query(sample_ids)
-            cursor.execute(sql)
-
-            columns = [col[0] for col in cursor.description]
-            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            rows = run_query(exposure_calculator_string_query(sample_ids), as_dicts=True)
 
             calculation = Calculation.get_calculation_by_name(self.calculation_name)
-            params = json.loads(calculation.variable_json)
-            params[
-                "summary"
-            ] = "yes"  # Quoted from legacy_dbs code --> This is a bug in the m-file -- it will only accept 'yes'.
-
-            with transaction.atomic():
-                try:
-                    CalculatedAge.objects.filter(sample_id__in=[row['id'] for row in rows]).delete()
-                except Exception as e:
-                    logger.warn(f"Error occured removing unique ids - {e}")
-                    pass
-
-                for row in rows:
-                    calc_string = row['output']
-                    if calc_string:
-                        try:
-                            logger.info(f"Getting calculation for {row['name']}")
-                            params["text_block"] = calc_string
-                            req = requests.request("GET", self.run_calculation_endpoint, data=json.dumps(params))
-
-                            logger.info(f"Parsing and inserting records for {row['name']}")
-                            count = parse_and_insert(req.text, row['id'])
-                            logger.info(f"Successfully {count} records for {row['name']}")
-                        except Exception as e:
-                            logger.error(f"Error occurred for record {row['name']} - {e}")
-                            pass
-                job.last_run = timestamp
-                job.last_id = highest_id
-
+            chunk_size = kwargs["chunk_size"]
+            chunks = list(chunked(rows, chunk_size))
+            logger.info(
+                f"Calculating {len(rows)} samples in {len(chunks)} chunks of "
+                f"{chunk_size} with {kwargs['workers']} workers"
+            )
+
+            started = time.monotonic()
+            totals = {"samples": 0, "failed": 0, "ages": 0}
+            # Calculator requests run concurrently; results are written from this
+            # thread one chunk per transaction as they come back
+            with ThreadPoolExecutor(max_workers=kwargs["workers"]) as executor:
+                futures = {
+                    executor.submit(
+                        calculate_chunk,
+                        calculation,
+                        [row for row in chunk if row["output"]],
+                    ): chunk
+                    for chunk in chunks
+                }
+                for i, future in enumerate(as_completed(futures), start=1):
+                    chunk_started = time.monotonic()
+                    saved, failed, count = self.save_chunk(
+                        futures[future], future.result(), kwargs["batch_size"]
+                    )
+                    totals["samples"] += saved
+                    totals["failed"] += failed
+                    totals["ages"] += count
+                    elapsed = time.monotonic() - started
+                    logger.info(
+                        f"Chunk {i}/{len(chunks)}: {saved} samples, {failed} failed, "
+                        f"{count} ages saved in {time.monotonic() - chunk_started:.1f}s "
+                        f"({totals['samples'] / elapsed:.1f} samples/s overall)"
+                    )
+
+            elapsed = time.monotonic() - started
+            logger.info(
+                f"Calculated {totals['samples']} samples ({totals['ages']} ages, "
+                f"{totals['failed']} failed) in {elapsed:.1f}s"
+            )
+            job.last_run = timestamp
+            job.last_id = highest_id
 
             job.save()
         else:
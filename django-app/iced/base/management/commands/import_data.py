@@ -1,6 +1,6 @@
 import os
 
-from base.models import DataFileMigration
+from base.models import ApplicationPublication, DataFileMigration, Publication, SiteCounts
 from django.core.management.base import BaseCommand
 from django.db import connection
 from django.db.backends.utils import logger
@@ -60,6 +60,15 @@ class Command(BaseCommand):
         for sqlFile in sqlToRun:
             self.load_data_from_sql(folder, sqlFile)
 
+        if sqlToRun:
+            # Raw SQL inserts bypass the model save/signals that keep these current
+            ApplicationPublication.refresh()
+            logger.info("Publication index rebuilt")
+            Publication.backfill_bibtex_fields()
+            logger.info("Publication BibTeX fields parsed")
+            SiteCounts.refresh()
+            logger.info("Site counts refreshed")
+
     def load_data_from_sql(self, folder: str, filename: str):
         logger.info("Inserting " + str(filename) + " Data")
         file_path = os.path.join(os.path.dirname(__file__), folder, filename)
@@ -0,0 +1,20 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from base.models import ApplicationPublication
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the application to publication index"
+
+    def handle(self, *args, **kwargs):
+        started = time.monotonic()
+        ApplicationPublication.refresh()
+        logger.info(
+            f"Indexed {ApplicationPublication.objects.count()} application publications "
+            f"in {time.monotonic() - started:.1f}s"
+        )
@@ -0,0 +1,33 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from .calculate_ages_utils import chunked
+from base.models import SampleCalcInput
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Rebuilds stored calculator input text for new and changed samples"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Number of samples rebuilt per query",
+        )
+
+    def handle(self, *args, **kwargs):
+        started = time.monotonic()
+        sample_ids = SampleCalcInput.get_stale_sample_ids()
+        logger.info(f"Refreshing calculator input for {len(sample_ids)} samples")
+
+        for ids in chunked(sample_ids, kwargs["chunk_size"]):
+            SampleCalcInput.refresh(ids)
+
+        logger.info(
+            f"Refreshed {len(sample_ids)} samples in {time.monotonic() - started:.1f}s"
+        )
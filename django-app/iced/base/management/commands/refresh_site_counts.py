@@ -0,0 +1,19 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from base.models import SiteCounts
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Recounts samples, cores and nuclide measurements of every site"
+
+    def handle(self, *args, **kwargs):
+        started = time.monotonic()
+        SiteCounts.refresh()
+        logger.info(
+            f"Counted {SiteCounts.objects.count()} sites in {time.monotonic() - started:.1f}s"
+        )
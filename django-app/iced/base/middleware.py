@@ -0,0 +1,30 @@
+from .models import Application
+from .views import error_404_page
+
+
+class ApplicationMiddleware:
+    """
+    Resolves the <application_name> argument of the page views in base.views
+    once per request from the cached application registry. Sets
+    request.application and request.application_ctx, or returns the 404 page
+    for unknown applications.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        application_name = view_kwargs.get("application_name")
+        # API views take an application name too but handle it themselves
+        if application_name is None or view_func.__module__ != "base.views":
+            return None
+
+        entry = Application.get_registry().get(application_name.lower())
+        if entry is None:
+            return error_404_page(f"Can't find an application: {application_name}", request)
+
+        request.application, request.application_ctx = entry
+        return None
@@ -0,0 +1,75 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+# 0006 only bumps base_sample.updated_at when nuclide rows are inserted. The stored
+# calculator input (and the calculate_ages jobs) also need to see edits and deletes,
+# and changes to site calibration ages, which feed the known-age text.
+nuclide_tables = [
+    ("_be10_al26_quartz", "_be10"),
+    ("_c14_quartz", "_c14"),
+    ("_cl36", "_cl36"),
+    ("_he3_pxol", "_he3_pxol"),
+    ("_he3_quartz", "_he3_quartz"),
+    ("_major_element", "_major_element"),
+    ("_ne21_quartz", "_ne21"),
+    ("_trace_element", "_trace_element"),
+    ("_u_th_quartz", "_u_th"),
+]
+
+trigger_operations = []
+for table, prefix in nuclide_tables:
+    trigger_operations += [
+        migrations.RunSQL(
+            f"""CREATE TRIGGER {prefix}_sample_update_trigger
+  AFTER UPDATE ON {table}
+  FOR EACH ROW
+    UPDATE base_sample
+      SET updated_at = now()
+      WHERE base_sample.id in (NEW.sample_id, OLD.sample_id);""",
+            reverse_sql=f"DROP TRIGGER IF EXISTS {prefix}_sample_update_trigger;",
+        ),
+        migrations.RunSQL(
+            f"""CREATE TRIGGER {prefix}_sample_delete_trigger
+  AFTER DELETE ON {table}
+  FOR EACH ROW
+    UPDATE base_sample
+      SET updated_at = now()
+      WHERE base_sample.id = OLD.sample_id;""",
+            reverse_sql=f"DROP TRIGGER IF EXISTS {prefix}_sample_delete_trigger;",
+        ),
+    ]
+
+trigger_operations.append(
+    migrations.RunSQL(
+        """CREATE TRIGGER base_site_sample_update_trigger
+  AFTER UPDATE ON base_site
+  FOR EACH ROW
+    UPDATE base_sample
+      SET updated_at = now()
+      WHERE base_sample.site_id = NEW.id;""",
+        reverse_sql="DROP TRIGGER IF EXISTS base_site_sample_update_trigger;",
+    )
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0019_alter_site_continent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SampleCalcInput',
+            fields=[
+                ('sample', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='calc_input', serialize=False, to='base.sample')),
+                ('v3_text', models.TextField(blank=True, default='')),
+                ('v3_known_age_text', models.TextField(blank=True, default='')),
+                ('cl36_text', models.TextField(blank=True, default='')),
+                ('refreshed_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Sample Calc Inputs',
+            },
+        ),
+    ] + trigger_operations
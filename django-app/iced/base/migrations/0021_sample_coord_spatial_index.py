@@ -0,0 +1,30 @@
+from django.db import migrations
+
+# MySQL only builds (and only uses) a spatial index on a NOT NULL column with an SRID
+# attribute. Samples without coordinates get the north pole as a placeholder; map
+# queries exclude them by filtering on lat_DD/lon_DD being set.
+coord_sql = """ALTER TABLE base_sample MODIFY COLUMN coord POINT SRID 4326 NOT NULL
+    GENERATED ALWAYS AS (ST_POINTFROMTEXT(
+        CONCAT('POINT(', COALESCE(lat_DD, 90), ' ', COALESCE(lon_DD, 0), ')'),
+        4326
+    )) STORED COMMENT 'EPSG:4326 coordinates';"""
+
+reverse_coord_sql = """ALTER TABLE base_sample MODIFY COLUMN coord POINT
+    GENERATED ALWAYS AS (ST_POINTFROMTEXT(
+        CONCAT('POINT(', lat_DD, ' ', lon_DD, ')'),
+        4326
+    )) STORED COMMENT 'EPSG:4326 coordinates';"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('base', '0020_samplecalcinput'),
+    ]
+
+    operations = [
+        migrations.RunSQL(coord_sql, reverse_sql=reverse_coord_sql),
+        migrations.RunSQL(
+            "CREATE SPATIAL INDEX base_sample_coord_spatial ON base_sample (coord);",
+            reverse_sql="DROP INDEX base_sample_coord_spatial ON base_sample;",
+        ),
+    ]
@@ -0,0 +1,54 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Initial index, inlined so the migration does not change with base.queries
+INDEX_SQL = """
+insert into base_applicationpublication
+    (application_id, publication_id, year, sample_count, core_sample_count)
+select matches.application_id,
+       matches.publication_id,
+       pub.year,
+       sum(matches.is_sample),
+       sum(matches.is_core_sample)
+from (
+    select cas.application_id, spm.publication_id, 1 as is_sample, 0 as is_core_sample
+    from base_samplepublicationsmatch spm
+             join base_sample s on s.id = spm.sample_id
+             join base_application_sites cas on cas.site_id = s.site_id
+    union all
+    select cas.application_id, spm.publication_id, 0 as is_sample, 1 as is_core_sample
+    from base_samplepublicationsmatch spm
+             join base_coresample cs on cs.id = spm.core_sample_id
+             join base_core c on c.id = cs.core_id
+             join base_application_sites cas on cas.site_id = c.site_id
+) matches
+         join base_publication pub on pub.id = matches.publication_id
+group by matches.application_id, matches.publication_id, pub.year
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0021_sample_coord_spatial_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApplicationPublication',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField(blank=True, null=True)),
+                ('sample_count', models.IntegerField(default=0)),
+                ('core_sample_count', models.IntegerField(default=0)),
+                ('application', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='base.application')),
+                ('publication', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='application_index', to='base.publication')),
+            ],
+            options={
+                'verbose_name_plural': 'Application Publications',
+                'unique_together': {('application', 'publication')},
+                'indexes': [models.Index(fields=['application', 'year'], name='base_applic_applica_6e1f5c_idx')],
+            },
+        ),
+        migrations.RunSQL(INDEX_SQL, reverse_sql=migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations, models
+import bibtexparser
+
+BIBTEX_FIELDS = ("title", "author", "journal", "year", "doi")
+
+
+def backfill_bibtex_fields(apps, schema_editor):
+    Publication = apps.get_model("base", "Publication")
+    publications = list(Publication.objects.exclude(bibtex_record__isnull=True).exclude(bibtex_record=""))
+    for publication in publications:
+        entries = bibtexparser.loads(publication.bibtex_record).entries
+        if entries:
+            publication.bibtex_fields = {f: entries[0][f] for f in BIBTEX_FIELDS if f in entries[0]}
+    Publication.objects.bulk_update(publications, ["bibtex_fields"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0022_applicationpublication'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='publication',
+            name='bibtex_fields',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.RunPython(backfill_bibtex_fields, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Initial counts, inlined so the migration does not change with base.queries
+COUNTS_SQL = """
+insert into base_sitecounts (site_id, sample_count, core_count, measurement_count)
+select s.id as site_id,
+       coalesce(sc.n, 0) as sample_count,
+       coalesce(cc.n, 0) as core_count,
+       coalesce(mc.n, 0) as measurement_count
+from base_site s
+         left join (select site_id, count(*) n from base_sample group by site_id) sc
+                   on sc.site_id = s.id
+         left join (select site_id, count(*) n from base_core group by site_id) cc
+                   on cc.site_id = s.id
+         left join (
+    select sa.site_id, count(*) n
+    from (
+        select sample_id from _be10_al26_quartz where sample_id is not null
+        union all
+        select sample_id from _c14_quartz where sample_id is not null
+        union all
+        select sample_id from _cl36 where sample_id is not null
+        union all
+        select sample_id from _he3_pxol where sample_id is not null
+        union all
+        select sample_id from _he3_quartz where sample_id is not null
+        union all
+        select sample_id from _ne21_quartz where sample_id is not null
+        union all
+        select sample_id from _u_th_quartz where sample_id is not null
+    ) m
+             join base_sample sa on sa.id = m.sample_id
+    group by sa.site_id
+) mc on mc.site_id = s.id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0023_publication_bibtex_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SiteCounts',
+            fields=[
+                ('site', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counts', serialize=False, to='base.site')),
+                ('sample_count', models.IntegerField(default=0)),
+                ('core_count', models.IntegerField(default=0)),
+                ('measurement_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Site Counts',
+            },
+        ),
+        migrations.RunSQL(COUNTS_SQL, reverse_sql=migrations.RunSQL.noop),
+    ]
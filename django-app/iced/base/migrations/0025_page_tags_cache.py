@@ -0,0 +1,19 @@
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_tables(apps, schema_editor):
+    # Table of the shared "page_tags" cache, see base/page_cache.py. Skips tables
+    # that already exist and caches with other backends.
+    call_command("createcachetable", database=schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0024_sitecounts'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_tables, reverse_code=migrations.RunPython.noop),
+    ]
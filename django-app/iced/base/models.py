@@ -1,24 +1,31 @@
 import re
+import time
 from datetime import datetime
 import bibtexparser
 
 from autoslug import AutoSlugField
 from django.conf import settings
 from django.contrib.auth.models import Group
+from django.core.cache import cache
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import connection, models
-from django.db.models import Count, Max, Min, TextChoices
+from django.db import connection, models, transaction
+from django.db.models import Count, F, Max, Min, Q, Sum, TextChoices
 from django.db.models.deletion import CASCADE
 from django.db.models.fields import CharField
+from django.db.models.functions import Coalesce
 from django.db.models.fields.related import ForeignKey
 from django.db.models.query import QuerySet
 from django.utils import timezone
 
+from .depth_profiles import DepthProfile, get_depth_profiles
 from .queries import (
+    application_publication_index_query,
     cl36_calculator_string_query,
-    depth_nuclide_concentration_query,
     exposure_calculator_string_query,
+    run_query,
     sample_nuclide_match_query,
+    site_counts_insert_query,
+    site_counts_query,
 )
 
 
@@ -123,12 +130,30 @@ class Application(models.Model):
     def __str__(self):
         return f"{self.id} - {self.name}"
 
+    REGISTRY_CACHE_KEY = "applications:registry"
+
+    @staticmethod
+    def get_registry() -> dict:
+        """Every application and its page context, keyed by lowercased name"""
+        registry = cache.get(Application.REGISTRY_CACHE_KEY)
+        if registry is None:
+            registry = {
+                application.name.lower(): (application, application.get_application_ctx())
+                for application in Application.objects.all()
+            }
+            cache.set(
+                Application.REGISTRY_CACHE_KEY, registry, settings.METADATA_CACHE_TIMEOUT
+            )
+        return registry
+
+    @staticmethod
+    def invalidate_registry() -> None:
+        cache.delete(Application.REGISTRY_CACHE_KEY)
+
     @staticmethod
     def get_application_by_name(application_name: str) -> models.Model:
-        try:
-            return Application.objects.get(name__iexact=application_name)
-        except Application.DoesNotExist:
-            return None
+        entry = Application.get_registry().get(application_name.lower())
+        return entry[0] if entry else None
 
     def get_application_ctx(self):
         return {
@@ -145,6 +170,14 @@ class Application(models.Model):
         }
 
     def get_sample_field_proper_names_dict(self, sample_type="base_coresample"):
+        cache_key = (
+            f"field_proper_names:{FieldProperName.get_cache_version()}:"
+            f"{self.id}:{sample_type}"
+        )
+        proper_names = cache.get(cache_key)
+        if proper_names is not None:
+            return proper_names
+
         table_names = [
             "be10_al26_quartz",
             "c14_quartz",
@@ -172,6 +205,7 @@ class Application(models.Model):
                 pn.format_string,
             ]
 
+        cache.set(cache_key, proper_names, settings.METADATA_CACHE_TIMEOUT)
         return proper_names
 
     def get_sites(self):
@@ -220,6 +254,41 @@ class Site(models.Model):
     def samples_count(self) -> int:
         return Sample.objects.filter(site_id=self).count()
 
+    @staticmethod
+    def get_listing(application: Application, continent: str = None) -> list:
+        """
+        Sites of an application in listing order, with sample_count, core_count and
+        measurement_count set. Applications with SITE_COUNTS_TABLE_MIN_SITES sites
+        or more read the counts from SiteCounts, the rest count them live.
+        """
+        sites = application.sites.select_related("region", "continent").order_by(
+            "region__name", "sector"
+        )
+        if continent:
+            sites = sites.filter(continent__slug=continent)
+
+        if application.sites.count() >= settings.SITE_COUNTS_TABLE_MIN_SITES:
+            return list(
+                sites.annotate(
+                    sample_count=Coalesce("counts__sample_count", 0),
+                    core_count=Coalesce("counts__core_count", 0),
+                    measurement_count=Coalesce("counts__measurement_count", 0),
+                )
+            )
+
+        sites = list(sites)
+        counts = {
+            row[0]: row[1:]
+            for row in run_query(site_counts_query([site.id for site in sites]))
+        }
+        for site in sites:
+            (
+                site.sample_count,
+                site.core_count,
+                site.measurement_count,
+            ) = counts.get(site.id, (0, 0, 0))
+        return sites
+
     @staticmethod
     def get_distinct_continents_by_application(application: Application) -> list:
         return (
@@ -317,39 +386,93 @@ class Sample(models.Model):
     def get_samples_by_site(site_ids: list):
         return Sample.objects.filter(site__in=site_ids)
 
+    @staticmethod
+    def get_data_tables(sample_ids: list[int], proper_names: dict) -> dict:
+        """
+        {"key", "value"} rows of every table in SAMPLE_DATA_TABLES for sample_ids,
+        as {table_name: {sample_id: rows}}, with one query per table. Only fields
+        with a proper name are shown and each record ends with a " " spacer row.
+        """
+        tables = {}
+        for table_name, model in SAMPLE_DATA_TABLES.items():
+            names = proper_names.get(table_name, {})
+            sample_field = "id" if model is Sample else "sample_id"
+            tables[table_name] = {sample_id: [] for sample_id in sample_ids}
+            if not names:
+                continue
+
+            records = (
+                model.objects.filter(**{f"{sample_field}__in": sample_ids})
+                .order_by(sample_field, "pk")
+                .values()
+            )
+            for record in records:
+                rows = tables[table_name][record[sample_field]]
+                rows.extend(
+                    {"key": names[field][0], "value": value}
+                    for field, value in record.items()
+                    if field in names
+                )
+                rows.append(" ")
+        return tables
+
     @staticmethod
     def get_formatted_nuclide(sample_ids: list[int]) -> list[dict]:
         # Writing raw sql here gives us the results while remaining performant
-        cursor = connection.cursor()
-        sql = sample_nuclide_match_query(sample_ids)
-        cursor.execute(sql)
-        nuclide_matches = cursor.fetchall()
+        nuclide_matches = run_query(sample_nuclide_match_query(sample_ids))
         data = _format_nuclide_data(nuclide_matches)
 
         return data
 
+    @staticmethod
+    def query_v3_age_calc_strings(sample_ids, known_age=False) -> dict:
+        """Builds calculator input text keyed by sample id from the nuclide tables"""
+        rows = run_query(exposure_calculator_string_query(sample_ids, known_age=known_age))
+        return {
+            row[0]: re.sub(" +;", ";", row[2].replace("\n ", "\n")).strip()
+            for row in rows
+        }
+
+    @staticmethod
+    def query_cl36_age_calc_strings(sample_ids) -> dict:
+        """Builds Cl-36 calculator input text keyed by sample id from the nuclide tables"""
+        rows = run_query(cl36_calculator_string_query(sample_ids))
+        return {
+            row[0]: re.sub(" +;", ";", row[2].replace("\n ", "\n")).strip()
+            for row in rows
+        }
+
+    @staticmethod
+    def get_v3_age_calc_strings(sample_ids, known_age=False) -> dict:
+        """Calculator input text keyed by sample id"""
+        inputs = SampleCalcInput.get_by_sample_ids(sample_ids)
+        return {
+            sample_id: calc_input.v3_known_age_text if known_age else calc_input.v3_text
+            for sample_id, calc_input in inputs.items()
+        }
+
     @staticmethod
     def get_v3_age_calc_string(sample_ids, known_age=False):
-        cursor = connection.cursor()
-        sql = exposure_calculator_string_query(sample_ids, known_age=known_age)
-        cursor.execute(sql)
-        rows = cursor.fetchall()
         strings = filter(
             lambda x: x != "",
-            [re.sub(" +;", ";", row[2].replace("\n ", "\n")).strip() for row in rows],
+            Sample.get_v3_age_calc_strings(sample_ids, known_age=known_age).values(),
         )
 
         return "\n".join(strings)
 
+    @staticmethod
+    def get_cl36_age_calc_strings(sample_ids) -> dict:
+        """Cl-36 calculator input text keyed by sample id"""
+        inputs = SampleCalcInput.get_by_sample_ids(sample_ids)
+        return {
+            sample_id: calc_input.cl36_text
+            for sample_id, calc_input in inputs.items()
+        }
+
     @staticmethod
     def get_cl36_age_calc_string(sample_ids):
-        cursor = connection.cursor()
-        sql = cl36_calculator_string_query(sample_ids)
-        cursor.execute(sql)
-        rows = cursor.fetchall()
         strings = filter(
-            lambda x: x != "",
-            [re.sub(" +;", ";", row[2].replace("\n ", "\n")).strip() for row in rows],
+            lambda x: x != "", Sample.get_cl36_age_calc_strings(sample_ids).values()
         )
         return "\n".join(strings)
 
@@ -390,10 +513,7 @@ class Sample(models.Model):
 
     @staticmethod
     def exposure_calculator_string_query(sample_ids):
-        cursor = connection.cursor()
-        sql = exposure_calculator_string_query(sample_ids)
-        cursor.execute(sql)
-        rows = cursor.fetchall()
+        rows = run_query(exposure_calculator_string_query(sample_ids))
         strings = [
             row[2].strip().replace(" ;", ";").replace("\n ", "\n") for row in rows
         ]
@@ -401,10 +521,7 @@ class Sample(models.Model):
 
     @staticmethod
     def cl36_calculator_string_query(sample_ids):
-        cursor = connection.cursor()
-        sql = cl36_calculator_string_query(sample_ids)
-        cursor.execute(sql)
-        rows = cursor.fetchall()
+        rows = run_query(cl36_calculator_string_query(sample_ids))
         strings = [
             row[2].strip().replace(" ;", ";").replace("\n ", "\n") for row in rows
         ]
@@ -433,6 +550,10 @@ class Publication(models.Model):
     bibtex_record = models.TextField(null=True, blank=True)
     year = models.IntegerField(null=True, blank=True, validators=[MIN_YEAR, MAX_YEAR])
     doi = models.CharField(max_length=255, null=True, blank=True)
+    # Parsed from bibtex_record on save, see BIBTEX_FIELDS
+    bibtex_fields = models.JSONField(default=dict, blank=True, editable=False)
+
+    BIBTEX_FIELDS = ("title", "author", "journal", "year", "doi")
 
     # Publication.objects.filter(application)
 
@@ -444,52 +565,54 @@ class Publication(models.Model):
 
     @staticmethod
     def get_publication_count_by_application(application: Application) -> int:
-        site_list = application.get_sites()
-        samples = Sample.get_samples_by_site(site_list)
-        sample_ids = [sample.id for sample in samples]
-        return SamplePublicationsMatch.objects.filter(sample_id__in=sample_ids,publication_id__isnull=False).count()
+        # Number of sample/publication matches, as before the index existed
+        return (
+            ApplicationPublication.objects.filter(application=application).aggregate(
+                total=Sum("sample_count")
+            )["total"]
+            or 0
+        )
+
+    @staticmethod
+    def parse_bibtex(bibtex_record: str) -> dict:
+        """The BIBTEX_FIELDS of the first entry in a BibTeX record"""
+        if not bibtex_record:
+            return {}
+        entries = bibtexparser.loads(bibtex_record).entries
+        if len(entries) == 0:
+            return {}
+        return {f: entries[0][f] for f in Publication.BIBTEX_FIELDS if f in entries[0]}
 
     @property
     def parsed_bibtex(self) -> dict:
-        # fields = ["title", "author", "year", "journal"]
-        # bibtex_records = {}
-        # for field in fields:
-        #    try:
-        #        val = re.findall("%s={.*}" % field, self.bibtex_record)[0]
-        #        valval = val[val.index("{") + 1: val.index("}")]
-        #        bibtex_records[field] = valval.replace('\\','\\\\')
-        #    except Exception as e:
-        #        bibtex_records[field] = None
-        #        pass
-
-        parsed_bibtex = bibtexparser.loads(self.bibtex_record).entries
-        if len(parsed_bibtex) > 0:
-            bibtex_records = parsed_bibtex[0]
-        else:
-            bibtex_records = parsed_bibtex
-
-
-        return bibtex_records
+        # Rows written by raw SQL imports are parsed on the fly until backfilled
+        if not self.bibtex_fields and self.bibtex_record:
+            return Publication.parse_bibtex(self.bibtex_record)
+        return self.bibtex_fields
+
+    def save(self, *args, **kwargs):
+        self.bibtex_fields = Publication.parse_bibtex(self.bibtex_record)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "bibtex_record" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "bibtex_fields"}
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def backfill_bibtex_fields(batch_size: int = 500) -> int:
+        """Re-parses every stored BibTeX record, returns the number of changed rows"""
+        changed = []
+        for publication in Publication.objects.only("id", "bibtex_record", "bibtex_fields"):
+            fields = Publication.parse_bibtex(publication.bibtex_record)
+            if fields != publication.bibtex_fields:
+                publication.bibtex_fields = fields
+                changed.append(publication)
+        Publication.objects.bulk_update(changed, ["bibtex_fields"], batch_size=batch_size)
+        return len(changed)
 
     def get_all_samples(self):
         match_records = SamplePublicationsMatch.objects.filter(publication_id=self.id)
         return [mr.sample for mr in match_records]
 
-    def get_by_application(application):
-        site_list = application.get_sites()
-        samples = Sample.get_samples_by_site(site_list)
-        sample_ids = [sample.id for sample in samples]
-
-        cores_list = Core.get_cores_by_site(site_list)
-        core_ids = [core.id for core in cores_list]
-        core_samples = CoreSample.get_core_samples_by_core(core_ids)
-        core_sample_ids = [cs.id for cs in core_samples]
-
-        publications_by_sample = SamplePublicationsMatch.get_publications_by_sample_ids(sample_ids)
-        publications_by_core_sample = SamplePublicationsMatch.get_publications_by_core_sample_ids(core_sample_ids)
-        publications = publications_by_sample.union(publications_by_core_sample)
-        return publications
-    
     # Here insert a 'get_all_cores(self)' method using
     def get_all_cores(self):
         return Publication.objects.raw('select distinct base_core.* from base_core, base_coresample, base_samplepublicationsmatch where base_core.id = base_coresample.core_id and base_coresample.id = base_samplepublicationsmatch.core_sample_id and base_samplepublicationsmatch.publication_id = %s',[self.id])
@@ -584,12 +707,13 @@ class Core(models.Model):
     def get_all_core_samples(self) -> QuerySet:
         return CoreSample.objects.filter(core=self.id)
 
-    def get_depth_nuclide_concentration(self) -> str:
-        cursor = connection.cursor()
-        sql = depth_nuclide_concentration_query(self.id)
-        cursor.execute(sql)
-        depth_nuclide = cursor.fetchall()
-        return depth_nuclide[0][0]
+    def get_depth_profile(self) -> DepthProfile:
+        return get_depth_profiles([self.id])[self.id]
+
+    @staticmethod
+    def get_depth_profiles(core_ids: list) -> dict:
+        """Depth profiles of many cores from one query, by core id"""
+        return get_depth_profiles(core_ids)
 
     @staticmethod
     def get_cores_by_site(site_id:list):
@@ -624,10 +748,9 @@ class CoreSample(models.Model):
     @staticmethod
     def get_formatted_nuclide(core_sample_ids: list[int]) -> list[dict]:
         # Writing raw sql here gives us the results while remaining performant
-        cursor = connection.cursor()
-        sql = sample_nuclide_match_query(core_sample_ids, core_samples=True)
-        cursor.execute(sql)
-        nuclide_matches = cursor.fetchall()
+        nuclide_matches = run_query(
+            sample_nuclide_match_query(core_sample_ids, core_samples=True)
+        )
         data = _format_nuclide_data(nuclide_matches, core_samples=True)
 
         return data
@@ -668,6 +791,53 @@ class SamplePublicationsMatch(models.Model):
             sample__in=sample_ids
         )
 
+class ApplicationPublication(models.Model):
+    """
+    Publications of each application with how many of its samples and core
+    samples they are matched to. Refreshed from SamplePublicationsMatch for a
+    publication when its matches or the sites of its samples change.
+    """
+
+    application = models.ForeignKey(Application, on_delete=CASCADE)
+    publication = models.ForeignKey(
+        Publication, on_delete=CASCADE, related_name="application_index"
+    )
+    year = models.IntegerField(null=True, blank=True)
+    sample_count = models.IntegerField(default=0)
+    core_sample_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.application_id} - ({self.publication_id})"
+
+    class Meta:
+        unique_together = ("application", "publication")
+        indexes = [models.Index(fields=["application", "year"])]
+        verbose_name_plural = "Application Publications"
+
+    @property
+    def match_count(self) -> int:
+        return self.sample_count + self.core_sample_count
+
+    @staticmethod
+    def get_by_application(application: Application) -> QuerySet:
+        return (
+            ApplicationPublication.objects.select_related("publication")
+            .filter(application=application)
+            .order_by("publication_id")
+        )
+
+    @staticmethod
+    def refresh(publication_ids=None) -> None:
+        """Reindexes the given publications, or all publications"""
+        with transaction.atomic():
+            rows = ApplicationPublication.objects.all()
+            if publication_ids is not None:
+                rows = rows.filter(publication_id__in=publication_ids)
+            rows.delete()
+            with connection.cursor() as cursor:
+                cursor.execute(*application_publication_index_query(publication_ids))
+
+
 class SampleDocumentMatch(models.Model):
     id = models.AutoField(primary_key=True)
     sample = models.ForeignKey(Sample, on_delete=CASCADE, null=True)
@@ -1279,13 +1449,30 @@ class FieldProperName(models.Model):
     description = models.TextField(null=True, blank=True)
     application = models.ForeignKey(Application, on_delete=CASCADE)
 
+    CACHE_VERSION_KEY = "field_proper_names:version"
+
     class Meta:
         unique_together = ("table_name", "field_name", "application")
 
+    @staticmethod
+    def get_cache_version() -> str:
+        """Part of every proper name cache key, replaced whenever a proper name changes"""
+        version = cache.get(FieldProperName.CACHE_VERSION_KEY)
+        if version is None:
+            version = FieldProperName.invalidate_cache()
+        return version
+
+    @staticmethod
+    def invalidate_cache() -> str:
+        # A fresh token rather than a counter, so an evicted version key can never
+        # bring back entries cached under an older version
+        version = str(time.time_ns())
+        cache.set(FieldProperName.CACHE_VERSION_KEY, version, None)
+        return version
+
     @staticmethod
     def get_proper_names(application_id: str) -> dict:
-        table_name_to_proper_name = {}
-        for table_name in (
+        table_names = (
             "sample",
             "Be10_Al26_quartz",
             "C14_quartz",
@@ -1297,9 +1484,19 @@ class FieldProperName(models.Model):
             "major_element",
             "trace_element",
             "coresample",
-        ):
-            proper_names = FieldProperName.objects.filter(table_name=table_name)
-            table_name_to_proper_name[table_name] = proper_names
+        )
+        cache_key = f"field_proper_names:{FieldProperName.get_cache_version()}:tables"
+        table_name_to_proper_name = cache.get(cache_key)
+        if table_name_to_proper_name is not None:
+            return table_name_to_proper_name
+
+        table_name_to_proper_name = {table_name: [] for table_name in table_names}
+        for proper_name in FieldProperName.objects.filter(table_name__in=table_names):
+            table_name_to_proper_name[proper_name.table_name].append(proper_name)
+
+        cache.set(
+            cache_key, table_name_to_proper_name, settings.METADATA_CACHE_TIMEOUT
+        )
         return table_name_to_proper_name
 
 
@@ -1342,6 +1539,123 @@ class CalculatedAge(models.Model):
     dNnorm_LSDn = models.FloatField(null=True, blank=True)
     dNnorm_ext_LSDn = models.FloatField(null=True, blank=True)
 
+    @staticmethod
+    def get_by_sample_ids(sample_ids: list) -> QuerySet:
+        return (
+            CalculatedAge.objects.select_related("sample")
+            .filter(sample_id__in=sample_ids)
+            .order_by("sample_id", "id")
+        )
+
+
+class SampleCalcInput(models.Model):
+    """
+    Materialized calculator input text per sample. A row is current while
+    refreshed_at is not older than the sample's updated_at, which the triggers
+    from migrations 0006 and 0020 bump on nuclide and site changes.
+    """
+
+    sample = models.OneToOneField(
+        Sample, primary_key=True, on_delete=CASCADE, related_name="calc_input"
+    )
+    v3_text = models.TextField(blank=True, default="")
+    v3_known_age_text = models.TextField(blank=True, default="")
+    cl36_text = models.TextField(blank=True, default="")
+    refreshed_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.sample_id} - ({self.refreshed_at})"
+
+    class Meta:
+        verbose_name_plural = "Sample Calc Inputs"
+
+    @staticmethod
+    def refresh(sample_ids) -> dict:
+        """Rebuilds the stored text for sample_ids, returns them keyed by sample id"""
+        refreshed_at = timezone.now()
+        v3 = Sample.query_v3_age_calc_strings(sample_ids)
+        v3_known_age = Sample.query_v3_age_calc_strings(sample_ids, known_age=True)
+        cl36 = Sample.query_cl36_age_calc_strings(sample_ids)
+
+        # The v3 query returns a row for every existing sample, so ids of
+        # deleted samples are skipped here
+        inputs = [
+            SampleCalcInput(
+                sample_id=sample_id,
+                v3_text=v3[sample_id],
+                v3_known_age_text=v3_known_age.get(sample_id, ""),
+                cl36_text=cl36.get(sample_id, ""),
+                refreshed_at=refreshed_at,
+            )
+            for sample_id in v3
+        ]
+        SampleCalcInput.objects.bulk_create(
+            inputs,
+            batch_size=500,
+            update_conflicts=True,
+            update_fields=["v3_text", "v3_known_age_text", "cl36_text", "refreshed_at"],
+        )
+        return {calc_input.sample_id: calc_input for calc_input in inputs}
+
+    @staticmethod
+    def get_stale_sample_ids(sample_ids=None) -> list:
+        """Samples without stored text or changed since it was built"""
+        samples = Sample.objects.filter(
+            Q(calc_input__isnull=True)
+            | Q(calc_input__refreshed_at__lt=F("updated_at"))
+        )
+        if sample_ids is not None:
+            samples = samples.filter(id__in=sample_ids)
+        return list(samples.values_list("id", flat=True).order_by("id"))
+
+    @staticmethod
+    def get_by_sample_ids(sample_ids) -> dict:
+        """Stored text keyed by sample id, refreshing missing or stale rows first"""
+        sample_ids = list(sample_ids)
+        if not sample_ids:
+            return {}
+        inputs = {
+            calc_input.sample_id: calc_input
+            for calc_input in SampleCalcInput.objects.filter(
+                sample_id__in=sample_ids, refreshed_at__gte=F("sample__updated_at")
+            ).order_by("sample_id")
+        }
+        missing = [sample_id for sample_id in sample_ids if sample_id not in inputs]
+        if missing:
+            inputs |= SampleCalcInput.refresh(missing)
+        return inputs
+
+
+class SiteCounts(models.Model):
+    """
+    Per-site counts for the listings of large applications, see Site.get_listing.
+    Refreshed for a site when its samples, cores or measurements change.
+    """
+
+    site = models.OneToOneField(
+        Site, primary_key=True, on_delete=CASCADE, related_name="counts"
+    )
+    sample_count = models.IntegerField(default=0)
+    core_count = models.IntegerField(default=0)
+    measurement_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.site_id} - ({self.sample_count} samples)"
+
+    class Meta:
+        verbose_name_plural = "Site Counts"
+
+    @staticmethod
+    def refresh(site_ids=None) -> None:
+        """Recounts the given sites, or all sites"""
+        with transaction.atomic():
+            rows = SiteCounts.objects.all()
+            if site_ids is not None:
+                rows = rows.filter(site_id__in=site_ids)
+            rows.delete()
+            with connection.cursor() as cursor:
+                cursor.execute(*site_counts_insert_query(site_ids))
+
 
 class ImageFilesCores(models.Model):
     id = models.AutoField(primary_key=True)
@@ -1448,3 +1762,18 @@ class CalibrationDataSample(models.Model):
 
     class Meta:
         unique_together = ("calibration_data", "sample", "aliquot")
+
+
+# Data tables of the sample page keyed by their FieldProperName.table_name
+SAMPLE_DATA_TABLES = {
+    "base_sample": Sample,
+    "be10_al26_quartz": Be10Al26Quartz,
+    "c14_quartz": C14Quartz,
+    "he3_quartz": He3Quartz,
+    "he3_pxol": He3Pxol,
+    "ne21_quartz": Ne21Quartz,
+    "u_th_quartz": UThQuartz,
+    "cl36": Cl36,
+    "major_element": MajorElement,
+    "trace_element": TraceElement,
+}
@@ -0,0 +1,98 @@
+"""
+Cache of rendered pages and fragments, tagged with the objects they were built from.
+
+Tags look like "sample:12" or "application:3". Model signals bump the version of a
+tag, which invalidates every entry built with it. Tag versions live in the shared
+"page_tags" cache, so an invalidation reaches the pages cached by every worker. Entries that show sample data also
+store a filter on the samples they show; the samples' updated_at (kept current by the
+nuclide and site triggers) and their stored ages are re-checked on every hit, so
+data loaded with raw SQL or by the calculate_ages jobs is never served stale. Core
+pages likewise store their core ids and re-check a checksum of the core samples and
+their depth profile values, which have no updated_at of their own.
+"""
+import time
+
+from django.core.cache import caches
+from django.db.models import Count, Max
+
+from .models import Sample
+from .queries import core_data_stamp_query, run_query
+
+PAGE_CACHE = "pages"
+TAG_CACHE = "page_tags"
+
+
+def tag(kind: str, object_id) -> str:
+    return f"{kind}:{object_id}"
+
+
+def _tag_key(name: str) -> str:
+    return f"tag:{name}"
+
+
+def _tag_versions(tags) -> dict:
+    """Current version of each tag, creating versions for unseen tags"""
+    cache = caches[TAG_CACHE]
+    keys = {_tag_key(name): name for name in tags}
+    versions = cache.get_many(keys)
+    missing = {key: str(time.time_ns()) for key in keys if key not in versions}
+    if missing:
+        # Versions outlive entries; an evicted version just turns its entries into misses
+        cache.set_many(missing, timeout=None)
+        versions |= missing
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def _samples_stamp(samples: dict) -> tuple:
+    """Changes whenever one of the samples or its stored ages change"""
+    stats = Sample.objects.filter(**samples).aggregate(
+        updated=Max("updated_at"),
+        samples=Count("id", distinct=True),
+        ages_updated=Max("calculatedage__when_updated"),
+        ages=Count("calculatedage__id"),
+    )
+    return tuple(stats[k] for k in ("updated", "samples", "ages_updated", "ages"))
+
+
+def _cores_stamp(core_ids: list) -> tuple:
+    """Changes whenever the core samples of the cores or their depth profiles change"""
+    return tuple(run_query(core_data_stamp_query(core_ids))[0])
+
+
+def get_page(key: str):
+    """Cached content for key, or None if missing or out of date"""
+    entry = caches[PAGE_CACHE].get(key)
+    if entry is None:
+        return None
+    versions = caches[TAG_CACHE].get_many([_tag_key(name) for name in entry["tags"]])
+    for name, version in entry["tags"].items():
+        if versions.get(_tag_key(name)) != version:
+            return None
+    if entry["samples"] is not None and _samples_stamp(entry["samples"]) != entry["stamp"]:
+        return None
+    if entry["cores"] is not None and _cores_stamp(entry["cores"]) != entry["core_stamp"]:
+        return None
+    return entry["content"]
+
+
+def set_page(key: str, content, tags, samples: dict = None, cores: list = None) -> None:
+    """
+    Caches content under key until one of tags is invalidated or, if given, the
+    samples matching the samples filter or the data of the cores change
+    """
+    caches[PAGE_CACHE].set(
+        key,
+        {
+            "content": content,
+            "tags": _tag_versions(set(tags)),
+            "samples": samples,
+            "stamp": _samples_stamp(samples) if samples is not None else None,
+            "cores": cores,
+            "core_stamp": _cores_stamp(cores) if cores is not None else None,
+        },
+    )
+
+
+def invalidate(*tags) -> None:
+    version = str(time.time_ns())
+    caches[TAG_CACHE].set_many({_tag_key(name): version for name in tags}, timeout=None)
@@ -0,0 +1,69 @@
+"""
+Cache of Bokeh plot components. Entries are keyed by a digest of everything a plot
+is drawn from, so changed data simply misses and no invalidation is needed. The data
+of plots drawn client side is kept the same way, for the plot data endpoints to
+serve by the digest a page put in their URL.
+"""
+import dataclasses
+import functools
+import hashlib
+import json
+import re
+
+import bokeh
+from django.core.cache import caches
+
+PLOT_CACHE = "plots"
+
+# Bump when a change to the plotting code changes the plots drawn from the same data
+PLOTS_VERSION = 2
+
+
+def _plain(value):
+    # Arrays and dataclasses of arrays, such as a DepthProfile, are keyed by their values
+    if dataclasses.is_dataclass(value):
+        return {f.name: getattr(value, f.name) for f in dataclasses.fields(value)}
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+def plot_digest(*inputs) -> str:
+    payload = json.dumps(
+        [PLOTS_VERSION, bokeh.__version__, inputs], sort_keys=True, default=_plain
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def plot_key(name: str, *inputs) -> str:
+    return f"plot:{name}:{plot_digest(*inputs)}"
+
+
+def set_plot_data(name: str, data, *inputs) -> str:
+    """Caches the JSON data of a plot, returning the digest to look it up by"""
+    digest = plot_digest(*inputs)
+    caches[PLOT_CACHE].set(f"plot_data:{name}:{digest}", data)
+    return digest
+
+
+def get_plot_data(name: str, digest: str):
+    """JSON data cached by set_plot_data, or None if missing or digest is malformed"""
+    if not re.fullmatch(r"[0-9a-f]{64}", digest):
+        return None
+    return caches[PLOT_CACHE].get(f"plot_data:{name}:{digest}")
+
+
+def cached_plot(plot):
+    """Serves the (script, div) pair of a plot function from the plot cache"""
+
+    @functools.wraps(plot)
+    def wrapper(*inputs):
+        key = plot_key(plot.__name__, *inputs)
+        cached = caches[PLOT_CACHE].get(key)
+        if cached is not None:
+            return cached
+        script, div = plot(*inputs)
+        caches[PLOT_CACHE].set(key, (script, div))
+        return script, div
+
+    return wrapper
@@ -2,10 +2,13 @@ from bokeh.plotting import figure, show
 from bokeh.models import ColumnDataSource, RangeTool
 from bokeh.layouts import column
 from bokeh.embed import components
-from numpy import array, where, unique, append, linspace, sqrt, power, exp, argsort
+from numpy import array, unique, nanmax, trunc
 from numpy.random import default_rng
 
-from math import floor, ceil, pi
+from math import floor, ceil
+
+from .kde import age_grid, collect_ages, grouped_kde, name_rows
+from .plot_cache import cached_plot
 
 def nuclide_colors():
     # This is just here so that you can define the colors associated with each nuclide only once.
@@ -16,6 +19,7 @@ def nuclide_colors():
     return nucs, fcols, lcols
 
 
+@cached_plot
 def age_elevation_plot(v3_age_results,cl36_age_results,sample_dict):
     # The reason this is so long is that it has to unpack the exposure age results (which
     # contains sample names and exposure ages, but there can be multiple exposure ages per
@@ -23,9 +27,10 @@ def age_elevation_plot(v3_age_results,cl36_age_results,sample_dict):
     # associated ice surface elevations, etc.)
 
     # unpack dict of sample related info generated upstream
-    sample_names = sample_dict["names"]
     sample_whats = sample_dict["whats"]
     sample_elvs = sample_dict["elvs"]
+    # position of each sample in the lists above, looked up by the sample id of a result
+    sample_index = {sample_id: i for i, sample_id in enumerate(sample_dict["ids"])}
 
     # initialize arrays of unknown size - separate arrays for bedrock and non-bedrock
     plot_t_br = []
@@ -59,43 +64,46 @@ def age_elevation_plot(v3_age_results,cl36_age_results,sample_dict):
     if v3_age_results:
         for this_name in v3_age_results.keys():
             this_sample = v3_age_results[this_name]["LSD"]
+            nmatchi = sample_index.get(v3_age_results[this_name].get("sample_id"))
+            if nmatchi is None:
+                continue
             for nname in this_sample:
                 this_nuclide = this_sample[nname]
                 for age in this_nuclide:
                     if age[0] != '0':
                         # This appends to separate list for bedrock and non-bedrock samples.
-                        if 'edrock' in sample_whats[sample_names.index(this_name)]:
+                        if 'edrock' in sample_whats[nmatchi]:
                             plot_t_br.append(int(age[0]))
                             plot_dti_br.append(int(age[1]))
                             plot_dte_br.append(int(age[2]))
                             plot_fcol_br.append(fcols[nucs.index(nname)])
                             plot_lcol_br.append(lcols[nucs.index(nname)])
-                            plot_elv_br.append(sample_elvs[sample_names.index(this_name)])
+                            plot_elv_br.append(sample_elvs[nmatchi])
                             plot_name_br.append(this_name)
                             plot_nuc_br.append(nname)
-                            plot_what_br.append(sample_whats[sample_names.index(this_name)])
+                            plot_what_br.append(sample_whats[nmatchi])
                         else:
                             plot_t.append(int(age[0]))
                             plot_dti.append(int(age[1]))
                             plot_dte.append(int(age[2]))
                             plot_fcol.append(fcols[nucs.index(nname)])
                             plot_lcol.append(lcols[nucs.index(nname)])
-                            plot_elv.append(sample_elvs[sample_names.index(this_name)])
+                            plot_elv.append(sample_elvs[nmatchi])
                             plot_name.append(this_name)
                             plot_nuc.append(nname)
-                            plot_what.append(sample_whats[sample_names.index(this_name)])
+                            plot_what.append(sample_whats[nmatchi])
 
     # Do the same thing for Cl-36 if present. Append to same arrays.
-    # Note: added problem here is that the Cl-36 calculator input has had an aliquot
-    # name added to the sample name, so the original sample name won't match the sample
-    # name in the results.
+    # Note: the Cl-36 calculator input has had an aliquot name added to the sample name,
+    # so results are matched to samples by the sample id attached to them upstream.
 
     if cl36_age_results:
         for this_name in cl36_age_results.keys():
             this_sample = cl36_age_results[this_name]["LSD"]
-            # Now this_name is a sample name with aliquot. We need to match it to a sample
-            # name without aliquot, which is in the sample_names list.
-            nmatchi = int(where([tryn in this_name for tryn in sample_names])[0][0])
+            # Now this_name is a sample name with aliquot, its sample id says which sample it is.
+            nmatchi = sample_index.get(cl36_age_results[this_name].get("sample_id"))
+            if nmatchi is None:
+                continue
 
             for nname in this_sample:
                 this_nuclide = this_sample[nname]
@@ -277,114 +285,89 @@ def age_elevation_plot(v3_age_results,cl36_age_results,sample_dict):
     return components(column(p2, p))
 
 
-def camelplot(v3_age_results,cl36_age_results,sample_dict):
-    # Note: this is a lot of lines of code to do something that is not that complicated.
-    # Could be improved.
-    # unpack dict of sample related info generated upstream
-    sample_names = sample_dict["names"]
-    sample_whats = sample_dict["whats"]
-
-    # initialize arrays of unknown size
-    plot_t = array([])
-    plot_dti = plot_t
-    plot_dte = plot_t
-    plot_fcol = plot_t
-    plot_lcol = plot_t
-    plot_name = plot_t
-    plot_nuc = plot_t
-    plot_what = plot_t
+def _json_values(values, decimals=None):
+    # Plot data for the JSON endpoints: plain lists, with NaN as null
+    values = array(values, dtype=float)
+    if decimals is not None:
+        values = values.round(decimals)
+    return [None if v != v else v for v in values.tolist()]
 
-    [nucs, fcols, lcols] = nuclide_colors()
 
-    # Loop through age results and assign ages with matching sample info to
-    # bedrock or non-bedrock arrays.
+def camelplot_data(v3_age_results,cl36_age_results,sample_dict):
+    # The arrays drawn by camelplot: KDE curves on an age grid, normalized and offset
+    # for plotting, and one error bar per age. Also served as JSON, see scripts/plots.js.
+    # unpack dict of sample related info generated upstream
+    sample_whats = array(sample_dict["whats"], dtype=object)
 
-    sample_max = []
-    sorting_names = []
+    [nucs, fcols, lcols] = nuclide_colors()
+    fcol_by_nuc = dict(zip(nucs, fcols))
+    lcol_by_nuc = dict(zip(nucs, lcols))
 
-    if v3_age_results:
-        for this_name in v3_age_results.keys():
-            this_sample = v3_age_results[this_name]["LSD"]
-            sample_ages = []
-            isdata_this_sample = False
-            for nname in this_sample:
-                this_nuclide = this_sample[nname]
-                for age in this_nuclide:
-                    if age[0] != '0':
-                        isdata_this_sample = True
-                        # Append to lists
-                        plot_t = append(plot_t,int(age[0]))
-                        plot_dti = append(plot_dti,int(age[1]))
-                        plot_dte = append(plot_dte,int(age[2]))
-                        plot_fcol = append(plot_fcol, fcols[nucs.index(nname)])
-                        plot_lcol = append(plot_lcol, lcols[nucs.index(nname)])
-                        plot_name = append(plot_name,this_name)
-                        plot_nuc = append(plot_nuc,nname)
-                        plot_what = append(plot_what,sample_whats[sample_names.index(this_name)])
-                        sample_ages.append(int(age[0]))
-
-            if isdata_this_sample:
-                sample_max.append(max(sample_ages))
-                sorting_names.append(this_name)
+    ages = collect_ages(v3_age_results, cl36_age_results, sample_dict["ids"])
 
-    if cl36_age_results:
-        for this_name in cl36_age_results.keys():
-            this_sample = cl36_age_results[this_name]["LSD"]
-            # Now this_name is a sample name with aliquot. We need to match it to a sample
-            # name without aliquot, which is in the sample_names list.
-            nmatchi = int(where([tryn in this_name for tryn in sample_names])[0][0])
-            sample_ages = []
-            isdata_this_sample = False
-            for nname in this_sample:
-                this_nuclide = this_sample[nname]
-                for age in this_nuclide:
-                    if age[0] != '0':
-                        isdata_this_sample = True
-                        # Appends to existing lists.
-                        plot_t = append(plot_t, int(age[0]))
-                        plot_dti = append(plot_dti, int(age[1]))
-                        plot_dte = append(plot_dte, int(age[1])) # hack b/c exterr is unreliable for Cl-36, sometimes returns NaN
-                        plot_fcol = append(plot_fcol, fcols[nucs.index(nname)])
-                        plot_lcol = append(plot_lcol, lcols[nucs.index(nname)])
-                        plot_name = append(plot_name, this_name)
-                        plot_nuc = append(plot_nuc, nname)
-                        plot_what = append(plot_what, sample_whats[nmatchi])
-                        sample_ages.append(int(age[0]))
-
-            if isdata_this_sample:
-                sample_max.append(max(sample_ages))
-                sorting_names.append(this_name)
-
-    # Now generate camelplots
-    # Find bounds
-    minx = min(plot_t - 3*plot_dti)
-    # Stop at zero
-    if minx < 0:
-        minx = 0
-
-    maxx = max(plot_t + 3*plot_dti)
-    plotx = linspace(minx,maxx,400)
-
-    # Generate Gaussian kernels on plot_x for all data
-    all_camels = []
-    for a in range(0,len(plot_t)):
-        # Normal distribution
-        this_camel = exp(-0.5 * power(((plotx - plot_t[a])/plot_dti[a]),2)) / (sqrt(2 * pi) * plot_dti[a])
-        all_camels.append(this_camel)
+    # Kernel density estimates on a shared grid, one curve per nuclide
+    plotx = age_grid(ages.t, ages.dti)
+    maxx = plotx[-1]
+    unique_nuclides, nuclide_groups = unique(ages.nuclide.astype(str), return_inverse=True)
+    nuclide_camels = grouped_kde(plotx, ages.t, ages.dti, nuclide_groups, len(unique_nuclides))
 
     # Summary camel plot for all nuclides, except He-3/qtz
-    cplot_all = plotx - plotx  # zeros
-    for a in range(0,len(plot_t)):
-        # Leave out He-3 in quartz
-        if plot_nuc[a] != 'He-3 (qtz)':
-            cplot_all = cplot_all + all_camels[a]
+    cplot_all = nuclide_camels[unique_nuclides != 'He-3 (qtz)'].sum(axis=0)
 
     # The below is to suppress weird normalizations if individual plots are spiky.
-    nf = [max(cplot_all)]
+    nf = cplot_all.max()
+
+    # If there are multiple nuclides, make nuclide-specific camel plots.
+    nuclide_curves = []
+    if len(unique_nuclides) > 1:
+        offset = 0
+        for this_nuclide, this_camel in zip(unique_nuclides, nuclide_camels):
+            offset = offset - 0.05
+            this_nf = max(nf, this_camel.max())
+            nuclide_curves.append({'nuclide': str(this_nuclide),
+                                   'color': fcol_by_nuc[this_nuclide],
+                                   'y': _json_values(this_camel / this_nf + offset, 5)})
+
+    # The summary curve is left out if there are only He-3-in-qtz data, in which case
+    # we don't want to just plot zeros.
+    summary_curve = _json_values(cplot_all / nf, 5) if nf > 0 else None
+
+    # Multiple measurements for one sample stay on the same line, and lines are
+    # sorted by the oldest age of each sample.
+    y, n_rows = name_rows(ages.name, ages.t)
+
+    points = {'x': _json_values(ages.t),
+              'y': y.tolist(),
+              'xmin': _json_values(ages.t - ages.dti),
+              'xmax': _json_values(ages.t + ages.dti),
+              'plot_fcol': [fcol_by_nuc[n] for n in ages.nuclide],
+              'plot_lcol': [lcol_by_nuc[n] for n in ages.nuclide],
+              'name': ages.name.astype(str).tolist(),
+              'what': sample_whats[ages.sample].astype(str).tolist(),
+              'nuc': ages.nuclide.astype(str).tolist()}
+
+    note = None
+    if 'He-3 (qtz)' in unique_nuclides:
+        note = "Note: He-3-in-quartz data are not included in the summary KDE."
+
+    return {'kind': 'camel',
+            'x_end': float(maxx * 1.1),
+            'grid': _json_values(plotx, 1),
+            'nuclide_curves': nuclide_curves,
+            'summary_curve': summary_curve,
+            'points': points,
+            'n_rows': int(n_rows),
+            'note': note}
+
+
+@cached_plot
+def camelplot(v3_age_results,cl36_age_results,sample_dict):
+    # Summary KDE of all ages above a strip of the ages themselves, one row per sample.
+    data = camelplot_data(v3_age_results, cl36_age_results, sample_dict)
 
     p = figure(height=150,
                width=800,
-               x_range=[0,maxx*1.1],
+               x_range=[0,data['x_end']],
                x_axis_type=None,
                y_axis_type=None,
                toolbar_location=None,
@@ -396,26 +379,12 @@ def camelplot(v3_age_results,cl36_age_results,sample_dict):
     p.title.text_font_size='14pt'
     p.outline_line_color = None
 
-    # If there are multiple nuclides, make nuclide-specific camel plots.
-    unique_nuclides = set(plot_nuc)
-    if len(unique_nuclides) > 1:
-        nuclide_camels = []
-        # Case we have multiple nuclides. Make multiple camel plots.
-        offset = 0
-        for this_nuclide in unique_nuclides:
-            offset = offset - 0.05
-            indices = where(this_nuclide == plot_nuc)
-            this_camel = plotx - plotx
-            for a in indices[0]:
-                this_camel = this_camel + all_camels[a]
-                this_nf = max([nf, max(this_camel)])
-            p.line(x=plotx,y=(this_camel / this_nf + offset),line_color=fcols[nucs.index(this_nuclide)],line_width=1)
+    for curve in data['nuclide_curves']:
+        p.line(x=data['grid'],y=curve['y'],line_color=curve['color'],line_width=1)
 
     # Now plot the one for all nuclides on top
-    # This actually has to be conditional to cover the case where there are only He-3-in-qtz data, in which case
-    # we don't want to just plot zeros.
-    if max(cplot_all) > 0:
-        p.line(x=plotx,y=(cplot_all / nf ),line_color='black',line_width=2)
+    if data['summary_curve'] is not None:
+        p.line(x=data['grid'],y=data['summary_curve'],line_color='black',line_width=2)
 
     # Now plot additional axes with dots and bars
     TOOLTIPS = """
@@ -424,42 +393,13 @@ def camelplot(v3_age_results,cl36_age_results,sample_dict):
         </div>
         """
 
-    # What we are trying to do here is keep multiple measurements for one sample on the same line,
-    # but sort them by the oldest age for each sample. The result is that this is super clunky, it seems
-    # like there should be a better algorithm for this.
-
-    sample_max = array(sample_max)
-    sorting_names = array(sorting_names)
-    sample_sort_i = argsort(sample_max)
-    sorted_names = sorting_names[sample_sort_i]
-
-    y = plot_t - plot_t # zeros
-    a = 1
-    for n1 in sorted_names:
-        b = 0
-        for n2 in plot_name:
-            if n1 == n2:
-                y[b] = a
-
-            b = b + 1
-
-        a = a + 1
-
-    # OK, now ready to plot
-    p2data = {'x': plot_t,
-            'y': y,
-            'xmin': plot_t - plot_dti,
-            'xmax': plot_t + plot_dti,
-            'plot_fcol': array(plot_fcol),
-            'plot_lcol': array(plot_lcol),
-            'name': plot_name,
-            'what': plot_what,
-            'nuc': plot_nuc}
+    n_rows = data['n_rows']
+    p2data = data['points']
 
-    p2 = figure(height= 30 + 10*(len(sorted_names) + 4),
+    p2 = figure(height= 30 + 10*(n_rows + 4),
                 width=800,
-                x_range=[0,maxx*1.1],
-                y_range=[-3,(len(sorted_names)+2)],
+                x_range=[0,data['x_end']],
+                y_range=[-3,(n_rows+2)],
                 y_axis_type=None,
                 toolbar_location=None,
                 x_axis_label="Exposure age (yr)",
@@ -476,62 +416,59 @@ def camelplot(v3_age_results,cl36_age_results,sample_dict):
     [plot_script, plot_div] = components(column(p, p2))
 
     # Add some explanatory text if necessary
-    if 'He-3 (qtz)' in unique_nuclides:
-        plot_div = plot_div + "<div><p>Note: He-3-in-quartz data are not included in the summary KDE.</p></div>"
+    if data['note']:
+        plot_div = plot_div + f"<div><p>{data['note']}</p></div>"
 
     return plot_script,plot_div
 
-def NofZplot(depth_nuclide_data):
-    # This plots downcore nuclide concentrations.
+def NofZplot_data(depth_profile):
+    # The depth intervals drawn by NofZplot, from the columnar DepthProfile of a core,
+    # or None without any concentrations. Also served as JSON, see scripts/plots.js.
+    if len(depth_profile) == 0:
+        return None
 
     [nucs, fcols, lcols] = nuclide_colors()
+    fcol_by_nuc = dict(zip(nucs, fcols))
+    lcol_by_nuc = dict(zip(nucs, lcols))
+
+    # Depths and concentrations are shown as whole numbers
+    td = trunc(depth_profile.top_depth_cm)
+    bd = trunc(depth_profile.bot_depth_cm)
+    N = trunc(depth_profile.N)
+    dN = depth_profile.dN
+
+    # Colors are looked up once per nuclide and spread over its intervals
+    nid = depth_profile.nuclide.astype(str)
+    profile_nuclides, nuclide_index = unique(nid, return_inverse=True)
+    fcol = array([fcol_by_nuc[n] for n in profile_nuclides])[nuclide_index]
+    lcol = array([lcol_by_nuc[n] for n in profile_nuclides])[nuclide_index]
+
+    maxz = nanmax(bd) * 1.05
+    return {'kind': 'nofz',
+            'max_depth': float(maxz),
+            'height': min(800,round(max(350, maxz * 0.8))),
+            'intervals': {'y': _json_values((td + bd) / 2),
+                          'height': _json_values(bd - td),
+                          'left': _json_values(N - dN),
+                          'right': _json_values(N + dN),
+                          'N': _json_values(N),
+                          'fill_color': fcol.tolist(),
+                          'line_color': lcol.tolist(),
+                          'nid': nid.tolist(),
+                          'td': _json_values(td),
+                          'bd': _json_values(bd)}}
+
+
+@cached_plot
+def NofZplot(depth_profile):
+    # This plots downcore nuclide concentrations.
+    plot_data = NofZplot_data(depth_profile)
+
+    if plot_data is not None:
 
-    # Fill arrays with data
-    td = array([])
-    bd = array([])
-    N = array([])
-    dN = array([])
-    lcol = array([])
-    fcol = array([])
-    nid = array([])
-
-    # This matches up nuclides to stuff that is in the input arg dict
-
-    nnames = {'He-3 (qtz)': 'n3_atoms_g',
-              'He-3 (px/ol)': 'n3_atoms_g',
-              'Be-10 (qtz)': 'n10_atoms_g',
-              'C-14 (qtz)': 'n14_atoms_g',
-              'Ne-21 (qtz)': 'n21_atoms_g',
-              'Al-26 (qtz)': 'n26_atoms_g'}
-    dnnames = {'He-3 (qtz)': 'deln3_atoms_g',
-              'He-3 (px/ol)': 'deln3_atoms_g',
-               'Be-10 (qtz)': 'deln10_atoms_g',
-               'C-14 (qtz)': 'deln14_atoms_g',
-               'Ne-21 (qtz)': 'deln21_atoms_g',
-               'Al-26 (qtz)': 'deln26_atoms_g'}
-
-    # Read data out into arrays for plotting
-    for k in depth_nuclide_data.keys():
-        this_nuclide = k
-        this_fcol = fcols[nucs.index(this_nuclide)]
-        this_lcol = lcols[nucs.index(this_nuclide)]
-        this_data = depth_nuclide_data[k]
-        this_nname = nnames[k]
-        this_dnname = dnnames[k]
-        if this_data is not None:
-            for this_item in this_data:
-                td = append(td, int(this_item['top_depth_cm']))
-                bd = append(bd, int(this_item['bot_depth_cm']))
-                fcol = append(fcol, this_fcol)
-                lcol = append(lcol, this_lcol)
-                N = append(N, int(this_item[this_nname]))
-                dN = append(dN, this_item[this_dnname])
-                nid = append(nid, this_nuclide)
-
-    if len(N) > 0:
-
-        maxz = max(bd) * 1.05
-        fht = min(800,round(max(350, maxz * 0.8)))
+        maxz = plot_data['max_depth']
+        fht = plot_data['height']
+        data = plot_data['intervals']
 
         TOOLTIPS = """
                 <div>
@@ -539,17 +476,6 @@ def NofZplot(depth_nuclide_data):
                 </div>
                 """
 
-        data = {'y': ((td + bd) / 2),
-                'height': (bd - td),
-                'left': (N - dN),
-                'right': (N + dN),
-                'fill_color': fcol,
-                'line_color': lcol,
-                'nid': nid,
-                'td': td,
-                'bd': bd
-                }
-
         # Create main figure
         p = figure(
             tools='',
@@ -584,11 +510,11 @@ def NofZplot(depth_nuclide_data):
                line_alpha=0.5
                )
 
-        p.vbar(x=N,
-               top=td,
-               bottom=bd,
+        p.vbar(x=data['N'],
+               top=data['td'],
+               bottom=data['bd'],
                width=0,
-               line_color=lcol,
+               line_color=data['line_color'],
                line_width=0.75
                )
 
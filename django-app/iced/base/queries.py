@@ -1,4 +1,28 @@
-def exposure_calculator_string_query(sample_ids: str, known_age: bool = False) -> str:
+import json
+
+from django.db import connection
+
+# Id lists are passed as a single JSON array parameter and expanded server side,
+# so the statement text is the same for every call and never grows with the list
+ID_LIST_TABLE = "json_table(%s, '$[*]' columns (id bigint path '$')) id_list"
+
+
+def id_list_param(ids) -> str:
+    return json.dumps([int(i) for i in ids])
+
+
+def run_query(query: tuple, as_dicts: bool = False) -> list:
+    """Executes a (sql, params) pair from this module and returns all rows"""
+    sql, params = query
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        if as_dicts:
+            columns = [col[0] for col in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return cursor.fetchall()
+
+
+def exposure_calculator_string_query(sample_ids: list[int], known_age: bool = False) -> tuple[str, list]:
     known_age_query = """
 calibration_text as (
     select s.id,
@@ -26,11 +50,11 @@ calibration_text as (
 ),
 """
 
-    sql =  f"""
+    sql = f"""
 with sample as (
     select *
     from base_sample
-    where id in ({','.join([str(sample_id) for sample_id in sample_ids])})
+    where id in (select id from {ID_LIST_TABLE})
 ),
  sample_text as (
      select id,
@@ -239,15 +263,15 @@ from sample_text st
          left join c14quartz_text c14 on st.id = c14.id
 """
 
-    return sql
+    return sql, [id_list_param(sample_ids)]
 
 
-def cl36_calculator_string_query(sample_ids: str) -> str:
-    return f"""
+def cl36_calculator_string_query(sample_ids: list[int]) -> tuple[str, list]:
+    sql = f"""
 with sample as (
     select *
     from base_sample
-    where id in ({','.join([str(sample_id) for sample_id in sample_ids])})
+    where id in (select id from {ID_LIST_TABLE})
 ),
  sample_text as (
      select id,
@@ -433,13 +457,15 @@ from sample_text st
          left join trace_text traceel on st.id = traceel.id;
 """
 
+    return sql, [id_list_param(sample_ids)]
+
 
-def sample_nuclide_match_query(sample_ids: list[int], core_samples=False):
+def sample_nuclide_match_query(sample_ids: list[int], core_samples=False) -> tuple[str, list]:
     if core_samples:
-        return f"""
+        sql = f"""
 with coresamples as (
     select * from base_coresample
-    where id in ({','.join([str(id_val) for id_val in sample_ids])})
+    where id in (select id from {ID_LIST_TABLE})
 )
 select cs.id,
        cs.name,
@@ -468,7 +494,7 @@ from coresamples cs
 group by cs.id;
 """
     else:
-        return f"""
+        sql = f"""
 select s.id,
            s.name,
            s.lat_DD,
@@ -492,16 +518,36 @@ from base_sample s
      left join _he3_pxol he3_pxol on s.id = he3_pxol.sample_id
      left join _ne21_quartz ne21_quartz on s.id = ne21_quartz.sample_id
      left join _cl36 cl36 on s.id = cl36.sample_id
-where s.id in ({','.join([str(id_val) for id_val in sample_ids])})
+where s.id in (select id from {ID_LIST_TABLE})
 group by s.id    
 """
 
+    return sql, [id_list_param(sample_ids)]
 
-# This comes back as a JSON payload - easier to convert to API later + sorted already
-def depth_nuclide_concentration_query(core_id):
+
+def _depth_profile_select(nuclide: str, n: str, del_n: str, measurement_id: str) -> str:
     return f"""
+    select core_id,
+           '{nuclide}' as nuclide,
+           min(top_depth_cm) as top_depth_cm,
+           max(bot_depth_cm) as bot_depth_cm,
+           min(top_depth_gcm2) as top_depth_gcm2,
+           max(bot_depth_gcm2) as bot_depth_gcm2,
+           {n} as n_atoms_g,
+           {del_n} as deln_atoms_g,
+           count({measurement_id}) as count
+    from core_samples
+    where {n} > 0
+    group by core_id, {measurement_id}
+"""
+
+
+# One row per measurement and depth interval of the cores, sorted by core, nuclide
+# and depth. Measurements split over several core samples span their depths.
+def depth_profile_query(core_ids) -> tuple[str, list]:
+    sql = f"""
     with core_samples as (
-    select ccs.id as ccs_id,
+    select ccs.core_id,
            ccs.top_depth_cm,
            ccs.bot_depth_cm,
            ccs.top_depth_gcm2,
@@ -518,85 +564,141 @@ def depth_nuclide_concentration_query(core_id):
     left join base_coresamplenuclidematch ccsnm on ccsnm.coresample_id = ccs.id
     left join _ne21_quartz n21q on ccsnm.Ne21_quartz_id = n21q.id
     left join _be10_al26_quartz b10a26 on ccsnm.Be10_Al26_quartz_id = b10a26.id
-    where ccs.core_id = {core_id}
-), ne21_data as (
-    select
-       min(ccs.top_depth_cm) as top_depth_cm,
-       max(ccs.bot_depth_cm) as bot_depth_cm,
-       min(ccs.top_depth_gcm2) as top_depth_gcm2,
-       max(ccs.bot_depth_gcm2) as bot_depth_gcm2,
-       N21xs_atoms_g,
-       delN21xs_atoms_g,
-       count(Ne21_quartz_id) as count
-    from core_samples ccs
-    where N21xs_atoms_g > 0
-    group by Ne21_quartz_id
-    order by top_depth_cm
-), be10_data as (
-    select
-       min(ccs.top_depth_cm) as top_depth_cm,
-       max(ccs.bot_depth_cm) as bot_depth_cm,
-       min(ccs.top_depth_gcm2) as top_depth_gcm2,
-       max(ccs.bot_depth_gcm2) as bot_depth_gcm2,
-       N10_atoms_g,
-       delN10_atoms_g,
-       count(Be10_Al26_quartz_id) as count
-    from core_samples ccs
-    where N10_atoms_g > 0
-    group by Be10_Al26_quartz_id
-    order by top_depth_cm
-), al26_data as (
-    select
-       min(ccs.top_depth_cm) as top_depth_cm,
-       max(ccs.bot_depth_cm) as bot_depth_cm,
-       min(ccs.top_depth_gcm2) as top_depth_gcm2,
-       max(ccs.bot_depth_gcm2) as bot_depth_gcm2,
-       N26_atoms_g,
-       delN26_atoms_g,
-       count(Be10_Al26_quartz_id) as count
-    from core_samples ccs
-    where N26_atoms_g > 0
-    group by Be10_Al26_quartz_id
-    order by top_depth_cm
-), ne21_json as (
-    select JSON_ARRAYAGG(
-    JSON_OBJECT(
-        'top_depth_cm', top_depth_cm,
-        'bot_depth_cm', bot_depth_cm,
-        'top_depth_gcm2', top_depth_gcm2,
-        'bot_depth_gcm2', bot_depth_gcm2,
-        'n21_atoms_g', N21xs_atoms_g,
-        'deln21_atoms_g', delN21xs_atoms_g,
-        'count', count
-    )) from ne21_data
-    order by top_depth_cm
-), be10_json as (
-    select JSON_ARRAYAGG(
-    JSON_OBJECT(
-        'top_depth_cm', top_depth_cm,
-        'bot_depth_cm', bot_depth_cm,
-        'top_depth_gcm2', top_depth_gcm2,
-        'bot_depth_gcm2', bot_depth_gcm2,
-        'n10_atoms_g', N10_atoms_g,
-        'deln10_atoms_g', delN10_atoms_g,
-        'count', count
-    )) from be10_data
-    order by top_depth_cm
-), al26_json as (
-    select JSON_ARRAYAGG(
-    JSON_OBJECT(
-        'top_depth_cm', top_depth_cm,
-        'bot_depth_cm', bot_depth_cm,
-        'top_depth_gcm2', top_depth_gcm2,
-        'bot_depth_gcm2', bot_depth_gcm2,
-        'n26_atoms_g', N26_atoms_g,
-        'deln26_atoms_g', delN26_atoms_g,
-        'count', count
-    )) from al26_data
-    order by top_depth_cm
-) select JSON_OBJECT(
-    'Be-10 (qtz)', (select * from be10_json),
-    'Ne-21 (qtz)', (select * from ne21_json),
-    'Al-26 (qtz)', (select * from al26_json)
+    where ccs.core_id in (select id from {ID_LIST_TABLE})
 )
+{_depth_profile_select("Al-26 (qtz)", "N26_atoms_g", "delN26_atoms_g", "Be10_Al26_quartz_id")}
+union all
+{_depth_profile_select("Be-10 (qtz)", "N10_atoms_g", "delN10_atoms_g", "Be10_Al26_quartz_id")}
+union all
+{_depth_profile_select("Ne-21 (qtz)", "N21xs_atoms_g", "delN21xs_atoms_g", "Ne21_quartz_id")}
+order by core_id, nuclide, top_depth_cm
+"""
+
+    return sql, [id_list_param(core_ids)]
+
+
+# Changes whenever a core sample, its nuclide links or the depth profile values of
+# the cores change, including through raw SQL that no model signal sees
+def core_data_stamp_query(core_ids) -> tuple[str, list]:
+    sql = f"""
+select count(*),
+       coalesce(sum(crc32(concat_ws('|',
+           ccs.id, ccs.name, ccs.top_depth_cm, ccs.bot_depth_cm,
+           ccs.top_depth_gcm2, ccs.bot_depth_gcm2,
+           ccsnm.id, ccsnm.be10_al26_quartz_id, ccsnm.c14_quartz_id, ccsnm.cl36_id,
+           ccsnm.he3_pxol_id, ccsnm.he3_quartz_id, ccsnm.ne21_quartz_id,
+           ccsnm.major_element_id, ccsnm.trace_element_id, ccsnm.u_th_quartz_id,
+           n21q.N21xs_atoms_g, n21q.delN21xs_atoms_g,
+           b10a26.N10_atoms_g, b10a26.delN10_atoms_g,
+           b10a26.N26_atoms_g, b10a26.delN26_atoms_g
+       ))), 0)
+from base_coresample ccs
+left join base_coresamplenuclidematch ccsnm on ccsnm.coresample_id = ccs.id
+left join _ne21_quartz n21q on ccsnm.Ne21_quartz_id = n21q.id
+left join _be10_al26_quartz b10a26 on ccsnm.Be10_Al26_quartz_id = b10a26.id
+where ccs.core_id in (select id from {ID_LIST_TABLE})
+"""
+
+    return sql, [id_list_param(core_ids)]
+
+
+def application_publication_index_query(publication_ids: list[int] = None) -> tuple[str, list]:
+    """Index rows of the given publications, or of all publications"""
+    # Sample matches reach an application through the sample's site, core sample
+    # matches through the core's site
+    publication_filter = (
+        f"where spm.publication_id in (select id from {ID_LIST_TABLE})"
+        if publication_ids is not None
+        else ""
+    )
+    sql = f"""
+insert into base_applicationpublication
+    (application_id, publication_id, year, sample_count, core_sample_count)
+select matches.application_id,
+       matches.publication_id,
+       pub.year,
+       sum(matches.is_sample),
+       sum(matches.is_core_sample)
+from (
+    select cas.application_id, spm.publication_id, 1 as is_sample, 0 as is_core_sample
+    from base_samplepublicationsmatch spm
+             join base_sample s on s.id = spm.sample_id
+             join base_application_sites cas on cas.site_id = s.site_id
+    {publication_filter}
+    union all
+    select cas.application_id, spm.publication_id, 0 as is_sample, 1 as is_core_sample
+    from base_samplepublicationsmatch spm
+             join base_coresample cs on cs.id = spm.core_sample_id
+             join base_core c on c.id = cs.core_id
+             join base_application_sites cas on cas.site_id = c.site_id
+    {publication_filter}
+) matches
+         join base_publication pub on pub.id = matches.publication_id
+group by matches.application_id, matches.publication_id, pub.year
+"""
+
+    return sql, [id_list_param(publication_ids)] * 2 if publication_ids is not None else []
+
+
+# Nuclide measurement tables counted per site in the site listings
+SITE_MEASUREMENT_TABLES = [
+    "_be10_al26_quartz",
+    "_c14_quartz",
+    "_cl36",
+    "_he3_pxol",
+    "_he3_quartz",
+    "_ne21_quartz",
+    "_u_th_quartz",
+]
+
+
+def site_counts_query(site_ids: list[int] = None) -> tuple[str, list]:
+    """Sample, core and nuclide measurement counts of the given sites, or of all sites"""
+    # With site ids every derived table only reads the rows of those sites, so
+    # refreshing a few sites does not count the whole database
+    if site_ids is not None:
+        site_lists = f"""
+with site_list as (select id from {ID_LIST_TABLE}),
+     site_samples as (select id from base_sample where site_id in (select id from site_list))"""
+        row_filter = "where site_id in (select id from site_list)"
+        sample_filter = " and sample_id in (select id from site_samples)"
+        site_filter = "where s.id in (select id from site_list)"
+        params = [id_list_param(site_ids)]
+    else:
+        site_lists = row_filter = sample_filter = site_filter = ""
+        params = []
+    measurements = "\n        union all\n        ".join(
+        f"select sample_id from {table} where sample_id is not null{sample_filter}"
+        for table in SITE_MEASUREMENT_TABLES
+    )
+    sql = f"""{site_lists}
+select s.id as site_id,
+       coalesce(sc.n, 0) as sample_count,
+       coalesce(cc.n, 0) as core_count,
+       coalesce(mc.n, 0) as measurement_count
+from base_site s
+         left join (select site_id, count(*) n from base_sample {row_filter} group by site_id) sc
+                   on sc.site_id = s.id
+         left join (select site_id, count(*) n from base_core {row_filter} group by site_id) cc
+                   on cc.site_id = s.id
+         left join (
+    select sa.site_id, count(*) n
+    from (
+        {measurements}
+    ) m
+             join base_sample sa on sa.id = m.sample_id
+    group by sa.site_id
+) mc on mc.site_id = s.id
+{site_filter}
 """
+
+    return sql, params
+
+
+def site_counts_insert_query(site_ids: list[int] = None) -> tuple[str, list]:
+    sql, params = site_counts_query(site_ids)
+    return (
+        "insert into base_sitecounts "
+        f"(site_id, sample_count, core_count, measurement_count) {sql}",
+        params,
+    )
@@ -0,0 +1,336 @@
+import threading
+
+from django.core.signals import request_finished, request_started
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from . import page_cache
+from .models import (
+    Application,
+    ApplicationPublication,
+    Be10Al26Quartz,
+    C14Quartz,
+    Calculation,
+    Cl36,
+    Core,
+    CoreSample,
+    CoresampleNuclideMatch,
+    FieldProperName,
+    He3Pxol,
+    He3Quartz,
+    Ne21Quartz,
+    Publication,
+    Sample,
+    SamplePublicationsMatch,
+    Site,
+    SiteCounts,
+    UThQuartz,
+)
+from .page_cache import tag
+
+
+def _invalidate_pages(*tags):
+    # After commit, so no request can cache the old rows under the new tag versions
+    transaction.on_commit(lambda: page_cache.invalidate(*tags))
+
+
+def _site_tags(site_ids) -> list:
+    """Tags of the sites and of the applications showing them"""
+    site_ids = [site_id for site_id in site_ids if site_id is not None]
+    application_ids = set(
+        Application.sites.through.objects.filter(site_id__in=site_ids).values_list(
+            "application_id", flat=True
+        )
+    )
+    return [tag("site", site_id) for site_id in site_ids] + [
+        tag("application", application_id) for application_id in application_ids
+    ]
+
+
+@receiver(post_save, sender=FieldProperName)
+@receiver(post_delete, sender=FieldProperName)
+def invalidate_field_proper_names(sender, **kwargs):
+    FieldProperName.invalidate_cache()
+    _invalidate_pages(tag("field_proper_names", "all"))
+
+
+@receiver(post_save, sender=Application)
+@receiver(post_delete, sender=Application)
+def invalidate_application_registry(sender, instance, **kwargs):
+    Application.invalidate_registry()
+    _invalidate_pages(tag("application", instance.id))
+
+
+@receiver(m2m_changed, sender=Application.sites.through)
+def invalidate_application_sites_pages(sender, instance, action, pk_set, **kwargs):
+    if action == "pre_clear":
+        # post_clear has no pk_set, so look the links up before they go
+        related = instance.sites if isinstance(instance, Application) else instance.applications
+        pk_set = set(related.values_list("id", flat=True))
+    elif action not in ("post_add", "post_remove"):
+        return
+
+    if isinstance(instance, Application):
+        tags = [tag("application", instance.id)]
+        tags += [tag("site", site_id) for site_id in pk_set or []]
+    else:
+        tags = [tag("site", instance.id)]
+        tags += [tag("application", application_id) for application_id in pk_set or []]
+    _invalidate_pages(*tags)
+
+
+# pre_delete: by post_delete the site's application links are already gone
+@receiver(post_save, sender=Site)
+@receiver(pre_delete, sender=Site)
+def invalidate_site_pages(sender, instance, **kwargs):
+    _invalidate_pages(*_site_tags([instance.id]))
+
+
+@receiver(post_save, sender=Sample)
+@receiver(post_delete, sender=Sample)
+def invalidate_sample_pages(sender, instance, **kwargs):
+    _invalidate_pages(tag("sample", instance.id), *_site_tags([instance.site_id]))
+
+
+@receiver(post_save, sender=Core)
+@receiver(post_delete, sender=Core)
+def invalidate_core_pages(sender, instance, **kwargs):
+    _invalidate_pages(tag("core", instance.id), *_site_tags([instance.site_id]))
+
+
+@receiver(post_save, sender=CoreSample)
+@receiver(post_delete, sender=CoreSample)
+def invalidate_core_sample_pages(sender, instance, **kwargs):
+    _invalidate_pages(tag("core", instance.core_id))
+
+
+@receiver(post_save, sender=CoresampleNuclideMatch)
+@receiver(post_delete, sender=CoresampleNuclideMatch)
+def invalidate_core_nuclide_pages(sender, instance, **kwargs):
+    core_ids = CoreSample.objects.filter(id=instance.coresample_id).values_list(
+        "core_id", flat=True
+    )
+    _invalidate_pages(*[tag("core", core_id) for core_id in core_ids])
+
+
+# Core samples link to their measurements through CoresampleNuclideMatch, whose
+# field for each nuclide model is given here. Deleted measurements take their
+# matches with them, which invalidate_core_nuclide_pages covers.
+CORE_MEASUREMENT_MATCH_FIELDS = {
+    Be10Al26Quartz: "be10_al26_quartz",
+    C14Quartz: "c14_quartz",
+    Cl36: "cl36",
+    He3Pxol: "he3_pxol",
+    He3Quartz: "he3_quartz",
+    Ne21Quartz: "ne21_quartz",
+    UThQuartz: "u_th_quartz",
+}
+
+
+@receiver(post_save, sender=Be10Al26Quartz)
+@receiver(post_save, sender=C14Quartz)
+@receiver(post_save, sender=Cl36)
+@receiver(post_save, sender=He3Pxol)
+@receiver(post_save, sender=He3Quartz)
+@receiver(post_save, sender=Ne21Quartz)
+@receiver(post_save, sender=UThQuartz)
+def invalidate_core_measurement_pages(sender, instance, **kwargs):
+    field = CORE_MEASUREMENT_MATCH_FIELDS[sender]
+    core_ids = (
+        CoreSample.objects.filter(**{f"coresamplenuclidematch__{field}": instance.id})
+        .values_list("core_id", flat=True)
+        .distinct()
+    )
+    _invalidate_pages(*[tag("core", core_id) for core_id in core_ids])
+
+
+@receiver(post_save, sender=Publication)
+@receiver(post_delete, sender=Publication)
+def invalidate_publication_pages(sender, instance, **kwargs):
+    _invalidate_pages(tag("publication", instance.id))
+
+
+@receiver(post_save, sender=SamplePublicationsMatch)
+@receiver(post_delete, sender=SamplePublicationsMatch)
+def invalidate_publication_match_pages(sender, instance, **kwargs):
+    tags = [tag("publication", instance.publication_id)]
+    site_ids = []
+    if instance.sample_id is not None:
+        tags.append(tag("sample", instance.sample_id))
+        site_ids += Sample.objects.filter(id=instance.sample_id).values_list(
+            "site_id", flat=True
+        )
+    if instance.core_sample_id is not None:
+        core = Core.objects.filter(coresample__id=instance.core_sample_id).first()
+        if core is not None:
+            tags.append(tag("core", core.id))
+            site_ids.append(core.site_id)
+    _invalidate_pages(*tags, *_site_tags(site_ids))
+
+
+@receiver(post_save, sender=Calculation)
+@receiver(post_delete, sender=Calculation)
+def invalidate_calculation_pages(sender, **kwargs):
+    _invalidate_pages(tag("calculations", "all"))
+
+
+_request = threading.local()
+_pending_refreshes = []
+
+
+class _PendingRefresh:
+    """
+    Collects the ids the saves of a thread touched and refreshes them with one
+    call once the transaction commits. Saves in autocommit mode wait for the end
+    of the request, or refresh at once outside of requests.
+    """
+
+    def __init__(self, refresh):
+        self.refresh = refresh
+        self.local = threading.local()
+        _pending_refreshes.append(self)
+
+    def add(self, ids) -> None:
+        ids = {i for i in ids if i is not None}
+        if not ids:
+            return
+        self.local.ids = getattr(self.local, "ids", set()) | ids
+        if transaction.get_connection().in_atomic_block:
+            # The first flush to run takes every pending id, so the others find
+            # nothing left; ids of a rolled back transaction ride along later
+            transaction.on_commit(self.flush)
+        elif not getattr(_request, "active", False):
+            self.flush()
+
+    def flush(self) -> None:
+        ids = getattr(self.local, "ids", None)
+        self.local.ids = set()
+        if ids:
+            self.refresh(list(ids))
+
+
+@receiver(request_started)
+def defer_refreshes(sender, **kwargs):
+    _request.active = True
+
+
+@receiver(request_finished)
+def flush_refreshes(sender, **kwargs):
+    _request.active = False
+    for pending in _pending_refreshes:
+        pending.flush()
+
+
+_publication_index = _PendingRefresh(ApplicationPublication.refresh)
+
+
+def _refresh_publication_index(publication_ids):
+    _publication_index.add(publication_ids)
+
+
+def _site_publication_ids(site_ids):
+    """Publications matched to the samples or core samples of the sites"""
+    return (
+        SamplePublicationsMatch.objects.filter(
+            Q(sample__site_id__in=site_ids) | Q(core_sample__core__site_id__in=site_ids)
+        )
+        .values_list("publication_id", flat=True)
+        .distinct()
+    )
+
+
+# pre_save: a match moved to another publication changes the counts of both
+@receiver(pre_save, sender=SamplePublicationsMatch)
+def refresh_previous_match_publication_index(sender, instance, **kwargs):
+    if instance.pk is not None:
+        _refresh_publication_index(
+            SamplePublicationsMatch.objects.filter(pk=instance.pk).values_list(
+                "publication_id", flat=True
+            )
+        )
+
+
+@receiver(post_save, sender=SamplePublicationsMatch)
+@receiver(post_delete, sender=SamplePublicationsMatch)
+def refresh_match_publication_index(sender, instance, **kwargs):
+    _refresh_publication_index([instance.publication_id])
+
+
+@receiver(post_save, sender=Publication)
+def refresh_publication_index(sender, instance, **kwargs):
+    _refresh_publication_index([instance.id])
+
+
+@receiver(post_save, sender=Sample)
+def refresh_sample_publication_index(sender, instance, **kwargs):
+    _refresh_publication_index(
+        SamplePublicationsMatch.objects.filter(sample_id=instance.id).values_list(
+            "publication_id", flat=True
+        )
+    )
+
+
+@receiver(post_save, sender=Core)
+def refresh_core_publication_index(sender, instance, **kwargs):
+    _refresh_publication_index(
+        SamplePublicationsMatch.objects.filter(core_sample__core_id=instance.id)
+        .values_list("publication_id", flat=True)
+        .distinct()
+    )
+
+
+@receiver(m2m_changed, sender=Application.sites.through)
+def refresh_application_sites_publication_index(sender, instance, action, pk_set, **kwargs):
+    if action not in ("pre_clear", "post_add", "post_remove"):
+        return
+    if not isinstance(instance, Application):
+        site_ids = [instance.id]
+    elif action == "pre_clear":
+        # post_clear has no pk_set, so look the sites up before they go
+        site_ids = list(instance.sites.values_list("id", flat=True))
+    else:
+        site_ids = pk_set or []
+    _refresh_publication_index(_site_publication_ids(site_ids))
+
+
+_site_counts = _PendingRefresh(SiteCounts.refresh)
+
+
+def _refresh_site_counts(site_ids):
+    _site_counts.add(site_ids)
+
+
+@receiver(post_save, sender=Sample)
+@receiver(post_delete, sender=Sample)
+@receiver(post_save, sender=Core)
+@receiver(post_delete, sender=Core)
+def refresh_site_counts(sender, instance, **kwargs):
+    _refresh_site_counts([instance.site_id])
+
+
+@receiver(post_save, sender=Be10Al26Quartz)
+@receiver(post_delete, sender=Be10Al26Quartz)
+@receiver(post_save, sender=C14Quartz)
+@receiver(post_delete, sender=C14Quartz)
+@receiver(post_save, sender=Cl36)
+@receiver(post_delete, sender=Cl36)
+@receiver(post_save, sender=He3Pxol)
+@receiver(post_delete, sender=He3Pxol)
+@receiver(post_save, sender=He3Quartz)
+@receiver(post_delete, sender=He3Quartz)
+@receiver(post_save, sender=Ne21Quartz)
+@receiver(post_delete, sender=Ne21Quartz)
+@receiver(post_save, sender=UThQuartz)
+@receiver(post_delete, sender=UThQuartz)
+def refresh_measurement_site_counts(sender, instance, **kwargs):
+    _refresh_site_counts(
+        Sample.objects.filter(id=instance.sample_id).values_list("site_id", flat=True)
+    )
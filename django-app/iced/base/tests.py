@@ -1,5 +1,38 @@
-from base.models import Application, Project
-from django.test import TestCase
+import json
+
+import numpy as np
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from api.queries import leafletmap_query
+from base import page_cache
+from base.calculations import CalculationError, CalculationResult, SampleNameIndex
+from base.depth_profiles import DepthProfile
+from base.kde import age_grid, collect_ages, grouped_kde, name_rows
+from base.management.commands.calculate_ages_utils import (
+    build_calculated_ages,
+    nuclide_maps,
+)
+from base.models import (
+    Application,
+    ApplicationPublication,
+    CalculatedAge,
+    Project,
+    Publication,
+    Sample,
+    SamplePublicationsMatch,
+    Site,
+)
+from base.plot_cache import get_plot_data, plot_key, set_plot_data
+from base.plots import NofZplot_data, camelplot_data, nuclide_colors
+from base.queries import (
+    application_publication_index_query,
+    sample_nuclide_match_query,
+    site_counts_query,
+)
+from base.signals import _PendingRefresh
+from base.views import _calculation_cache_key, _get_stored_age_results
 
 
 class ApplicationTestCase(TestCase):
@@ -13,6 +46,20 @@ class ApplicationTestCase(TestCase):
         test_application = Application.objects.get(name=self.application_name)
         self.assertEqual(test_application.name, self.application_name)
 
+    def test_registry_lookup_is_case_insensitive(self):
+        """Applications resolve from the registry by lowercased name"""
+        application = Application.get_application_by_name("TEST application")
+        self.assertEqual(application.name, self.application_name)
+        self.assertIsNone(Application.get_application_by_name("missing"))
+
+    def test_registry_invalidated_on_save(self):
+        """Saving an application refreshes the cached registry"""
+        Application.get_registry()
+        application = Application.objects.get(name=self.application_name)
+        application.name = "Renamed Application"
+        application.save()
+        self.assertIn("renamed application", Application.get_registry())
+
 
 class ProjectTestCase(TestCase):
     project = "Test Project"
@@ -32,3 +79,322 @@ class ProjectTestCase(TestCase):
         """Project created and named properly"""
         test_project = Project.objects.get(project=self.project)
         self.assertEqual(test_project.project, self.project)
+
+
+class PublicationIndexTestCase(TestCase):
+    def setUp(self):
+        self.application = Application.objects.create(name="Index Application")
+        site = Site.objects.create(short_name="INDEX-SITE")
+        self.application.sites.add(site)
+        self.sample = Sample.objects.create(
+            name="index-sample", lat_DD=0, lon_DD=0, elv_m=0, site=site
+        )
+        self.publication = Publication.objects.create(short_name="Matched", year=2020)
+        self.other = Publication.objects.create(short_name="Untouched", year=2010)
+
+    def test_match_refreshes_only_its_publication(self):
+        """Saving a match reindexes its publication and leaves the others as they are"""
+        ApplicationPublication.objects.create(
+            application=self.application, publication=self.other, sample_count=99
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            SamplePublicationsMatch.objects.create(
+                sample=self.sample, publication=self.publication
+            )
+
+        row = ApplicationPublication.objects.get(publication=self.publication)
+        self.assertEqual(row.application, self.application)
+        self.assertEqual((row.year, row.sample_count, row.core_sample_count), (2020, 1, 0))
+        other = ApplicationPublication.objects.get(publication=self.other)
+        self.assertEqual(other.sample_count, 99)
+
+
+class PendingRefreshTestCase(SimpleTestCase):
+    def test_request_saves_refresh_once(self):
+        """Autocommit saves during a request are refreshed together when it ends"""
+        calls = []
+        pending = _PendingRefresh(calls.append)
+        request_started.send(sender=None)
+        pending.add([1, 2])
+        pending.add([2, 3, None])
+        self.assertEqual(calls, [])
+        request_finished.send(sender=None)
+        self.assertEqual([sorted(ids) for ids in calls], [[1, 2, 3]])
+
+    def test_refresh_at_once_outside_requests(self):
+        """Autocommit saves outside of requests are refreshed right away"""
+        calls = []
+        _PendingRefresh(calls.append).add([4])
+        self.assertEqual(calls, [[4]])
+
+
+class CalculationCacheKeyTestCase(SimpleTestCase):
+    def test_key_ignores_whitespace_differences(self):
+        """Equivalent calculator input text maps to the same cache key"""
+        a = _calculation_cache_key("age_input_v3", "{}", "S1  -80.1 160.2 ;\n")
+        b = _calculation_cache_key("age_input_v3", "{}", "S1 -80.1 160.2;")
+        self.assertEqual(a, b)
+
+    def test_key_depends_on_calculation(self):
+        """Different calculators or settings never share cache entries"""
+        text = "S1 -80.1 160.2;"
+        self.assertNotEqual(
+            _calculation_cache_key("age_input_v3", "{}", text),
+            _calculation_cache_key("Cl36_input_v3", "{}", text),
+        )
+        self.assertNotEqual(
+            _calculation_cache_key("age_input_v3", "{}", text),
+            _calculation_cache_key("age_input_v3", '{"summary": "yes"}', text),
+        )
+
+
+class StoredAgeResultsTestCase(TestCase):
+    def setUp(self):
+        self.sample = Sample.objects.create(
+            name="stored-sample", lat_DD=0, lon_DD=0, elv_m=0
+        )
+        CalculatedAge.objects.create(
+            sample=self.sample, nuclide="N10quartz",
+            t_LSDn=12345.4, dtint_LSDn=None, dtext_LSDn=800,
+        )
+
+    def test_stored_nan_stays_nan(self):
+        """Ages stored as NULL come back as NaN, not as the "0" of no age"""
+        v3, _, v3_stale, _ = _get_stored_age_results(
+            [self.sample.id], {self.sample.id: "stored-sample 0 0 0;"}, {}
+        )
+        self.assertEqual(
+            v3["stored-sample"]["LSD"]["Be-10 (qtz)"], [["12345", "NaN", "800"]]
+        )
+        self.assertEqual(v3_stale, set())
+
+    def test_filtered_like_the_live_path(self):
+        """Samples without calculator input or with known ages get no stored ages"""
+        for v3_strings, known_age in (({self.sample.id: ""}, False),
+                                      ({self.sample.id: "stored-sample;"}, True)):
+            v3, _, v3_stale, _ = _get_stored_age_results(
+                [self.sample.id], v3_strings, {}, known_age
+            )
+            self.assertEqual(v3, {})
+            self.assertEqual(v3_stale, {self.sample.id})
+
+
+class CalculationResultTestCase(SimpleTestCase):
+    def test_from_xml(self):
+        """Calculator XML is parsed once into its root tag and sections"""
+        result = CalculationResult.from_xml(
+            "<calcs_v3_age_data><exposureAgeResult><sample_name>S1</sample_name>"
+            "</exposureAgeResult><ploturlstub>plot1</ploturlstub></calcs_v3_age_data>"
+        )
+        self.assertEqual(result.root, "calcs_v3_age_data")
+        self.assertEqual(result.exposure_age_results["sample_name"], "S1")
+        self.assertEqual(result.plot_url_stubs, ["plot1"])
+        self.assertEqual(result.diagnostics, [])
+        self.assertEqual(result.as_items()[0][0], "calcs_v3_age_data")
+
+    def test_invalid_xml(self):
+        """Non-XML calculator output raises CalculationError"""
+        with self.assertRaises(CalculationError):
+            CalculationResult.from_xml("Internal Server Error")
+
+
+class BuildCalculatedAgesTestCase(SimpleTestCase):
+    def test_one_record_per_measurement(self):
+        """Listed calculator values become one CalculatedAge each, NaN as None"""
+        fields = nuclide_maps["t10quartz_St"]["fields"]
+        ages = {name: ["100", "NaN"] for name in fields.values()}
+        records = build_calculated_ages(ages, sample_id=7)
+
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[0].nuclide, "N10quartz")
+        self.assertEqual(records[0].sample_id, 7)
+        self.assertEqual(records[0].t_St, "100")
+        self.assertIsNone(records[1].t_St)
+
+
+class QueryParametersTestCase(SimpleTestCase):
+    def test_statement_text_independent_of_ids(self):
+        """Id lists are bound as one JSON parameter instead of inlined"""
+        sql_a, params_a = sample_nuclide_match_query([1, 2])
+        sql_b, params_b = sample_nuclide_match_query(list(range(5000)))
+        self.assertEqual(sql_a, sql_b)
+        self.assertEqual(params_a, ["[1, 2]"])
+        self.assertEqual(len(params_b), 1)
+
+    def test_application_name_is_bound(self):
+        """The leaflet query never embeds the application name in SQL"""
+        sql, params = leafletmap_query("antarctica' or '1'='1")
+        self.assertNotIn("antarctica", sql)
+        self.assertEqual(params, ["antarctica' or '1'='1"])
+
+    def test_site_counts_scope(self):
+        """Site counts cover all sites unless an id list is given"""
+        sql_all, params_all = site_counts_query()
+        sql_some, params_some = site_counts_query([3, 4])
+        self.assertEqual(params_all, [])
+        self.assertNotIn("%s", sql_all)
+        self.assertEqual(params_some, ["[3, 4]"])
+        # Each derived table is restricted to the listed sites
+        self.assertEqual(sql_some.count("in (select id from site_list)"), 4)
+        self.assertEqual(sql_some.count("in (select id from site_samples)"), 7)
+
+    def test_publication_index_scope(self):
+        """The publication index covers all publications unless an id list is given"""
+        sql_all, params_all = application_publication_index_query()
+        _, params_some = application_publication_index_query([5])
+        self.assertEqual(params_all, [])
+        self.assertNotIn("%s", sql_all)
+        self.assertEqual(params_some, ["[5]", "[5]"])
+
+
+class PublicationBibtexTestCase(SimpleTestCase):
+    def test_parse_bibtex(self):
+        """Only the displayed fields of the first BibTeX entry are kept"""
+        fields = Publication.parse_bibtex(
+            "@article{smith2020, title={Ice ages}, author={Smith, J.}, "
+            "journal={Geology}, year={2020}, pages={1--10}}"
+        )
+        self.assertEqual(
+            fields,
+            {"title": "Ice ages", "author": "Smith, J.", "journal": "Geology", "year": "2020"},
+        )
+
+    def test_parse_empty_bibtex(self):
+        """Missing or unparseable records give no fields"""
+        self.assertEqual(Publication.parse_bibtex(None), {})
+        self.assertEqual(Publication.parse_bibtex("not bibtex"), {})
+
+
+@override_settings(
+    CACHES=settings.CACHES
+    | {"page_tags": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class PageCacheTestCase(SimpleTestCase):
+    def test_invalidate_tag(self):
+        """Invalidating a tag drops exactly the entries built with it"""
+        page_cache.set_page("page:/a", "a", ["site:1", "application:1"])
+        page_cache.set_page("page:/b", "b", ["site:2", "application:1"])
+        page_cache.invalidate("site:1")
+        self.assertIsNone(page_cache.get_page("page:/a"))
+        self.assertEqual(page_cache.get_page("page:/b"), "b")
+
+        page_cache.invalidate("application:1")
+        self.assertIsNone(page_cache.get_page("page:/b"))
+
+
+class KDETestCase(SimpleTestCase):
+    def test_grouped_kde_integrates_to_group_sizes(self):
+        """Each group's curve is the sum of its normalized kernels"""
+        t = np.array([10000.0, 12000.0, 30000.0])
+        sigma = np.array([500.0, 800.0, 1000.0])
+        groups = np.array([0, 0, 1])
+        x = np.linspace(0, 40000, 4001)
+        areas = np.trapz(grouped_kde(x, t, sigma, groups, 2), x, axis=1)
+        np.testing.assert_allclose(areas, [2, 1], rtol=1e-3)
+
+        # The plot grid stops 3 sigma past the outermost ages, cutting their far tails
+        x = age_grid(t, sigma)
+        areas = np.trapz(grouped_kde(x, t, sigma, groups, 2), x, axis=1)
+        tail = 0.00135
+        np.testing.assert_allclose(areas, [2 - tail, 1 - tail], rtol=1e-4)
+
+    def test_name_rows_sorted_by_oldest_age(self):
+        """Ages of one sample share a row, rows go from youngest to oldest sample"""
+        names = np.array(["B", "A", "B", "C"], dtype=object)
+        rows, n_rows = name_rows(names, np.array([5.0, 20.0, 30.0, 1.0]))
+        self.assertEqual(rows.tolist(), [3, 2, 3, 1])
+        self.assertEqual(n_rows, 3)
+
+    def test_collect_ages(self):
+        """v3 and Cl-36 ages are matched to their samples"""
+        v3 = {
+            "S1": {"LSD": {"Be-10 (qtz)": [["12000", "300", "900"], ["0", "0", "0"]]}, "sample_id": 7},
+            "S9": {"LSD": {"Be-10 (qtz)": [["9000", "300", "900"]]}, "sample_id": None},
+        }
+        cl36 = {"S2-a": {"LSD": {"Cl-36": [["15000", "500", "nan"]]}, "sample_id": 8}}
+        ages = collect_ages(v3, cl36, [7, 8])
+        self.assertEqual(ages.t.tolist(), [12000, 15000])
+        self.assertEqual(ages.dte.tolist(), [900, 500])
+        self.assertEqual(ages.sample.tolist(), [0, 1])
+
+
+class SampleNameIndexTestCase(SimpleTestCase):
+    def test_longest_sample_name_wins(self):
+        """Aliquot results go to the longest sample name they start with"""
+        index = SampleNameIndex({1: "KP-1", 2: "KP-10", 3: "XKP-1"})
+        self.assertEqual(index.resolve("KP-10 A"), 2)
+        self.assertEqual(index.resolve("KP-1 A"), 1)
+        self.assertEqual(index.resolve("XKP-1"), 3)
+        self.assertIsNone(index.resolve("KP-"))
+
+
+class PlotCacheTestCase(SimpleTestCase):
+    def test_key_follows_plotted_data(self):
+        """Equal inputs share a key whatever their order, other inputs do not"""
+        a = plot_key("camelplot", {"S1": {"LSD": {}}, "S2": {"LSD": {}}}, {"ids": [1, 2]})
+        b = plot_key("camelplot", {"S2": {"LSD": {}}, "S1": {"LSD": {}}}, {"ids": [1, 2]})
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, plot_key("camelplot", {"S1": {"LSD": {}}}, {"ids": [1]}))
+        self.assertNotEqual(a, plot_key("NofZplot", {"S1": {"LSD": {}}, "S2": {"LSD": {}}}, {"ids": [1, 2]}))
+
+    def test_plot_data_by_digest(self):
+        """Plot data is found by the digest it was stored under, malformed digests miss"""
+        digest = set_plot_data("camelplot", {"kind": "camel"}, {"S1": {"LSD": {}}}, {"ids": [1]})
+        self.assertEqual(get_plot_data("camelplot", digest), {"kind": "camel"})
+        self.assertIsNone(get_plot_data("nofz", digest))
+        self.assertIsNone(get_plot_data("camelplot", f"{digest} "))
+
+
+class PlotDataTestCase(SimpleTestCase):
+    def test_camelplot_data_is_json(self):
+        """Camel plot data is plain JSON with one point per age"""
+        v3 = {"S1": {"LSD": {"Be-10 (qtz)": [["12000", "300", "900"]]}, "sample_id": 7}}
+        cl36 = {"S2-a": {"LSD": {"Cl-36": [["15000", "500", "nan"]]}, "sample_id": 8}}
+        data = json.loads(json.dumps(camelplot_data(v3, cl36, {"ids": [7, 8], "whats": ["bedrock", "erratic"]})))
+        self.assertEqual(data["points"]["x"], [12000, 15000])
+        self.assertEqual(data["points"]["what"], ["bedrock", "erratic"])
+        self.assertEqual(len(data["nuclide_curves"]), 2)
+        self.assertEqual(len(data["grid"]), len(data["summary_curve"]))
+
+    def test_nofz_data_without_concentrations(self):
+        """Cores without nuclide concentrations have no N(z) plot"""
+        self.assertIsNone(NofZplot_data(DepthProfile.from_rows([])))
+
+    def test_nofz_data_columns(self):
+        """Each depth interval gets its nuclide's colors and a centered bar"""
+        profile = DepthProfile.from_rows(
+            [
+                ("Al-26 (qtz)", 0.0, 10.0, 0.0, 26.5, 2.5e6, 1e5, 1),
+                ("Be-10 (qtz)", 0.0, 10.0, 0.0, 26.5, 4e5, 1e4, 1),
+                ("Be-10 (qtz)", 10.0, 30.0, 26.5, 79.5, 3e5, None, 2),
+            ]
+        )
+        data = NofZplot_data(profile)
+        nucs, fcols, _ = nuclide_colors()
+        intervals = data["intervals"]
+        self.assertEqual(intervals["y"], [5, 5, 20])
+        self.assertEqual(intervals["fill_color"][1], fcols[nucs.index("Be-10 (qtz)")])
+        self.assertEqual(intervals["left"][2], None)
+        self.assertAlmostEqual(data["max_depth"], 31.5)
+
+
+class CorePlotTestCase(TestCase):
+    def setUp(self):
+        Application.objects.create(name="Plot Application")
+
+    def test_unknown_core(self):
+        """Plot data of a core that does not exist is a JSON 404"""
+        response = self.client.get("/plot%20application/core/no-such-core/plot")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {"plot": None})
+
+
+class DepthProfileTestCase(SimpleTestCase):
+    def test_records_for_data_tables(self):
+        """Every profile nuclide is listed, without rows as None"""
+        profile = DepthProfile.from_rows([("Be-10 (qtz)", 0.0, 10.0, 0.0, 26.5, 4e5, None, 1)])
+        records = profile.as_records()
+        self.assertEqual(list(records), ["Al-26 (qtz)", "Be-10 (qtz)", "Ne-21 (qtz)"])
+        self.assertIsNone(records["Al-26 (qtz)"])
+        self.assertEqual(records["Be-10 (qtz)"][0]["n10_atoms_g"], 4e5)
+        self.assertIsNone(records["Be-10 (qtz)"][0]["deln10_atoms_g"])
@@ -1,18 +1,33 @@
-import json
+import functools
+import hashlib
 import logging
 import statistics
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
 
-import requests
 from django.conf import settings
+from django.core.cache import caches
 from django.core.exceptions import ObjectDoesNotExist
-from django.db.models import Count
-from django.http import HttpResponse
+from django.db import connection
+from django.db.models import Count, prefetch_related_objects
+from django.http import HttpResponse, JsonResponse
 from django.template import loader
 
-from .plots import age_elevation_plot, camelplot, NofZplot
+from . import page_cache
+from .calculations import (
+    CalculationError,
+    CalculationResult,
+    SampleNameIndex,
+    run_calculation_text,
+)
+from .plots import age_elevation_plot, camelplot, camelplot_data, NofZplot, NofZplot_data
 
+from .page_cache import tag
+from .plot_cache import get_plot_data, set_plot_data
 from .models import (
     Application,
+    ApplicationPublication,
+    CalculatedAge,
     Calculation,
     CalibrationData,
     Continent,
@@ -25,15 +40,6 @@ from .models import (
     Sample,
     SamplePublicationsMatch,
     Site,
-    Be10Al26Quartz,
-    C14Quartz,
-    He3Quartz,
-    He3Pxol,
-    Ne21Quartz,
-    UThQuartz,
-    Cl36,
-    MajorElement,
-    TraceElement,
 )
 
 logger = logging.getLogger(__name__)
@@ -47,20 +53,28 @@ context_base = {
 }
 
 
-def _call_calculation(calculation_name: str, input: str):
+def _calculation_cache_key(calculation_name: str, variable_json: str, input: str) -> str:
+    # Content-addressed: the same calculator, settings and input text always map to
+    # the same key, so unchanged samples never need another round trip.
+    digest = hashlib.sha256()
+    for part in (calculation_name, variable_json or "", _format_calc_string(input)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return f"calculation:{digest.hexdigest()}"
+
+
+def _call_calculation(calculation_name: str, input: str) -> CalculationResult:
     calculation = Calculation.get_calculation_by_name(calculation_name)
-    variables = json.loads(calculation.variable_json)
-    variables["summary"] = "no"
-    variables["text_block"] = input
-    run_calculation_endpoint = (
-        f"{settings.BASE_URL}/api/calculations/run/" + calculation_name
+    cache_key = _calculation_cache_key(
+        calculation_name, calculation.variable_json, input
     )
+    cached = caches["calculations"].get(cache_key)
+    if cached is not None:
+        return cached
 
-    req = requests.request("GET", run_calculation_endpoint, data=json.dumps(variables))
-    if req.status_code != 200:
-        return ""
-    else:
-        return req.text
+    result = run_calculation_text(calculation, input, summary="no")
+    caches["calculations"].set(cache_key, result)
+    return result
 
 
 def _format_calc_string(str):
@@ -69,8 +83,9 @@ def _format_calc_string(str):
     return ';\n'.join(lines) + ";" if len(lines) > 0 else ''
 
 
-def _rename_age_results(results):
-    # Takes calculation results and returns exposure age data to be presented on page
+def _rename_age_results(results, name_index: SampleNameIndex = None):
+    # Takes calculation results and returns exposure age data to be presented on page.
+    # With a name index, each sample's entry also gets the id of the sample it belongs to.
     St_match = {
         "t3quartz_St": "He-3 (qtz)",
         "t3olivine_St": "He-3 (ol)",
@@ -141,36 +156,326 @@ def _rename_age_results(results):
                         exposure_age_table_data[sample_name]["LSD"][LSD_match[m]] = [
                             [result[keys[i]], result[keys[i + 1]], result[keys[i + 2]]]
                         ]
+
+    if name_index is not None:
+        for sample_name, sample_results in exposure_age_table_data.items():
+            sample_results["sample_id"] = name_index.resolve(sample_name)
     return exposure_age_table_data
 
 
-def _get_calculated_age_plot_diagnostics(calc_str, calc_to_call):
+def _get_calculated_age_plot_diagnostics(calc_str, calc_to_call, name_index=None):
+    # Also returns whether the calculator failed, so the page showing the missing
+    # results is not cached
+    age_results = plots = diagnostics = []
+    failed = False
     if calc_str != "":
         try:
-            calculated = json.loads(_call_calculation(calc_to_call, calc_str))
-
-            age_results = _rename_age_results(
-                calculated[0][1]["exposureAgeResult"]
-            )
-            plots = (
-                calculated[0][1]["ploturlstub"]
-                if "ploturlstub" in calculated[0][1]
-                else []
-            )
-            diagnostics = (
-                calculated[0][1]["diagnostics"]
-                if "diagnostics" in calculated[0][1]
-                else []
-            )
-        except:
+            calculated = _call_calculation(calc_to_call, calc_str)
+            age_results = _rename_age_results(calculated.exposure_age_results, name_index)
+            plots = calculated.plot_url_stubs
+            diagnostics = calculated.diagnostics
+        except CalculationError as e:
+            logger.warning(e)
+            failed = True
+        except Exception:
+            logger.exception(f"Could not read {calc_to_call} results")
             age_results = plots = diagnostics = []
+            failed = True
+
+    return age_results, plots, diagnostics, failed
+
+
+# Maps CalculatedAge.nuclide to the nuclide names used by _rename_age_results
+CALCULATED_AGE_NUCLIDES = {
+    "N3quartz": "He-3 (qtz)",
+    "N3olivine": "He-3 (ol)",
+    "N3pyroxene": "He-3 (px)",
+    "N10quartz": "Be-10 (qtz)",
+    "N14quartz": "C-14 (qtz)",
+    "N21quartz": "Ne-21 (qtz)",
+    "N26quartz": "Al-26 (qtz)",
+    "t36": "Cl-36",
+}
+
+
+def _format_stored_age(value):
+    # The calculator reports ages as whole years in text, which is what the results
+    # tables and plots expect. NaN results are stored as NULL and stay NaN, as "0"
+    # means no age to the tables and plots.
+    return "NaN" if value is None else f"{value:.0f}"
+
+
+def _get_stored_age_results(sample_ids, v3_strings: dict, cl36_strings: dict, known_age=False):
+    # Builds v3 and Cl-36 age results from the CalculatedAge rows written by the
+    # calculate_ages_* commands, in the same shape as _rename_age_results. Samples
+    # without stored ages, or edited since their ages were stored, are returned as
+    # stale so the caller can send just those to the live calculator.
+    # Like the live path, only samples with calculator input get ages. The commands
+    # calculate v3 ages without the known ages of calibration data sets, so those
+    # are always calculated live.
+    calculable_ids = {
+        "v3": set() if known_age else {i for i, s in v3_strings.items() if s != ""},
+        "cl36": {i for i, s in cl36_strings.items() if s != ""},
+    }
+    stored_ages = list(CalculatedAge.get_by_sample_ids(sample_ids))
+    outdated = set()
+    for age in stored_ages:
+        if age.when_updated is None or age.when_updated < age.sample.updated_at:
+            outdated.add(age.sample_id)
+
+    results = {"v3": {}, "cl36": {}}
+    fresh_ids = {"v3": set(), "cl36": set()}
+    for age in stored_ages:
+        nuclide = CALCULATED_AGE_NUCLIDES.get(age.nuclide)
+        if nuclide is None or age.sample_id in outdated:
+            continue
+        calc_type = "cl36" if nuclide == "Cl-36" else "v3"
+        if age.sample_id not in calculable_ids[calc_type]:
+            continue
+        fresh_ids[calc_type].add(age.sample_id)
+        sample_results = results[calc_type].setdefault(
+            age.sample.name, {"St": {}, "LSD": {}, "sample_id": age.sample_id}
+        )
+        sample_results["St"].setdefault(nuclide, []).append(
+            [
+                _format_stored_age(age.t_St),
+                _format_stored_age(age.dtint_St),
+                _format_stored_age(age.dtext_St),
+            ]
+        )
+        sample_results["LSD"].setdefault(nuclide, []).append(
+            [
+                _format_stored_age(age.t_LSDn),
+                _format_stored_age(age.dtint_LSDn),
+                _format_stored_age(age.dtext_LSDn),
+            ]
+        )
+
+    v3_stale_ids = set(sample_ids) - fresh_ids["v3"]
+    cl36_stale_ids = set(sample_ids) - fresh_ids["cl36"]
+    return results["v3"], results["cl36"], v3_stale_ids, cl36_stale_ids
+
+
+def _join_calc_strings(calc_strings):
+    return _format_calc_string("\n".join(s for s in calc_strings if s != ""))
+
+
+def _get_age_results(
+    calc_strings: dict,
+    calc_to_call: str,
+    stored_results: dict,
+    stale_ids: set,
+    name_index: SampleNameIndex,
+):
+    # Only samples without up to date stored ages are sent to the calculator
+    calc_str = _join_calc_strings(
+        calc_string
+        for sample_id, calc_string in calc_strings.items()
+        if sample_id in stale_ids
+    )
+    age_results, plots, diagnostics, failed = _get_calculated_age_plot_diagnostics(
+        calc_str, calc_to_call, name_index
+    )
+    if stored_results:
+        age_results = stored_results | (age_results or {})
+
+    return age_results, plots, diagnostics, failed
+
+
+def _run_in_worker(func, *args):
+    # Worker threads open their own database connection, which Django only closes
+    # for the request thread
+    try:
+        return func(*args)
+    finally:
+        connection.close()
+
+
+def _get_all_age_results(
+    sample_names: dict, v3_strings: dict, cl36_strings: dict, known_age=False
+):
+    # Runs the v3 and Cl-36 calculations side by side instead of one after the other.
+    # sample_names maps sample ids to names, to tag every result with its sample id.
+    # known_age says whether v3_strings hold the known ages of calibration data sets.
+    v3_stored, cl36_stored, v3_stale_ids, cl36_stale_ids = _get_stored_age_results(
+        list(sample_names), v3_strings, cl36_strings, known_age)
+    name_index = SampleNameIndex(sample_names)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        v3_future = executor.submit(
+            _run_in_worker, _get_age_results,
+            v3_strings, "age_input_v3", v3_stored, v3_stale_ids, name_index)
+        cl36_future = executor.submit(
+            _run_in_worker, _get_age_results,
+            cl36_strings, "Cl36_input_v3", cl36_stored, cl36_stale_ids, name_index)
+        return v3_future.result(), cl36_future.result()
+
+
+def _empty_age_context():
+    return {
+        "v3_age_results": [],
+        "v3_plots": [],
+        "v3_diagnostics": [],
+        "cl36_age_results": [],
+        "cl36_plots": [],
+        "cl36_diagnostics": [],
+        "is_summary_plot": False,
+        "summary_plot_text": "",
+        "plot_script": "",
+        "plot_div": "",
+        "calculation_failed": False,
+    }
+
+
+def _deferred_age_context(request):
+    # The page loads its age results from the "ages" endpoint next to it
+    return _empty_age_context() | {
+        "age_results_url": request.path.rstrip("/") + "/ages",
+    }
+
+
+def _plot_data_url(request, kind: str, name: str):
+    # JSON plot data endpoint of a site or core page, if plots are drawn client side
+    if not settings.CLIENT_SIDE_PLOTS:
+        return None
+    return f"/{request.application.name.lower()}/{kind}/{quote(name)}/plot"
+
+
+def _is_age_elevation_site(site_obj):
+    return site_obj.what is not None and 'unatak' in site_obj.what
+
+
+def _get_site_age_context(site_obj, samples, v3_strings: dict, cl36_strings: dict, plot_data_url=None, known_age=False):
+    # With a plot_data_url, the camel plot is left to the browser to draw from there
+    sample_ids = [sample.id for sample in samples]
+    (
+        (v3_age_results, v3_plots, v3_diagnostics, v3_failed),
+        (cl36_age_results, cl36_plots, cl36_diagnostics, cl36_failed),
+    ) = _get_all_age_results(
+        {sample.id: sample.name for sample in samples}, v3_strings, cl36_strings,
+        known_age)
+
+    plot_data_url_context = {}
+    # This triggers various summary plots for different site types.
+    if _is_age_elevation_site(site_obj) and (v3_age_results or cl36_age_results):
+        # Case nunatak. Make age-elevation plot.
+        sample_names = [sample.name for sample in samples]
+        sample_whats = [sample.what for sample in samples]
+        sample_elvs = [sample.elv_m for sample in samples]
+        sample_ice = [sample.local_ice_surface_m for sample in samples]
+        sample_dict = {"ids": sample_ids, "names": sample_names, "whats": sample_whats, "elvs": sample_elvs, "ice": sample_ice}
+        [plot_script, plot_div] = age_elevation_plot(v3_age_results, cl36_age_results, sample_dict)
+        is_summary_plot = True
+        summary_plot_text = "Age-elevation plot (drag x-axis limit in upper plot)"
+    elif (v3_age_results or cl36_age_results):
+        # Case not a nunatak, but there are some data.
+        # In this case, presumably landform has one age, so make a camel plot.
+        sample_names = [sample.name for sample in samples]
+        sample_whats = [sample.what for sample in samples]
+        sample_dict = {"ids": sample_ids, "names": sample_names, "whats": sample_whats}
+        is_summary_plot = True
+        if plot_data_url:
+            plot_script = plot_div = ''
+            if not (v3_failed or cl36_failed):
+                # Lets site_plot serve the data without running the calculations again
+                digest = set_plot_data(
+                    "camelplot",
+                    camelplot_data(v3_age_results, cl36_age_results, sample_dict),
+                    v3_age_results,
+                    cl36_age_results,
+                    sample_dict,
+                )
+                plot_data_url = f"{plot_data_url}?key={digest}"
+            plot_data_url_context = {"plot_data_url": plot_data_url}
+        else:
+            [plot_script, plot_div] = camelplot(v3_age_results, cl36_age_results, sample_dict)
+        summary_plot_text = "Summary data"
+        # Also do some summary stats?
     else:
-        age_results = plots = diagnostics = []
+        # No data, do nothing
+        plot_script = ''
+        plot_div = ''
+        is_summary_plot = False
+        summary_plot_text = ''
+
+    return {
+        "v3_age_results": v3_age_results,
+        "v3_plots": v3_plots,
+        "v3_diagnostics": v3_diagnostics,
+        "cl36_age_results": cl36_age_results,
+        "cl36_plots": cl36_plots,
+        "cl36_diagnostics": cl36_diagnostics,
+        "is_summary_plot": is_summary_plot,
+        "summary_plot_text": summary_plot_text,
+        "plot_script": plot_script,
+        "plot_div": plot_div.replace('<div','<div style="display:flex; align-items:center; justify-content:center;"'),
+        "calculation_failed": v3_failed or cl36_failed,
+    } | plot_data_url_context
+
+
+def _get_sample_age_context(sample_obj, v3_str, cl36_str):
+    (
+        (v3_age_results, v3_plots, v3_diagnostics, v3_failed),
+        (cl36_age_results, cl36_plots, cl36_diagnostics, cl36_failed),
+    ) = _get_all_age_results(
+        {sample_obj.id: sample_obj.name}, {sample_obj.id: v3_str}, {sample_obj.id: cl36_str})
+
+    return {
+        "v3_age_results": v3_age_results,
+        "v3_plots": v3_plots,
+        "v3_diagnostics": v3_diagnostics,
+        "cl36_age_results": cl36_age_results,
+        "cl36_plots": cl36_plots,
+        "cl36_diagnostics": cl36_diagnostics,
+        "calculation_failed": v3_failed or cl36_failed,
+    }
 
-    if isinstance(plots, str):
-        plots = [plots]
 
-    return age_results, plots, diagnostics
+def _cached_page(view):
+    # Serves a view from the page cache; only responses marked by _tagged are stored
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = f"page:{request.get_full_path()}"
+        cached = page_cache.get_page(key)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200 and hasattr(response, "cache_tags"):
+            page_cache.set_page(
+                key,
+                (response.content, response["Content-Type"]),
+                response.cache_tags,
+                response.cache_samples,
+                response.cache_cores,
+            )
+        return response
+
+    return wrapper
+
+
+def _tagged(
+    response: HttpResponse,
+    request,
+    *tags,
+    samples: dict = None,
+    cores: list = None,
+    cacheable: bool = True,
+) -> HttpResponse:
+    # Lets _cached_page store the response until the application, one of tags or,
+    # if given, the samples matching the samples filter or the data of the cores change.
+    # Responses that are not cacheable, such as pages missing results because the
+    # calculator failed, are left unmarked and get rebuilt on the next request.
+    if not cacheable:
+        return response
+    response.cache_tags = [tag("application", request.application.id), *tags]
+    response.cache_samples = samples
+    response.cache_cores = cores
+    return response
+
+
+def _publication_tags(publications) -> list:
+    return [tag("publication", p.id) for p in publications]
 
 
 def error_404_page(not_found: str, request) -> HttpResponse:
@@ -192,12 +497,9 @@ def home(request):
     return HttpResponse(template.render(context, request))
 
 
+@_cached_page
 def landing(request, application_name):
-    application_name = application_name.lower()
-    try:
-        application = Application.get_application_by_name(application_name)
-    except ObjectDoesNotExist:
-        return error_404_page(f"Can't find an application: {application_name}", request)
+    application = request.application
     distinct_contintents = Site.get_distinct_continents_by_application(application)
     publication_count = Publication.get_publication_count_by_application(application)
     site_ids = Site.get_site_ids_by_application(application)
@@ -224,62 +526,47 @@ def landing(request, application_name):
         "show_publications": show_publications,
         "show_pubyears": show_pubyears,
         "google_map_key": settings.GOOGLE_MAP_API_KEY,
-    } | application.get_application_ctx()
+    } | request.application_ctx
 
     template = loader.get_template("application.html")
 
-    return HttpResponse(template.render(context, request))
+    return _tagged(HttpResponse(template.render(context, request)), request)
 
 
+@_cached_page
 def cores(request, application_name):
-    application_name = application_name.lower()
 
-    try:
-        application = Application.get_application_by_name(application_name)
-    except ObjectDoesNotExist:
-        return error_404_page(f"Can't find application: {application_name}", request)
+    application = request.application
 
-    sites = application.sites.all().prefetch_related("cores").select_related("region")
+    sites = [site for site in Site.get_listing(application) if site.core_count > 0]
+    prefetch_related_objects(sites, "cores")
 
-    cores_by_site = [
-        {"cores": site.cores.all(), "site": site}
-        for site in sites
-        if len(site.cores.all()) > 0
-    ]
+    cores_by_site = [{"cores": site.cores.all(), "site": site} for site in sites]
 
     context = {
         "page_title": "Cores and subsurface data",
         "cores_by_site": cores_by_site,
-    } | application.get_application_ctx()
+    } | request.application_ctx
 
     template = loader.get_template("cores.html")
-    return HttpResponse(template.render(context, request))
+    return _tagged(HttpResponse(template.render(context, request)), request)
 
 
 def sitemap(request, application_name, site, lat, lon, zoom):
-    application_name = application_name.lower()
-
-    try:
-        application = Application.get_application_by_name(application_name)
-    except ObjectDoesNotExist:
-        return error_404_page(f"Can't find application: {application_name}", request)
-
     context = {
         "page_title": f"Sitemap for " + site,
         "google_map_key": settings.GOOGLE_MAP_API_KEY,
-    } | application.get_application_ctx()
+    } | request.application_ctx
 
     template = loader.get_template("sitemap.html")
     return HttpResponse(template.render(context, request))
 
 
+@_cached_page
 def core(request, application_name, core_name):
-    application_name = application_name.lower()
     core_name = core_name.lower()
-    try:
-        core_obj = Core.get_core_by_name(core_name)
-        application = Application.get_application_by_name(application_name)
-    except ObjectDoesNotExist:
+    core_obj = Core.get_core_by_name(core_name)
+    if core_obj is None:
         return error_404_page(
             f"Can't find an application/base: {application_name}, {core_name}", request
         )
@@ -294,13 +581,16 @@ def core(request, application_name, core_name):
     # MySQL doesn't support `DISTINCT ON` so uniquifying here using set
     publications = set([pm.publication for pm in publications_match])
     n_tables = CoreSample.get_formatted_nuclide(core_sample_ids)
-    depth_nuclide_data = json.loads(core_obj.get_depth_nuclide_concentration())
+    depth_profile = core_obj.get_depth_profile()
+    depth_nuclide_data = depth_profile.as_records()
 
-    [plot_script, plot_div] = NofZplot(depth_nuclide_data)
-    if len(plot_script) > 0:
-        is_NofZ_plot=True
+    plot_data_url = _plot_data_url(request, "core", core_obj.name)
+    if plot_data_url:
+        plot_script = plot_div = ''
+        is_NofZ_plot = len(depth_profile) > 0
     else:
-        is_NofZ_plot=False
+        [plot_script, plot_div] = NofZplot(depth_profile)
+        is_NofZ_plot = len(plot_script) > 0
 
 
     context = {
@@ -312,19 +602,42 @@ def core(request, application_name, core_name):
         "depth_nuclide_data": depth_nuclide_data,
         "plot_script": plot_script,
         "plot_div": plot_div.replace('<div','<div style="display:flex; align-items:center; justify-content:center;"'),
+        "plot_data_url": plot_data_url,
         "is_NofZ_plot": is_NofZ_plot
-    } | application.get_application_ctx()
+    } | request.application_ctx
 
     template = loader.get_template("core.html")
-    return HttpResponse(template.render(context, request))
+    return _tagged(
+        HttpResponse(template.render(context, request)),
+        request,
+        tag("core", core_obj.id),
+        *_publication_tags(publications),
+        cores=[core_obj.id],
+    )
+
+
+@_cached_page
+def core_plot(request, application_name, core_name):
+    # N(z) plot data of a core page, drawn by scripts/plots.js, see CLIENT_SIDE_PLOTS
+    core_obj = Core.get_core_by_name(core_name.lower())
+    if core_obj is None:
+        return JsonResponse({"plot": None}, status=404)
+
+    return _tagged(
+        JsonResponse({"plot": NofZplot_data(core_obj.get_depth_profile())}),
+        request,
+        tag("core", core_obj.id),
+        cores=[core_obj.id],
+    )
 
 
+@_cached_page
 def coresample(request, application_name, coresample_name):
     application_name = application_name.lower()
     coresample_name = coresample_name.lower()
     try:
         coresample_obj = CoreSample.get_core_sample_by_name(coresample_name)
-        application = Application.get_application_by_name(application_name)
+        application = request.application
     except ObjectDoesNotExist:
         return error_404_page(
             f"Can't find an application/sample: {application_name}, {coresample_name}",
@@ -351,34 +664,26 @@ def coresample(request, application_name, coresample_name):
         "coresample": coresample_obj,
         "field_proper_names": field_proper_names,
         "ntables": ntables,
-    } | application.get_application_ctx()
+    } | request.application_ctx
 
     template = loader.get_template("coresample.html")
-    return HttpResponse(template.render(context, request))
+    return _tagged(
+        HttpResponse(template.render(context, request)),
+        request,
+        tag("core", coresample_obj.core_id),
+        tag("field_proper_names", "all"),
+        cores=[coresample_obj.core_id],
+    )
 
 
+@_cached_page
 def publications(request, application_name):
-    application_name = application_name.lower()
-    try:
-        application = Application.get_application_by_name(application_name)
-    except ObjectDoesNotExist:
-        return error_404_page(
-            f"Can't find an application id: {application_name}", request
-        )
-
-    # The below uses a raw SQL query to get applications by going through sample pub matches.
-    # Note also should go through site-core-coresample-pub matches.
+    application = request.application
 
-    publications_spm = Publication.get_by_application(application)
-    publication_ids = [p.publication.id for p in publications_spm]
-    publications = Publication.objects.filter(id__in=publication_ids)
-
-    counts = {}
-    for m in publications_spm:
-        pub_id_str = f"{m.publication_id}"
-        if pub_id_str not in counts:
-            counts[pub_id_str] = 0
-        counts[pub_id_str] = counts[pub_id_str] + 1
+    # Publications reached through sample and site-core-coresample matches
+    index = ApplicationPublication.get_by_application(application)
+    publications = [entry.publication for entry in index]
+    counts = {f"{entry.publication_id}": entry.match_count for entry in index}
 
     # Todo: There is a bug in the data loading where it's missing some associated samples with publications
     # we need to pin down. Otherwise this mostly works.
@@ -386,28 +691,22 @@ def publications(request, application_name):
         "page_title": "All publications",
         "publications": publications,
         "counts": counts,
-    } | application.get_application_ctx()
+    } | request.application_ctx
 
     template = loader.get_template("publications.html")
-    return HttpResponse(template.render(context, request))
+    return _tagged(
+        HttpResponse(template.render(context, request)),
+        request,
+        *_publication_tags(publications),
+    )
 
 
+@_cached_page
 def pubYears(request, application_name):
-    application_name = application_name.lower()
-    try:
-        application = Application.get_application_by_name(application_name)
-    except ObjectDoesNotExist:
-        return error_404_page(
-            f"Can't find an application id: {application_name}", request
-        )
-
-
-    publications = Publication.get_by_application(application)
-    publication_ids = [p.publication.id for p in publications]
+    application = request.application
 
     publications_aggregate = (
-        Publication.objects.all()
-        .filter(id__in=publication_ids)
+        ApplicationPublication.objects.filter(application=application)
         .values("year")
         .annotate(total=Count("id"))
         .order_by("year")
@@ -417,55 +716,36 @@ def pubYears(request, application_name):
     context = {
         "page_title": "Browse publications by year",
         "publications": publications_aggregate,
-    } | application.get_application_ctx()
+    } | request.application_ctx
 
     template = loader.get_template("pubyears.html")
-    return HttpResponse(template.render(context, request))
+    return _tagged(HttpResponse(template.render(context, request)), request)
 
 
+@_cached_page
 def pubYear(request, application_name, year):
-    application_name = application_name.lower()
-    try:
-        application = Application.get_application_by_name(application_name)
- 
-    except ObjectDoesNotExist:
-        return error_404_page(
-            f"Can't find an application id: {application_name}", request
-        )
-
+    application = request.application
 
-    publications_spm = Publication.get_by_application(application)
-    publication_ids = [p.publication.id for p in publications_spm]
-    publications = Publication.objects.filter(id__in=publication_ids,year=year)
-
-    match_records = SamplePublicationsMatch.objects.filter(
-        publication_id__in=publication_ids ,publication__year=year, sample_id__isnull=False
-    )
-    counts = {}
-    for m in match_records:
-        pub_id_str = f"{m.publication_id}"
-        if pub_id_str not in counts:
-            counts[pub_id_str] = 0
-        counts[pub_id_str] = counts[pub_id_str] + 1
+    index = ApplicationPublication.get_by_application(application).filter(year=year)
+    publications = [entry.publication for entry in index]
+    counts = {f"{entry.publication_id}": entry.sample_count for entry in index}
 
     context = {
         "page_title": f"Publications dated {year}",
         "publications": publications,
         "counts": counts,
-    } | application.get_application_ctx()
+    } | request.application_ctx
 
     template = loader.get_template("pubyear.html")
-    return HttpResponse(template.render(context, request))
+    return _tagged(
+        HttpResponse(template.render(context, request)),
+        request,
+        *_publication_tags(publications),
+    )
 
 
 def nsf(request, application_name):
-    application_name = application_name.lower()
-    try:
-        application = Application.get_application_by_name(application_name)
-    except ObjectDoesNotExist:
-        return error_404_page(
-            f"Can't find an application id: {application_name}", request
-        )
+    application = request.application
 
     projects = Project.objects.prefetch_related("funding_sources").filter(
         application=application, NSF_title__isnull=False
@@ -474,7 +754,7 @@ def nsf(request, application_name):
     context = {
         "page_title": "NSF projects",
         "projects": projects,
-    } | application.get_application_ctx()
+    } | request.application_ctx
 
     template = loader.get_template("nsf.html")
     return HttpResponse(template.render(context, request))
@@ -483,9 +763,7 @@ def nsf(request, application_name):
 def nsf_samples(request, application_name, project_id):
     # Note: this doesn't appear to distinguish projects by application.
     # This will cause trouble if extended to applications other than Antarctica (e.g., Greenland).
-    application_name = application_name.lower()
     try:
-        application = Application.get_application_by_name(application_name)
         project_obj = Project.objects.prefetch_related(
             "funding_sources", "samples"
         ).get(pk=project_id)
@@ -509,20 +787,13 @@ def nsf_samples(request, application_name, project_id):
         "n_tables": n_tables,
         "no_cores": no_cores,
         "cores": cores,
-    } | application.get_application_ctx()
+    } | request.application_ctx
 
     template = loader.get_template("nsf_samples.html")
     return HttpResponse(template.render(context, request))
 
 
 def cal_data_set(request, application_name):
-    try:
-        application = Application.get_application_by_name(application_name)
-    except ObjectDoesNotExist:
-        return error_404_page(
-            f"Can't find an application id: {application_name}", request
-        )
-
     calibration_data_sets = (
         CalibrationData.objects.prefetch_related("samples")
         .select_related("publication")
@@ -532,7 +803,7 @@ def cal_data_set(request, application_name):
     context = {
         "page_title": "Calibration data sets",
         "cal_data_sets": calibration_data_sets,
-    } | application.get_application_ctx()
+    } | request.application_ctx
 
     template = loader.get_template("cal_data_set.html")
     return HttpResponse(template.render(context, request))
@@ -540,7 +811,7 @@ def cal_data_set(request, application_name):
 
 def cal_data_set_samples(request, application_name, cd_id):
     try:
-        application = Application.get_application_by_name(application_name)
+        application = request.application
         cal_data_obj = (
             CalibrationData.objects.prefetch_related("samples")
             .select_related("publication")
@@ -603,17 +874,18 @@ def cal_data_set_samples(request, application_name, cd_id):
         "v3_str": v3_str,
         "cl36_str": cl36_str,
         "publications": [cal_data_obj.publication],
-    } | application.get_application_ctx()
+    } | request.application_ctx
 
     template = loader.get_template("cal_data_set_samples.html")
     return HttpResponse(template.render(context, request))
 
 
+@_cached_page
 def publication(request, application_name, pub_id):
     application_name = application_name.lower()
     try:
         pub_obj = Publication.objects.get(pk=pub_id)
-        application = Application.get_application_by_name(application_name)
+        application = request.application
     except ObjectDoesNotExist:
         return error_404_page(
             f"Can't find an application/publication id: {application_name}, {pub_id}",
@@ -651,59 +923,65 @@ def publication(request, application_name, pub_id):
         "v3_str": v3_str,
         "no_samples": no_samples,
         "cores": cores,
-    } | application.get_application_ctx()
+    } | request.application_ctx
 
     template = loader.get_template("publication.html")
-    return HttpResponse(template.render(context, request))
+    return _tagged(
+        HttpResponse(template.render(context, request)),
+        request,
+        tag("publication", pub_obj.id),
+        *[tag("core", core.id) for core in cores],
+        samples={"id__in": sample_ids},
+    )
 
 
+@_cached_page
 def sites(request, application_name, continent=None):
-    application_name = application_name.lower()
-    try:
-        application = Application.get_application_by_name(application_name)
-    except ObjectDoesNotExist:
-        return error_404_page(f"Can't find an application: {application_name}", request)
-
-    sites = (
-        application.sites.all()
-        .select_related("region", "continent")
-        .order_by("region__name", "sector")
-    )
-
-    if continent:
-        sites = Site.get_sites_by_continent(application, continent)
+    application = request.application
 
     sites_by_region = {}
-    for site in sites:
-        if site.region.name not in sites_by_region:
-            sites_by_region[site.region.name] = []
-        sites_by_region[site.region.name].append(site)
+    for site in Site.get_listing(application, continent):
+        region_name = site.region.name if site.region else ""
+        sites_by_region.setdefault(region_name, []).append(site)
 
     if continent:
         context = {
             "sites_by_region": sites_by_region,
             "page_title": f"{Continent.get_continent_name_by_slug(continent)} - {application.name}",
-        } | application.get_application_ctx()
+        } | request.application_ctx
     else:
         context = {
             "sites_by_region": sites_by_region,
             "page_title": f"All sites - {application.name}",
-        } | application.get_application_ctx()
+        } | request.application_ctx
 
     template = loader.get_template("sites.html")
-    return HttpResponse(template.render(context, request))
+    return _tagged(HttpResponse(template.render(context, request)), request)
+
+
+def _get_site(application, site_name):
+    site_list = application.get_sites()
+    site_obj = (
+        Site.objects.filter(id__in=site_list)
+        .select_related("region")
+        .get(short_name__iexact=site_name)
+    )
+    return site_obj
+
+
+def _get_site_calc_strings(application, sample_ids):
+    cl36_strings = Sample.get_cl36_age_calc_strings(sample_ids)
+    v3_strings = Sample.get_v3_age_calc_strings(
+        sample_ids, known_age=application.calibration_data_sets)
+    return v3_strings, cl36_strings
 
 
+@_cached_page
 def site(request, application_name, site_name):
     application_name = application_name.lower()
+    application = request.application
     try:
-        application = Application.get_application_by_name(application_name)
-        site_list = application.get_sites()
-        site_obj = (
-            Site.objects.filter(id__in=site_list)
-            .select_related("region")
-            .get(short_name__iexact=site_name)
-        )
+        site_obj = _get_site(application, site_name)
     except ObjectDoesNotExist:
         return error_404_page(
             f"Can't find an application/site: {application_name}, {site_name}", request
@@ -725,14 +1003,17 @@ def site(request, application_name, site_name):
         )
 
         n_tables = Sample.get_formatted_nuclide(sample_ids)
-        cl36_str = _format_calc_string(Sample.get_cl36_age_calc_string(sample_ids))
-        v3_str = _format_calc_string(Sample.get_v3_age_calc_string(
-            sample_ids, known_age=application.calibration_data_sets))
-
-        v3_age_results, v3_plots, v3_diagnostics = _get_calculated_age_plot_diagnostics(
-            v3_str, "age_input_v3")
-        cl36_age_results, cl36_plots, cl36_diagnostics = _get_calculated_age_plot_diagnostics(
-            cl36_str, "Cl36_input_v3")
+        v3_strings, cl36_strings = _get_site_calc_strings(application, sample_ids)
+        cl36_str = _join_calc_strings(cl36_strings.values())
+        v3_str = _join_calc_strings(v3_strings.values())
+
+        if settings.DEFER_AGE_CALCULATION:
+            age_context = _deferred_age_context(request)
+        else:
+            age_context = _get_site_age_context(
+                site_obj, samples, v3_strings, cl36_strings,
+                _plot_data_url(request, "site", site_obj.short_name),
+                application.calibration_data_sets)
 
     else:
         # publications = []
@@ -741,12 +1022,7 @@ def site(request, application_name, site_name):
         cl36_str = ""
         v3_str = ""
         no_samples = True
-        v3_age_results = []
-        v3_plots = []
-        v3_diagnostics = []
-        cl36_age_results = []
-        cl36_plots = []
-        cl36_diagnostics = []
+        age_context = _empty_age_context()
 
     cores = Core.get_cores_by_site([site_obj.id])
     core_ids = [core.id for core in cores]
@@ -765,35 +1041,6 @@ def site(request, application_name, site_name):
             ]
         )
         publications = publications.union(publications_by_core_sample)
-    # This triggers various summary plots for different site types.
-    if site_obj.what is not None and 'unatak' in site_obj.what and (v3_age_results or cl36_age_results):
-        # Case nunatak. Make age-elevation plot.
-        sample_names = [sample.name for sample in samples]
-        sample_whats = [sample.what for sample in samples]
-        sample_elvs = [sample.elv_m for sample in samples]
-        sample_ice = [sample.local_ice_surface_m for sample in samples]
-        sample_dict = {"names": sample_names, "whats": sample_whats, "elvs": sample_elvs, "ice": sample_ice}
-        [plot_script, plot_div] = age_elevation_plot(v3_age_results, cl36_age_results, sample_dict)
-        is_summary_plot = True
-        summary_plot_text = "Age-elevation plot (drag x-axis limit in upper plot)"
-    elif (v3_age_results or cl36_age_results):
-        # Case not a nunatak, but there are some data.
-        # In this case, presumably landform has one age, so make a camel plot.
-        sample_names = [sample.name for sample in samples]
-        sample_whats = [sample.what for sample in samples]
-        sample_dict = {"names": sample_names, "whats": sample_whats}
-        is_summary_plot = True
-        [plot_script, plot_div] = camelplot(v3_age_results, cl36_age_results, sample_dict)
-        summary_plot_text = "Summary data"
-        # Also do some summary stats?
-    else:
-        # No data, do nothing
-        plot_script = ''
-        plot_div = ''
-        is_summary_plot = False
-        summary_plot_text = ''
-
-
 
     context = {
         "site": site_obj,
@@ -803,292 +1050,142 @@ def site(request, application_name, site_name):
         "n_tables": n_tables,
         "v3_str": v3_str,
         "cl36_str": cl36_str,
-        "v3_age_results": v3_age_results,
-        "v3_plots": v3_plots,
-        "v3_diagnostics": v3_diagnostics,
-        "cl36_age_results": cl36_age_results,
-        "cl36_plots": cl36_plots,
-        "cl36_diagnostics": cl36_diagnostics,
         "no_samples": no_samples,
         "no_cores": no_cores,
         "avg_lat": statistics.mean(sample_lats) if len(sample_lats) > 0 else None,
         "avg_lon": statistics.mean(sample_lons) if len(sample_lons) > 0 else None,
         "page_title": f"Site { site_obj.short_name } ({ site_obj.region.name }, { site_obj.name })",
-        "is_summary_plot": is_summary_plot,
-        "summary_plot_text": summary_plot_text,
-        "plot_script": plot_script,
-        "plot_div": plot_div.replace('<div','<div style="display:flex; align-items:center; justify-content:center;"')
-    } | application.get_application_ctx()
+    } | age_context | request.application_ctx
 
     template_site = loader.get_template("site.html")
-    return HttpResponse(template_site.render(context, request))
+    return _tagged(
+        HttpResponse(template_site.render(context, request)),
+        request,
+        tag("site", site_obj.id),
+        tag("calculations", "all"),
+        *[tag("core", core.id) for core in cores],
+        *_publication_tags(publications),
+        samples={"site_id": site_obj.id},
+        cacheable=not age_context["calculation_failed"],
+    )
 
 
-def sample(request, application_name, sample_name):
-    application_name = application_name.lower()
-    sample_name = sample_name.lower()
+@_cached_page
+def site_ages(request, application_name, site_name):
+    # Exposure age results and summary plot for a site page, see DEFER_AGE_CALCULATION
+    application = request.application
     try:
-        sample_obj = Sample.get_sample_by_name(sample_name)
-        application = Application.get_application_by_name(application_name)
+        site_obj = _get_site(application, site_name)
     except ObjectDoesNotExist:
-        return error_404_page(
-            f"Can't find an application/sample: {application_name}, {sample_name}",
-            request,
-        )
-
-    n_tables = Sample.get_formatted_nuclide([sample_obj.id])
-    v3_str = _format_calc_string(
-        Sample.exposure_calculator_string_query([sample_obj.id]))
-    cl36_str = _format_calc_string(Sample.cl36_calculator_string_query([sample_obj.id]))
-
-    sampleTables = []
-    albeTables = []
-    c14qTables = []
-    he3qTables = []
-    he3pxolTables = []
-    ne21qTables = []
-    UThquartzTables = []
-    cl36Tables = []
-    majorTables = []
-    traceTables = []
-
-    sampleList = list()
-    sampleQS = Sample.objects.filter(name=sample_obj.name)
-    if len(sampleQS) > 0:
-        for i in range(len(sampleQS)):
-            sampleList.append(list(sampleQS.values())[i])
-
-    albeList = list()
-    albeQS = Be10Al26Quartz.objects.filter(sample_id=sample_obj.id)
-    if len(albeQS) > 0:
-        for i in range(len(albeQS)):
-            albeList.append(list(albeQS.values())[i])
-
-    c14qList = list()
-    c14qQS = C14Quartz.objects.filter(sample_id=sample_obj.id)
-    if len(c14qQS) > 0:
-        for i in range(len(c14qQS)):
-            c14qList.append(list(c14qQS.values())[i])
-
-    he3qList = list()
-    he3qQS = He3Quartz.objects.filter(sample_id=sample_obj.id)
-    for i in range(len(he3qQS)):
-        he3qList.append(list(he3qQS.values())[i])
-
-    he3pxolList = list()
-    he3pxolQS = He3Pxol.objects.filter(sample_id=sample_obj.id)
-    for i in range(len(he3pxolQS)):
-        he3pxolList.append(list(he3pxolQS.values())[i])
-
-    ne21qList = list()
-    ne21qQS = Ne21Quartz.objects.filter(sample_id=sample_obj.id)
-    for i in range(len(ne21qQS)):
-        ne21qList.append(list(ne21qQS.values())[i])
-
-    UThquartzList = list()
-    UThquartzQS = UThQuartz.objects.filter(sample_id=sample_obj.id)
-    for i in range(len(UThquartzQS)):
-        UThquartzList.append(list(UThquartzQS.values())[i])
-
-    cl36List = list()
-    cl36QS = Cl36.objects.filter(sample_id=sample_obj.id)
-    for i in range(len(cl36QS)):
-        cl36List.append(list(cl36QS.values())[i])
-
-    majorList = list()
-    majorQS = MajorElement.objects.filter(sample_id=sample_obj.id)
-    for i in range(len(majorQS)):
-        majorList.append(list(majorQS.values())[i])
-
-    traceList = list()
-    traceQS = TraceElement.objects.filter(sample_id=sample_obj.id)
-    for i in range(len(traceQS)):
-        traceList.append(list(traceQS.values())[i])
-
-    sampleTables.clear()
-    albeTables.clear()
-    c14qTables.clear()
-    he3qTables.clear()
-    he3pxolTables.clear()
-    ne21qTables.clear()
-    UThquartzTables.clear()
-    cl36Tables.clear()
-    majorTables.clear()
-    traceTables.clear()
-
-    field_proper_names = application.get_sample_field_proper_names_dict()
-
-    try:
-        proper_names = field_proper_names["base_sample"]
-
-        for lst in sampleList:
-            for item in lst:
-                try:
-                    sampleTables.append(
-                        {"key": proper_names[item][0], "value": lst[item]})
-                except:
-                    continue
-            sampleTables.append(" ")
-    except:
-        sampleTables.clear
-
-    field_proper_names = application.get_sample_field_proper_names_dict()
-
-    try:
-        proper_names = field_proper_names["be10_al26_quartz"]
-
-        for lst in albeList:
-            for item in lst:
-                try:
-                    albeTables.append(
-                        {"key": proper_names[item][0], "value": lst[item]})
-                except:
-                    continue
-            albeTables.append(" ")
-    except:
-        albeTables.clear
-
-    field_proper_names = application.get_sample_field_proper_names_dict()
-
-    try:
-        proper_names = field_proper_names["c14_quartz"]
-
-        for lst in c14qList:
-            for item in lst:
-                try:
-                    c14qTables.append(
-                        {"key": proper_names[item][0], "value": lst[item]})
-                except:
-                    continue
-            c14qTables.append(" ")
-    except:
-        c14qTables.clear
-
-    field_proper_names = application.get_sample_field_proper_names_dict()
+        return JsonResponse({"html": ""}, status=404)
 
-    try:
-        proper_names = field_proper_names["he3_quartz"]
-
-        for lst in he3qList:
-            for item in lst:
-                try:
-                    he3qTables.append(
-                        {"key": proper_names[item][0], "value": lst[item]})
-                except:
-                    continue
-            he3qTables.append(" ")
-    except:
-        he3qTables.clear
-
-    field_proper_names = application.get_sample_field_proper_names_dict()
+    samples = Sample.get_samples_by_site([site_obj.id])
+    sample_ids = [sample.id for sample in samples]
+    if len(sample_ids) > 0:
+        v3_strings, cl36_strings = _get_site_calc_strings(application, sample_ids)
+        age_context = _get_site_age_context(
+            site_obj, samples, v3_strings, cl36_strings,
+            _plot_data_url(request, "site", site_obj.short_name),
+            application.calibration_data_sets)
+    else:
+        cl36_strings = {}
+        age_context = _empty_age_context()
 
-    try:
-        proper_names = field_proper_names["he3_pxol"]
-
-        for lst in he3pxolList:
-            for item in lst:
-                try:
-                    he3pxolTables.append(
-                        {"key": proper_names[item][0], "value": lst[item]})
-                except:
-                    continue
-            he3pxolTables.append(" ")
-    except:
-        he3pxolTables.clear
+    context = {
+        "cl36_str": _join_calc_strings(cl36_strings.values()),
+    } | age_context | request.application_ctx
+
+    html = loader.render_to_string("site_age_results.html", context, request)
+    return _tagged(
+        JsonResponse({"html": html}),
+        request,
+        tag("site", site_obj.id),
+        tag("calculations", "all"),
+        samples={"site_id": site_obj.id},
+        cacheable=not age_context["calculation_failed"],
+    )
 
-    field_proper_names = application.get_sample_field_proper_names_dict()
 
+@_cached_page
+def site_plot(request, application_name, site_name):
+    # Camel plot data of a site page, drawn by scripts/plots.js, see CLIENT_SIDE_PLOTS.
+    # The page stores the data in the plot cache and passes its key; the calculations
+    # only run again if that entry is gone.
+    application = request.application
     try:
-        proper_names = field_proper_names["ne21_quartz"]
-
-        for lst in ne21qList:
-            for item in lst:
-                try:
-                    ne21qTables.append(
-                        {"key": proper_names[item][0], "value": lst[item]})
-                except:
-                    continue
-            ne21qTables.append(" ")
-    except:
-        ne21qTables.clear
+        site_obj = _get_site(application, site_name)
+    except ObjectDoesNotExist:
+        return JsonResponse({"plot": None}, status=404)
+
+    cached = get_plot_data("camelplot", request.GET.get("key", ""))
+    if cached is not None:
+        return JsonResponse({"plot": cached})
+
+    samples = list(Sample.get_samples_by_site([site_obj.id]))
+    plot = None
+    failed = False
+    # Age-elevation plots stay embedded in the page
+    if samples and not _is_age_elevation_site(site_obj):
+        sample_ids = [sample.id for sample in samples]
+        v3_strings, cl36_strings = _get_site_calc_strings(application, sample_ids)
+        (
+            (v3_age_results, _, _, v3_failed),
+            (cl36_age_results, _, _, cl36_failed),
+        ) = _get_all_age_results(
+            {sample.id: sample.name for sample in samples}, v3_strings, cl36_strings,
+            application.calibration_data_sets)
+        failed = v3_failed or cl36_failed
+        if v3_age_results or cl36_age_results:
+            sample_dict = {
+                "ids": sample_ids,
+                "names": [sample.name for sample in samples],
+                "whats": [sample.what for sample in samples],
+            }
+            plot = camelplot_data(v3_age_results, cl36_age_results, sample_dict)
+
+    return _tagged(
+        JsonResponse({"plot": plot}),
+        request,
+        tag("site", site_obj.id),
+        tag("calculations", "all"),
+        samples={"site_id": site_obj.id},
+        cacheable=not failed,
+    )
 
-    field_proper_names = application.get_sample_field_proper_names_dict()
 
-    try:
-        proper_names = field_proper_names["u_th_quartz"]
-
-        for lst in UThquartzList:
-            for item in lst:
-                try:
-                    UThquartzTables.append(
-                        {"key": proper_names[item][0], "value": lst[item]})
-                except:
-                    continue
-            UThquartzTables.append(" ")
-    except:
-        UThquartzTables.clear
-
-    for lst in UThquartzList:
-        for item in lst:
-            try:
-                UThquartzTables.append(
-                    {"key": proper_names[item][0], "value": lst[item]})
-            except:
-                continue
-        UThquartzTables.append(" ")
+def _get_sample_calc_strings(sample_obj):
+    v3_str = _format_calc_string(Sample.get_v3_age_calc_string([sample_obj.id]))
+    cl36_str = _format_calc_string(Sample.get_cl36_age_calc_string([sample_obj.id]))
+    return v3_str, cl36_str
 
-    field_proper_names = application.get_sample_field_proper_names_dict()
 
+@_cached_page
+def sample(request, application_name, sample_name):
+    application_name = application_name.lower()
+    sample_name = sample_name.lower()
     try:
-        proper_names = field_proper_names["cl36"]
-
-        for lst in cl36List:
-            for item in lst:
-                try:
-                    cl36Tables.append(
-                        {"key": proper_names[item][0], "value": lst[item]})
-                except:
-                    continue
-            cl36Tables.append(" ")
-    except:
-        cl36Tables.clear
-
-    field_proper_names = application.get_sample_field_proper_names_dict()
+        sample_obj = Sample.get_sample_by_name(sample_name)
+        application = request.application
+    except ObjectDoesNotExist:
+        return error_404_page(
+            f"Can't find an application/sample: {application_name}, {sample_name}",
+            request,
+        )
 
-    try:
-        proper_names = field_proper_names["major_element"]
-
-        for lst in majorList:
-            for item in lst:
-                try:
-                    majorTables.append(
-                        {"key": proper_names[item][0], "value": lst[item]})
-                except:
-                    continue
-            majorTables.append(" ")
-    except:
-        majorTables.clear
+    n_tables = Sample.get_formatted_nuclide([sample_obj.id])
+    v3_str, cl36_str = _get_sample_calc_strings(sample_obj)
 
-    field_proper_names = application.get_sample_field_proper_names_dict()
+    data_tables = Sample.get_data_tables(
+        [sample_obj.id], application.get_sample_field_proper_names_dict()
+    )
+    tables = {
+        table_name: rows[sample_obj.id] for table_name, rows in data_tables.items()
+    }
 
-    try:
-        proper_names = field_proper_names["trace_element"]
-
-        for lst in traceList:
-            for item in lst:
-                try:
-                    traceTables.append(
-                        {"key": proper_names[item][0], "value": lst[item]})
-                except:
-                    continue
-            traceTables.append(" ")
-    except:
-        traceTables.clear
-
-    v3_age_results, v3_plots, v3_diagnostics = _get_calculated_age_plot_diagnostics(
-        v3_str, "age_input_v3")
-    cl36_age_results, cl36_plots, cl36_diagnostics = _get_calculated_age_plot_diagnostics(
-        cl36_str, "Cl36_input_v3")
+    if settings.DEFER_AGE_CALCULATION:
+        age_context = _deferred_age_context(request)
+    else:
+        age_context = _get_sample_age_context(sample_obj, v3_str, cl36_str)
 
     publications_match = SamplePublicationsMatch.get_publications_by_sample_ids(
         [sample_obj.id]
@@ -1100,27 +1197,53 @@ def sample(request, application_name, sample_name):
         "page_title": f"Comprehensive data dump for sample: {sample_obj.name}",
         "sample": sample_obj,
         "v3_str": v3_str,
-        "v3_age_results": v3_age_results,
-        "v3_plots": v3_plots,
-        "v3_diagnostics": v3_diagnostics,
         "cl36_str": cl36_str,
-        "cl36_age_results": cl36_age_results,
-        "cl36_plots": cl36_plots,
-        "cl36_diagnostics": cl36_diagnostics,
         "publications": publications,
         "table_name_to_proper_name": FieldProperName.get_proper_names(application_name),
         "n_tables": n_tables,
-        "sampleTables": sampleTables,
-        "albeTables": albeTables,
-        "c14qTables": c14qTables,
-        "he3qTables": he3qTables,
-        "he3pxolTables": he3pxolTables,
-        "ne21qTables": ne21qTables,
-        "UThquartzTables": UThquartzTables,
-        "cl36Tables": cl36Tables,
-        "majorTables": majorTables,
-        "traceTables": traceTables,
-    } | application.get_application_ctx()
+        "sampleTables": tables["base_sample"],
+        "albeTables": tables["be10_al26_quartz"],
+        "c14qTables": tables["c14_quartz"],
+        "he3qTables": tables["he3_quartz"],
+        "he3pxolTables": tables["he3_pxol"],
+        "ne21qTables": tables["ne21_quartz"],
+        "UThquartzTables": tables["u_th_quartz"],
+        "cl36Tables": tables["cl36"],
+        "majorTables": tables["major_element"],
+        "traceTables": tables["trace_element"],
+    } | age_context | request.application_ctx
 
     template = loader.get_template("sample.html")
-    return HttpResponse(template.render(context, request))
+    return _tagged(
+        HttpResponse(template.render(context, request)),
+        request,
+        tag("sample", sample_obj.id),
+        tag("calculations", "all"),
+        tag("field_proper_names", "all"),
+        *_publication_tags(publications),
+        samples={"id": sample_obj.id},
+        cacheable=not age_context["calculation_failed"],
+    )
+
+
+@_cached_page
+def sample_ages(request, application_name, sample_name):
+    # Exposure age results for a sample page, see DEFER_AGE_CALCULATION
+    sample_obj = Sample.get_sample_by_name(sample_name.lower())
+    if sample_obj is None:
+        return JsonResponse({"html": ""}, status=404)
+
+    v3_str, cl36_str = _get_sample_calc_strings(sample_obj)
+    context = _get_sample_age_context(
+        sample_obj, v3_str, cl36_str
+    ) | request.application_ctx
+
+    html = loader.render_to_string("sample_age_results.html", context, request)
+    return _tagged(
+        JsonResponse({"html": html}),
+        request,
+        tag("sample", sample_obj.id),
+        tag("calculations", "all"),
+        samples={"id": sample_obj.id},
+        cacheable=not context["calculation_failed"],
+    )
@@ -30,6 +30,17 @@ USE_DOCKER = bool(os.environ.get("DJANGO_DOCKER", False)) if USE_DEV else False
 HOSTNAME = os.environ.get("APP_HOSTNAME", "hostname_not_set")
 # Base URL used to access
 BASE_URL = os.environ.get("BASE_URL", None)
+# Render site and sample pages without waiting for the exposure age calculator;
+# results and summary plots are then loaded by the page from a separate endpoint
+DEFER_AGE_CALCULATION = os.environ.get("DEFER_AGE_CALCULATION", "no") == "yes"
+# Draw the camel and N(z) plots in the browser from JSON plot data fetched when the
+# plot is scrolled into view, instead of embedding Bokeh documents in the page
+CLIENT_SIDE_PLOTS = os.environ.get("CLIENT_SIDE_PLOTS", "no") == "yes"
+# Exposure age calculator client (base.calculations)
+CALCULATOR_CONNECT_TIMEOUT = float(os.environ.get("CALCULATOR_CONNECT_TIMEOUT", 5))
+CALCULATOR_READ_TIMEOUT = float(os.environ.get("CALCULATOR_READ_TIMEOUT", 120))
+CALCULATOR_RETRIES = int(os.environ.get("CALCULATOR_RETRIES", 2))
+CALCULATOR_POOL_SIZE = int(os.environ.get("CALCULATOR_POOL_SIZE", 10))
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -81,6 +92,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "base.middleware.ApplicationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "csp.middleware.CSPMiddleware",
@@ -147,6 +159,84 @@ import dj_database_url  # noqa
 
 DATABASES = {"default": dj_database_url.config()}
 
+# Caches
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# "calculations" holds exposure age calculator responses keyed by a hash of the
+# calculator input. LocMemCache evicts least recently used entries once
+# MAX_ENTRIES is reached.
+# "maps" holds the encoded leaflet map GeoJSON and viewport tiles per application
+# and data version.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "calculations": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "calculations",
+        "TIMEOUT": int(os.environ.get("CALCULATION_CACHE_TIMEOUT", 60 * 60 * 24)),
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.environ.get("CALCULATION_CACHE_MAX_ENTRIES", 2000)),
+        },
+    },
+    "maps": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "maps",
+        "TIMEOUT": int(os.environ.get("MAP_CACHE_TIMEOUT", 60 * 60 * 24)),
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.environ.get("MAP_CACHE_MAX_ENTRIES", 5000)),
+        },
+    },
+    # Rendered pages, see base/page_cache.py. Entries may stay per process since their
+    # tags are checked against the shared "page_tags" versions on every hit.
+    "pages": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "pages",
+        "TIMEOUT": int(os.environ.get("PAGE_CACHE_TIMEOUT", 60 * 15)),
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.environ.get("PAGE_CACHE_MAX_ENTRIES", 5000)),
+        },
+    },
+    # Versions of the page cache tags, shared by all workers so that a signal in one
+    # process invalidates the pages cached by every other. The database table is
+    # created by migration 0025; any other shared backend (e.g. memcached) will do.
+    "page_tags": {
+        "BACKEND": os.environ.get(
+            "PAGE_TAGS_CACHE_BACKEND", "django.core.cache.backends.db.DatabaseCache"
+        ),
+        "LOCATION": os.environ.get("PAGE_TAGS_CACHE_LOCATION", "base_page_tags_cache"),
+        "TIMEOUT": None,
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.environ.get("PAGE_TAGS_CACHE_MAX_ENTRIES", 100000)),
+        },
+    },
+    # Bokeh plot components and client side plot data, keyed by the plotted data, see
+    # base/plot_cache.py. With several workers a shared backend lets the plot data
+    # endpoints find the data stored while rendering the page in another process.
+    "plots": {
+        "BACKEND": os.environ.get(
+            "PLOT_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("PLOT_CACHE_LOCATION", "plots"),
+        "TIMEOUT": int(os.environ.get("PLOT_CACHE_TIMEOUT", 60 * 60 * 24)),
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.environ.get("PLOT_CACHE_MAX_ENTRIES", 2000)),
+        },
+    },
+}
+
+# How long a worker may keep serving applications and field proper names after
+# another process edited them; edits in the same process (or with a shared cache)
+# apply at once
+METADATA_CACHE_TIMEOUT = int(os.environ.get("METADATA_CACHE_TIMEOUT", 60 * 5))
+
+# How long a worker may serve search results from its name index after another
+# process added, renamed or removed a site, sample, core or core sample
+SEARCH_INDEX_TIMEOUT = int(os.environ.get("SEARCH_INDEX_TIMEOUT", 60 * 5))
+
+# Applications with at least this many sites list them with the counts kept in
+# SiteCounts instead of counting samples, cores and measurements per request
+SITE_COUNTS_TABLE_MIN_SITES = int(os.environ.get("SITE_COUNTS_TABLE_MIN_SITES", 500))
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 AUTH_PASSWORD_VALIDATORS = [
@@ -238,6 +328,9 @@ REST_FRAMEWORK = {
 }
 
 CRONJOBS = [
+    ('1 23 * * *', 'django.core.management.call_command', ['refresh_calc_inputs']),
+    ('31 23 * * *', 'django.core.management.call_command', ['rebuild_publication_index']),
+    ('41 23 * * *', 'django.core.management.call_command', ['refresh_site_counts']),
     ('1 0 * * *', 'django.core.management.call_command', ['calculate_ages_v3']),
     ('1 1 * * *', 'django.core.management.call_command', ['calculate_ages_cl36']),
 ]
@@ -59,6 +59,7 @@ urlpatterns = [
     path("<application_name>/", views.landing),
     path("<application_name>/cores/", views.cores),
     path("<application_name>/core/<core_name>/", views.core),
+    path("<application_name>/core/<core_name>/plot", views.core_plot),
     path("<application_name>/coresample/<coresample_name>", views.coresample),
     path("<application_name>/publications", views.publications),
     path("<application_name>/publication/<int:pub_id>/", views.publication),
@@ -69,7 +70,10 @@ urlpatterns = [
     path("<application_name>/sites/", views.sites),
     path("<application_name>/sites/<continent>/", views.sites),
     path("<application_name>/site/<site_name>/", views.site),
+    path("<application_name>/site/<site_name>/ages", views.site_ages),
+    path("<application_name>/site/<site_name>/plot", views.site_plot),
     path("<application_name>/sample/<sample_name>/", views.sample),
+    path("<application_name>/sample/<sample_name>/ages", views.sample_ages),
     path("<application_name>/pubyears", views.pubYears),
     path("<application_name>/pubyear/<int:year>/", views.pubYear),
     path("<application_name>/sitemap/<str:site>/<str:lat>/<str:lon>/<int:zoom>", views.sitemap),
@@ -0,0 +1,13 @@
+// Loads exposure age results for site and sample pages rendered with
+// DEFER_AGE_CALCULATION, so the page itself doesn't wait for the calculator
+$(document).ready(function(){
+    $('.deferred-age-results').each(function(){
+        var container = $(this);
+        $.getJSON(container.data('url')).then(function(payload){
+            // jQuery also runs the Bokeh plot script included in the fragment
+            container.html(payload.html);
+        }, function(){
+            container.find('p').text('Exposure age results are not available right now.');
+        });
+    });
+});
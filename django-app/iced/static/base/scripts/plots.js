@@ -0,0 +1,117 @@
+// Draws the camel plot of site pages and the N(z) plot of core pages from the JSON
+// plot data endpoints (CLIENT_SIDE_PLOTS), fetching the data once the plot scrolls
+// into view. Mirrors camelplot and NofZplot in base/plots.py.
+(function(){
+    var AGE_TOOLTIPS = '<div><span style="font-size: 14px;">@name - @what - @nuc - @x yr</span></div>';
+    var DEPTH_TOOLTIPS = '<div><span style="font-size: 14px;">@nid: @td-@bd cm</span></div>';
+
+    function camelPlot(data){
+        var plt = Bokeh.Plotting;
+        var p = plt.figure({
+            height: 150,
+            width: 800,
+            x_range: new Bokeh.Range1d({start: 0, end: data.x_end}),
+            x_axis_type: null,
+            y_axis_type: null,
+            toolbar_location: null,
+            title: 'LSDn',
+            border_fill_color: '#EEEEEE',
+            background_fill_color: '#EEEEEE',
+            outline_line_color: null
+        });
+        data.nuclide_curves.forEach(function(curve){
+            p.line({x: data.grid, y: curve.y, line_color: curve.color, line_width: 1});
+        });
+        if (data.summary_curve !== null) {
+            p.line({x: data.grid, y: data.summary_curve, line_color: 'black', line_width: 2});
+        }
+
+        var points = new Bokeh.ColumnDataSource({data: data.points});
+        var p2 = plt.figure({
+            height: 30 + 10 * (data.n_rows + 4),
+            width: 800,
+            x_range: new Bokeh.Range1d({start: 0, end: data.x_end}),
+            y_range: new Bokeh.Range1d({start: -3, end: data.n_rows + 2}),
+            y_axis_type: null,
+            toolbar_location: null,
+            x_axis_label: 'Exposure age (yr)',
+            tools: '',
+            border_fill_color: '#EEEEEE',
+            background_fill_color: '#EEEEEE',
+            outline_line_color: null
+        });
+        p2.add_tools(new Bokeh.HoverTool({tooltips: AGE_TOOLTIPS}));
+        p2.hbar({
+            y: {field: 'y'}, left: {field: 'xmin'}, right: {field: 'xmax'}, height: 0,
+            fill_color: null, line_color: {field: 'plot_lcol'}, source: points
+        });
+        p2.circle({
+            x: {field: 'x'}, y: {field: 'y'}, size: 10,
+            fill_color: {field: 'plot_fcol'}, line_color: {field: 'plot_lcol'}, source: points
+        });
+        return new Bokeh.Column({children: [p, p2]});
+    }
+
+    function nofzPlot(data){
+        var intervals = new Bokeh.ColumnDataSource({data: data.intervals});
+        var p = Bokeh.Plotting.figure({
+            tools: '',
+            height: data.height,
+            width: 500,
+            background_fill_color: '#EEEEEE',
+            border_fill_color: '#EEEEEE',
+            x_axis_type: 'log',
+            y_range: new Bokeh.Range1d({start: data.max_depth, end: 0, bounds: [0, data.max_depth]}),
+            x_axis_label: 'Nuclide concentration (atoms/g)',
+            y_axis_label: 'Depth (cm)'
+        });
+        p.add_tools(new Bokeh.HoverTool({tooltips: DEPTH_TOOLTIPS}));
+        p.hbar({
+            y: {field: 'y'}, height: {field: 'height'}, left: {field: 'left'}, right: {field: 'right'},
+            fill_color: {field: 'fill_color'}, line_color: {field: 'line_color'},
+            fill_alpha: 0.5, line_width: 0.5, line_alpha: 0.5, source: intervals
+        });
+        p.vbar({
+            x: {field: 'N'}, top: {field: 'td'}, bottom: {field: 'bd'}, width: 0,
+            line_color: {field: 'line_color'}, line_width: 0.75, source: intervals
+        });
+        return p;
+    }
+
+    var RENDERERS = {camel: camelPlot, nofz: nofzPlot};
+
+    function load(container){
+        $.getJSON(container.data('url')).then(function(payload){
+            var data = payload.plot;
+            container.empty();
+            if (!data) {
+                return;
+            }
+            var target = $('<div></div>').appendTo(container);
+            Bokeh.Plotting.show(RENDERERS[data.kind](data), target[0]);
+            if (data.note) {
+                $('<p></p>').text(data.note).appendTo(container);
+            }
+        }, function(){
+            container.find('p').text('This plot is not available right now.');
+        });
+    }
+
+    $(document).ready(function(){
+        // The script is included once per plot and again with deferred age results
+        var containers = $('.plot-data').not('.plot-data-bound').addClass('plot-data-bound');
+        if (!('IntersectionObserver' in window)) {
+            containers.each(function(){ load($(this)); });
+            return;
+        }
+        var observer = new IntersectionObserver(function(entries){
+            entries.forEach(function(entry){
+                if (entry.isIntersecting) {
+                    observer.unobserve(entry.target);
+                    load($(entry.target));
+                }
+            });
+        }, {rootMargin: '200px'});
+        containers.each(function(){ observer.observe(this); });
+    });
+})();